@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+'''Analysis of an already computed Operation. Counts what is actually
+there (the unique Operations) and not what the formula expands to'''
+
+from core import Operation, Input, uniqueOperations
+from numbers import Number
+from typing import Iterator
+
+class Analysis ():
+    '''The result of analyzing an Operation:\n
+        - `operations_count`: the mathematical operations count, same as `Operation.operations_count`,
+    where a reused Operation is counted once per reference\n
+        - `unique_count`: how many distinct Operation objects there are, not counting the Inputs\n
+        - `depth`: the length of the longest chain of Operations, from the
+    root down to an Operation that only has numbers as arguments\n
+        - `sharing_factor`: `operations_count / unique_count`, how many times
+    on average each unique Operation is counted in the formula'''
+
+    def __init__(self, operations_count: int, unique_count: int, depth: int) -> None:
+        self.operations_count = operations_count
+        self.unique_count = unique_count
+        self.depth = depth
+
+    @property
+    def sharing_factor (self) -> float:
+        try:
+            return self.operations_count / self.unique_count
+        except OverflowError:
+            return float('inf') # The operations count can be way too big for a float
+
+    def __str__(self) -> str:
+        return f"{self.unique_count} unique operations, a depth of {self.depth} and a sharing factor of {self.sharing_factor:.4g}"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+def analyze (operation: Operation) -> Analysis:
+    '''Analyzes the operation and returns its Analysis'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+
+    depths = {}
+    unique_count = 0
+    for node in uniqueOperations(operation):
+        if type(node) is Input:
+            depths[id(node)] = 0
+            continue
+        depth = 0
+        for argument in (node.a, node.b):
+            if isinstance(argument, Operation):
+                depth = max(depth, depths[id(argument)])
+        depths[id(node)] = depth +1
+        unique_count += 1
+
+    return Analysis(operation.operations_count, unique_count, depths[id(operation)])
+
+def eliminateCommonSubexpressions (operation: Operation) -> Operation:
+    '''Returns an operation where all the structurally identical
+    Operations (same op, and same arguments, recursively) are merged
+    into a single one that is reused. The original operation
+    is left untouched, and the Operations that don't change are
+    reused as they are.\n
+    This does not change the result nor the mathematical operations
+    count, only how many unique Operations there are.'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+
+    # Maps the structural key of an Operation to its canonical Operation
+    canonicals = {}
+    # Maps the id of an original Operation to its canonical Operation
+    replacements = {}
+
+    def keyOf (argument: Number | Operation) -> tuple:
+        '''The structural key of an argument. Numbers are keyed by their type
+        as well, so that `2` and `2.0` are not merged'''
+        if isinstance(argument, Operation):
+            return (id(argument),)
+        return (type(argument), argument)
+
+    for node in uniqueOperations(operation):
+        if type(node) is Input:
+            replacements[id(node)] = node
+            continue
+        a = replacements[id(node.a)] if isinstance(node.a, Operation) else node.a
+        b = replacements[id(node.b)] if isinstance(node.b, Operation) else node.b
+        key = (node.op, keyOf(a), keyOf(b))
+
+        canonical = canonicals.get(key)
+        if canonical is None:
+            canonical = node
+            if a is not node.a or b is not node.b:
+                canonical = Operation(node.op, a, b)
+            canonicals[key] = canonical
+        replacements[id(node)] = canonical
+
+    return replacements[id(operation)]
+
+def letBindings (operation: Operation) -> Iterator[str]:
+    '''Yields the operation as a sequence of bindings, one per unique
+    Operation, each one referencing the previous ones instead of
+    expanding them. For example: `t1 = 2 * 3`, `t2 = t1 + t1`, `ret t2`.\n
+    The bindings are valid Malang code, and running
+    them gives back the same operation. The Inputs are
+    referenced by their names.'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+
+    names = {}
+    count = 0
+    for node in uniqueOperations(operation):
+        if type(node) is Input:
+            names[id(node)] = node.name
+            continue
+        count += 1
+        name = f"t{count}"
+        names[id(node)] = name
+        a = names[id(node.a)] if isinstance(node.a, Operation) else formatNumber(node.a)
+        b = names[id(node.b)] if isinstance(node.b, Operation) else formatNumber(node.b)
+        yield f"{name} = {a} {node.op} {b}"
+    yield f"ret {names[id(operation)]}"
+
+def formatNumber (number: Number) -> str:
+    '''Formats a number the way the parser can read it back, that
+    is without the scientific notation, and without losing any precision'''
+    if type(number) is float and 'e' in repr(number):
+        from decimal import Decimal
+        return format(Decimal(number), 'f')
+    return repr(number)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+'''Batch mode. Runs a program for many argument sets: it's parsed once, and
+the sets are evaluated in parallel by worker processes that inherit
+the compiled program. The results are written as JSON lines, in the
+same order as the sets'''
+
+from engine import Program
+from budget import Budget, BudgetExceeded
+from runner import interpretResult
+from typing import Iterator, TextIO
+import multiprocessing
+import json
+import csv
+
+# The state of the worker processes. Check `initWorker()`
+_program = None
+_options = None
+
+def readArgsSets (file: TextIO) -> Iterator[list[float]]:
+    '''Reads the argument sets, one per line, as comma separated values. The
+    empty lines are skipped'''
+    for line_number, row in enumerate(csv.reader(file), 1):
+        row = [cell.strip() for cell in row]
+        if all(cell == '' for cell in row):
+            continue
+        try:
+            yield [float(cell) for cell in row]
+        except ValueError:
+            raise Exception(f"❌ INVALID INPUT: Line {line_number} of the inputs `{','.join(row)}` is not a list of numbers")
+
+def initWorker (program: Program, options: dict) -> None:
+    '''Sets the state of a worker process. When the workers are forked, the
+    `program` is inherited as is instead of being pickled'''
+    global _program, _options
+    _program = program
+    _options = options
+
+def evaluate (args: list[float]) -> str:
+    '''Evaluates the program for one argument set, in a worker, and
+    returns its result as a JSON line. Errors and timeouts are
+    reported in the line too, they don't stop the batch'''
+    record = {'args': args}
+    try:
+        budget = Budget(**_options['budget'])
+        result = _program.run(args, hoist=_options['hoist'], inline_threshold=_options['inline_threshold'], budget=budget)
+        record['result'] = interpretResult(result.value) if _options['interpret'] else result.value
+        record['operations_count'] = result.stats.operations_count
+        record['duration'] = result.stats.duration
+    except BudgetExceeded as e:
+        record['error'] = f"Timed out after {e.limit} seconds" if e.budget == 'timeout' else str(e)
+        record['budget'] = e.report
+    except Exception as e:
+        record['error'] = str(e)
+    return json.dumps(record)
+
+def runBatch (program: Program, args_sets: Iterator[list[float]], output: TextIO, options: dict) -> int:
+    '''Evaluates the program for each of the `args_sets` with `options['workers']`
+    processes, and writes the results to `output` as soon as they're
+    known and all the ones before them were written. Returns how many there were'''
+    # Forking shares the program with the workers copy-on-write, otherwise it's pickled to each one of them
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    count = 0
+    with context.Pool(options['workers'], initWorker, (program, options)) as pool:
+        for line in pool.imap(evaluate, args_sets):
+            output.write(line +'\n')
+            output.flush()
+            count += 1
+    return count
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+from __future__ import annotations
+
+'''The end-to-end benchmarks. Runs the examples over a ladder of `n` values,
+each case in a process of its own, and records for each phase (`parseSourceFile()`,
+`constructAST()` and `constructProgram()`) the wall time and the peak RSS so far,
+along with how many Operation objects were created and the operations count.\n
+The results are written as JSON, and compared to a baseline if one is given. A case is
+a regression if one of its phases got slower or bigger than the tolerance allows, or if it
+creates more Operation objects or operations. The scaling of each program is the exponent
+of the construction time as a function of the created Operation objects, fitted over its
+ladder, and it's a regression if it grew by more than its tolerance. Timings only compare
+on the same machine, so such a baseline is kept locally.\n
+The counts are the same on any machine though, so they're also checked on their own
+against `benchmarks/counts.json`, which is committed. Either way, exits with 1 if there
+are regressions.\n
+    $ python benchmarks/bench.py --output baseline.json                      # Before a change
+    $ python benchmarks/bench.py --baseline baseline.json                    # After it
+    $ python benchmarks/bench.py --repeat 1 --counts benchmarks/counts.json  # Anywhere'''
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from memstats import peakRSS
+import subprocess
+import argparse
+import platform
+import json
+import math
+import time
+
+VERSION = 1
+# The deterministic measurements of a case, that are compared with `--counts`
+COUNTS = ['objects_count', 'operations_count']
+
+# The ladder of `n` of each example. `None` is for the ones that don't take any
+LADDERS = {
+    'factorial': [250, 500, 1000, 2000],
+    'fizzBuzz': [1, 2, 4, 8],
+    'helloWorld': [None],
+    'primeGenerator': [1, 2, 3, 4],
+    'optimizedPrimeGenerator': [1, 2, 3, 4, 5],
+}
+PHASES = ['parse', 'ast', 'construct']
+
+def runCase (program: str, n: int | None) -> dict:
+    '''Runs a single case in this process, and returns its measurements'''
+    from runner import parseSourceFile, constructAST, constructProgram
+    from core import Context, runningIn
+
+    path = os.path.join(ROOT_DIR, 'examples', f"{program}.mlg")
+    args = [] if n is None else [n]
+    phases = {}
+
+    def measure (phase: str, function, *arguments):
+        start = time.perf_counter()
+        value = function(*arguments)
+        phases[phase] = {'seconds': time.perf_counter() - start, 'peak_rss': peakRSS()}
+        return value
+
+    context = Context()
+    with runningIn(context):
+        tokens = measure('parse', parseSourceFile, path)
+        ast = measure('ast', constructAST, tokens)
+        operation = measure('construct', constructProgram, ast, args)
+    return {
+        'program': program,
+        'n': n,
+        'phases': phases,
+        'objects_count': context.objects_count,
+        'operations_count': operation.operations_count,
+    }
+
+def caseName (program: str, n: int | None) -> str:
+    return program if n is None else f"{program} {n}"
+
+def spawnCase (program: str, n: int | None) -> dict:
+    '''Runs a single case in a process of its own, so that its peak RSS is its own'''
+    command = [sys.executable, os.path.abspath(__file__), '--case', program]
+    if n is not None:
+        command.append(str(n))
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise Exception(f"❌ BENCHMARK FAILED: `{program}` with n = {n}\n{completed.stderr}")
+    return json.loads(completed.stdout)
+
+def runSuite (programs: list[str], repeat: int, log) -> list[dict]:
+    '''Runs every case `repeat` times, and keeps the fastest time
+    and the smallest peak RSS of each of its phases'''
+    results = []
+    for program in programs:
+        for n in LADDERS[program]:
+            best = None
+            for _ in range(repeat):
+                result = spawnCase(program, n)
+                if best is None:
+                    best = result
+                    continue
+                for phase in PHASES:
+                    best_phase, phase_result = best['phases'][phase], result['phases'][phase]
+                    best_phase['seconds'] = min(best_phase['seconds'], phase_result['seconds'])
+                    if phase_result['peak_rss'] is not None:
+                        best_phase['peak_rss'] = min(best_phase['peak_rss'], phase_result['peak_rss'])
+            log(f"⏱️  {caseName(program, n)}: " +', '.join(f"{phase} {best['phases'][phase]['seconds']:.4f}s" for phase in PHASES) +f", {best['objects_count']} Operation objects")
+            results.append(best)
+    return results
+
+def scalingExponent (results: list[dict], program: str) -> float | None:
+    '''The least squares slope of log(construction time) over log(Operation objects)
+    of the program's cases, or `None` if there aren't two distinct points to fit'''
+    points = [(math.log(result['objects_count']), math.log(result['phases']['construct']['seconds']))
+              for result in results if result['program'] == program and result['objects_count'] > 0 and result['phases']['construct']['seconds'] > 0]
+    if len(set(x for x, _ in points)) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x)**2 for x, _ in points)
+
+def compare (results: dict, baseline: dict, tolerance: float, slope_tolerance: float, min_seconds: float) -> tuple[list[str], list[str]]:
+    '''Compares the results to the baseline. Returns the regressions and the improvements, as messages'''
+    regressions = []
+    improvements = []
+    baseline_cases = {(case['program'], case['n']): case for case in baseline['cases']}
+    for case in results['cases']:
+        name = caseName(case['program'], case['n'])
+        base = baseline_cases.get((case['program'], case['n']))
+        if base is None:
+            continue
+        for phase in PHASES:
+            seconds, base_seconds = case['phases'][phase]['seconds'], base['phases'][phase]['seconds']
+            if seconds > base_seconds * (1 +tolerance) and seconds - base_seconds > min_seconds:
+                regressions.append(f"{name}: {phase} took {seconds:.4f}s instead of {base_seconds:.4f}s")
+            elif seconds < base_seconds / (1 +tolerance) and base_seconds - seconds > min_seconds:
+                improvements.append(f"{name}: {phase} took {seconds:.4f}s instead of {base_seconds:.4f}s")
+            rss, base_rss = case['phases'][phase]['peak_rss'], base['phases'][phase]['peak_rss']
+            if rss is not None and base_rss is not None and rss > base_rss * (1 +tolerance):
+                regressions.append(f"{name}: the peak RSS after {phase} is {rss // 2**20} MB instead of {base_rss // 2**20} MB")
+    count_regressions, count_improvements = compareCounts(results, baseline)
+    regressions.extend(count_regressions)
+    improvements.extend(count_improvements)
+    for program, exponent in results['scaling'].items():
+        base_exponent = baseline['scaling'].get(program)
+        if exponent is not None and base_exponent is not None and exponent > base_exponent +slope_tolerance:
+            regressions.append(f"{program}: scales as objects^{exponent:.2f} instead of objects^{base_exponent:.2f}")
+    return (regressions, improvements)
+
+def compareCounts (results: dict, counts: dict) -> tuple[list[str], list[str]]:
+    '''Compares the `COUNTS` of the results to the ones in `counts`, either a
+    baseline or a file written with `--counts-output`. Returns the regressions
+    and the improvements, as messages'''
+    regressions = []
+    improvements = []
+    counts_cases = {(case['program'], case['n']): case for case in counts['cases']}
+    for case in results['cases']:
+        name = caseName(case['program'], case['n'])
+        base = counts_cases.get((case['program'], case['n']))
+        if base is None:
+            continue
+        for count in COUNTS:
+            if case[count] > base[count]:
+                regressions.append(f"{name}: {count} is {case[count]} instead of {base[count]}")
+            elif case[count] < base[count]:
+                improvements.append(f"{name}: {count} is {case[count]} instead of {base[count]}")
+    return (regressions, improvements)
+
+def loadResults (file_path: str) -> dict:
+    '''Loads results written with `--output` or `--counts-output`'''
+    with open(file_path) as file:
+        results = json.load(file)
+    if results.get('version') != VERSION:
+        raise Exception(f"❌ INVALID BASELINE: `{file_path}` is of version {results.get('version')}, not {VERSION}")
+    return results
+
+def main () -> int:
+    parser = argparse.ArgumentParser(description='Runs the end-to-end benchmarks over the examples')
+    parser.add_argument('--case', nargs='+', metavar=('PROGRAM', 'N'), help=argparse.SUPPRESS) # Runs a single case, in the spawned processes
+    parser.add_argument('--programs', nargs='+', choices=list(LADDERS), default=list(LADDERS), help='the examples to run. Default is all of them.')
+    parser.add_argument('--repeat', type=int, default=3, help='how many times each case is run, the best of them is kept. Default is 3.')
+    parser.add_argument('-o', '--output', metavar='FILE', help='write the results to FILE as JSON. Use it to record a baseline on this machine.')
+    parser.add_argument('--baseline', metavar='FILE', help='compare the results to the ones in FILE, recorded on this same machine, and exit with 1 if there are regressions.')
+    parser.add_argument('--counts-output', metavar='FILE', help='write only the Operation objects and operations counts of the cases to FILE as JSON. Use it to update `benchmarks/counts.json`.')
+    parser.add_argument('--counts', metavar='FILE', help='compare only the Operation objects and operations counts to the ones in FILE, which are the same on any machine, and exit with 1 if there are regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='how much slower or bigger, relatively, a phase can get before being a regression. Default is 0.25.')
+    parser.add_argument('--slope-tolerance', type=float, default=0.2, help='how much the scaling exponent of a program can grow before being a regression. Default is 0.2.')
+    parser.add_argument('--min-seconds', type=float, default=0.02, help='time differences smaller than this are noise, never regressions. Default is 0.02.')
+    options = parser.parse_args()
+
+    if options.case is not None:
+        program, *n = options.case
+        print(json.dumps(runCase(program, int(n[0]) if len(n) != 0 else None)))
+        return 0
+
+    log = lambda message: print(message, file=sys.stderr)
+    cases = runSuite(options.programs, options.repeat, log)
+    results = {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': cases,
+        'scaling': {program: scalingExponent(cases, program) for program in options.programs},
+    }
+    for program, exponent in results['scaling'].items():
+        if exponent is not None:
+            log(f"📈 {program} scales as objects^{exponent:.2f}")
+    if options.output is not None:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if options.counts_output is not None:
+        with open(options.counts_output, 'w') as file:
+            json.dump({'version': VERSION, 'cases': [{key: case[key] for key in ['program', 'n', *COUNTS]} for case in cases]}, file, indent=2)
+            file.write('\n')
+
+    failed = False
+    for file_path, comparison in [(options.baseline, lambda base: compare(results, base, options.tolerance, options.slope_tolerance, options.min_seconds)), (options.counts, lambda base: compareCounts(results, base))]:
+        if file_path is None:
+            continue
+        regressions, improvements = comparison(loadResults(file_path))
+        for improvement in improvements:
+            log(f"✅ {improvement}")
+        for regression in regressions:
+            log(f"❌ {regression}")
+        log(f"{len(regressions)} regression{['', 's'][0 if len(regressions) == 1 else 1]} compared to `{file_path}`")
+        failed = failed or len(regressions) != 0
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
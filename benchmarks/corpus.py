@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+'''Synthetic corpora, to benchmark the front end. Generates valid Malang
+code of a controlled shape: a main file that includes a number of
+library files, each one defining functions whose bodies nest for loops
+and anonymous functions, with expressions of a given length that use
+the variables, call the functions defined before them, and
+use string literals of a given length.\n
+The code is parsed and turned into an AST like any other, but
+it's not meant to be run: the calls nest exponentially, and
+the values are random, divisions by zero included'''
+
+import random
+import os
+
+OPS = ['+', '-', '*', '/', '//', '^']
+LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ '
+
+class Generator ():
+    '''Generates the code of a corpus. The attributes are as follow:\n
+    - `functions`: how many functions each file defines\n
+    - `depth`: how deep the for loops and the anonymous functions nest in each function\n
+    - `expression_length`: how many binary operations each expression has\n
+    - `string_length`: how long each string literal is\n
+    - `includes`: how many library files the main file includes\n
+    - `seed`: the seed of the random choices, the same seed gives the same corpus. Only
+    the string literals differ between two string lengths'''
+
+    def __init__(self, functions: int=20, depth: int=2, expression_length: int=8, string_length: int=16, includes: int=2, seed: int=0) -> None:
+        self.functions = functions
+        self.depth = depth
+        self.expression_length = expression_length
+        self.string_length = string_length
+        self.includes = includes
+        self.random = random.Random(seed)
+        # The contents of the strings are drawn on their own, so that their length doesn't change the rest of the corpus
+        self.strings = random.Random(seed)
+        self.__counter = 0
+        # The functions defined so far, that can be called. Their names
+        self.__defined = []
+
+    def name (self, prefix: str) -> str:
+        self.__counter += 1
+        return f"{prefix}{self.__counter}"
+
+    def operand (self, variables: list[str], depth: int) -> str:
+        '''A single value: a variable, a number, a string, a call or a parenthesized expression'''
+        choice = self.random.random()
+        if choice < 0.4:
+            return self.random.choice(variables)
+        if choice < 0.6:
+            return str(self.random.randint(1, 1000))
+        if choice < 0.7:
+            return '"' +''.join(self.strings.choice(LETTERS) for _ in range(self.string_length)) +'"'
+        if choice < 0.85 and len(self.__defined) != 0:
+            return f"{self.random.choice(self.__defined)}({self.expression(variables, 1, depth)}, {self.expression(variables, 1, depth)})"
+        if depth > 0:
+            return f"({self.expression(variables, max(1, self.expression_length // 2), depth -1)})"
+        return self.random.choice(variables)
+
+    def expression (self, variables: list[str], length: int, depth: int=1) -> str:
+        '''An expression of `length` binary operations'''
+        parts = [self.operand(variables, depth)]
+        for _ in range(length):
+            parts.append(self.random.choice(OPS))
+            parts.append(self.operand(variables, depth))
+        return ' '.join(parts)
+
+    def body (self, variables: list[str], depth: int, indent: str, returns: bool=True) -> list[str]:
+        '''The lines of a body that nests `depth` more levels. The
+        bodies of the for loops don't return, it would return from the function'''
+        variables = variables.copy()
+        lines = []
+        var = self.name('v')
+        lines.append(f"{indent}{var} = {self.expression(variables, self.expression_length)}")
+        variables.append(var)
+        if depth > 0:
+            loop_var = self.name('i')
+            lines.append(f"{indent}for ({loop_var}: 0: 3) {{")
+            lines.extend(self.body(variables +[loop_var], depth -1, indent +'    ', False))
+            lines.append(f"{indent}}}")
+            var = self.name('v')
+            lines.append(f"{indent}{var} = {{")
+            lines.extend(self.body(variables, depth -1, indent +'    '))
+            lines.append(f"{indent}}}")
+            variables.append(var)
+        if returns:
+            lines.append(f"{indent}ret {self.expression(variables, self.expression_length)}")
+        return lines
+
+    def function (self) -> list[str]:
+        '''The lines of a function definition, which can then be called'''
+        name = self.name('f')
+        lines = [f"def {name} (a, b) {{"]
+        lines.extend(self.body(['a', 'b'], self.depth, '    '))
+        lines.append('}')
+        lines.append('')
+        self.__defined.append(name)
+        return lines
+
+    def file (self) -> str:
+        '''The content of a library file'''
+        lines = []
+        for _ in range(self.functions):
+            lines.extend(self.function())
+        return '\n'.join(lines)
+
+def generateCorpus (directory: str, generator: Generator) -> str:
+    '''Writes the corpus of the `generator` in `directory`, and returns the path of its main file'''
+    os.makedirs(directory, exist_ok=True)
+    libraries = []
+    for i in range(generator.includes):
+        library = f"library{i}"
+        with open(os.path.join(directory, f"{library}.mlg"), 'w') as file:
+            file.write(generator.file())
+        libraries.append(library)
+
+    lines = []
+    if len(libraries) != 0:
+        lines.append(f"include {', '.join(libraries)}")
+        lines.append('')
+    lines.append(generator.file())
+    lines.append('def main (n) {')
+    lines.extend(generator.body(['n'], generator.depth, '    '))
+    lines.append('}')
+    path = os.path.join(directory, 'main.mlg')
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) +'\n')
+    return path
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+from __future__ import annotations
+
+'''The front end benchmarks. Generates synthetic corpora (check `corpus.py`), varying
+one of their dimensions at a time from a base shape, and reports the throughput of
+`parseSourceFile()` in tokens per second, and of `constructAST()` in nodes per second.\n
+For each dimension, it also fits the exponent of the parse time as a function of the
+size of the source in bytes, and of the AST time as a function of the tokens count. An
+exponent above 1 means that the front end goes non-linear along that dimension, and
+it's flagged if it's above 1 by more than the tolerance.\n
+    $ python benchmarks/frontend.py --output frontend.json'''
+
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from runner import parseSourceFile, constructAST
+from metrics import countNodes
+from corpus import Generator, generateCorpus
+from bench import caseName
+import tempfile
+import argparse
+import json
+import math
+import time
+
+# The shape the dimensions are varied from
+BASE = {'functions': 10, 'depth': 2, 'expression_length': 8, 'string_length': 16, 'includes': 2}
+# The values each dimension goes trough
+LADDERS = {
+    'functions': [10, 20, 40, 80],
+    'depth': [1, 2, 3, 4],
+    'expression_length': [4, 8, 16, 32, 64],
+    'string_length': [16, 64, 256, 1024],
+    'includes': [1, 2, 4, 8],
+}
+# How many times the sizes of a ladder must span for its exponent to be fitted
+MIN_SPAN = 2
+
+def sourceSize (directory: str) -> int:
+    '''How many bytes the files of the corpus have'''
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+def measure (shape: dict, repeat: int) -> dict:
+    '''Generates the corpus of this shape and measures its front end, keeping the best of `repeat` runs'''
+    with tempfile.TemporaryDirectory() as directory:
+        path = generateCorpus(directory, Generator(**shape))
+        size = sourceSize(directory)
+        parse_seconds = ast_seconds = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tokens = parseSourceFile(path)
+            parse_seconds = min(parse_seconds, time.perf_counter() - start)
+            start = time.perf_counter()
+            ast = constructAST(tokens)
+            ast_seconds = min(ast_seconds, time.perf_counter() - start)
+    return {
+        'shape': shape,
+        'bytes': size,
+        'tokens': len(tokens),
+        'nodes': countNodes(ast),
+        'parse_seconds': parse_seconds,
+        'ast_seconds': ast_seconds,
+    }
+
+def exponent (points: list[tuple[float, float]]) -> float | None:
+    '''The least squares slope of log(y) over log(x), or `None` if the xs don't span
+    at least `MIN_SPAN` times their smallest value, the slope would be noise'''
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2 or max(x for x, _ in points) - min(x for x, _ in points) < math.log(MIN_SPAN):
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x)**2 for x, _ in points)
+
+def main () -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the front end over synthetic corpora')
+    parser.add_argument('--dimensions', nargs='+', choices=list(LADDERS), default=list(LADDERS), help='the dimensions to vary. Default is all of them.')
+    parser.add_argument('--repeat', type=int, default=3, help='how many times each corpus is parsed, the best of them is kept. Default is 3.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='how much above 1 an exponent can be before being flagged. Default is 0.2.')
+    parser.add_argument('-o', '--output', metavar='FILE', help='write the results to FILE as JSON.')
+    options = parser.parse_args()
+
+    log = lambda message: print(message, file=sys.stderr)
+    results = {}
+    flagged = 0
+    for dimension in options.dimensions:
+        measurements = []
+        for value in LADDERS[dimension]:
+            measurement = measure({**BASE, dimension: value}, options.repeat)
+            measurements.append(measurement)
+            log(f"⏱️  {caseName(dimension, value)}: {measurement['tokens']} tokens at {measurement['tokens'] / measurement['parse_seconds']:,.0f} tokens/s, {measurement['nodes']} nodes at {measurement['nodes'] / measurement['ast_seconds']:,.0f} nodes/s")
+        parse_exponent = exponent([(measurement['bytes'], measurement['parse_seconds']) for measurement in measurements])
+        ast_exponent = exponent([(measurement['tokens'], measurement['ast_seconds']) for measurement in measurements])
+        for phase, value in [('parse', parse_exponent), ('AST', ast_exponent)]:
+            if value is None:
+                continue
+            if value > 1 +options.tolerance:
+                flagged += 1
+                log(f"❌ {dimension}: the {phase} time grows as size^{value:.2f}")
+            else:
+                log(f"📈 {dimension}: the {phase} time grows as size^{value:.2f}")
+        results[dimension] = {'measurements': measurements, 'parse_exponent': parse_exponent, 'ast_exponent': ast_exponent}
+
+    if options.output is not None:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    log(f"{flagged} non-linear phase{['', 's'][0 if flagged == 1 else 1]}")
+    return 1 if flagged != 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+'''The binary format of operations. Exports already computed operations
+to a compact file, that can then be mapped back in memory and
+analysed as it is, without re-creating the Operations.
+
+### File structure:
+All the numbers are little-endian.
+    - The header, check `HEADER`.
+    - The constants: every distinct number of the operations, and the names
+of the Inputs, one after the other. Each one is a kind (1 byte), a
+length (4 bytes) and that many bytes. Ints are in two's complement, floats
+are 8 bytes doubles and names are UTF-8.
+    - The op codes: one byte per node, the index of the op in the OP_SET, or `INPUT`.
+    - The `a` and `b` references: 8 bytes each per node. A reference is either
+the index of a node, or `-(c +1)` for the constant `c`. The nodes come
+after their arguments, so a node only references the ones before it. For an
+Input, `a` is its name and `b` is the value it was given.
+    - The roots: two references each, the root itself and its result.
+    - The offsets of the constants: 8 bytes each, relative to the start of the constants.
+    - The parameters: one reference each, to the name of a parameter of the main
+function, in its order. Only the operations constructed with symbolic inputs have them.
+    - The control parameters: two references each, the name of a parameter that controls
+the bounds of a for loop, and the value it was specialized for. The operation is only
+valid for these values.'''
+
+from core import OP_SET, Operation, Input, uniqueOperations
+from numbers import Number
+from typing import BinaryIO, Sequence
+from array import array
+import struct
+import mmap
+import sys
+
+MAGIC = b'MALANGOP'
+VERSION = 3
+# magic, version, nodes count, roots count, constants count, parameters count, control parameters count, and the offsets of
+#   the constants, op codes, a references, b references, roots, constants offsets, parameters and control parameters
+HEADER = struct.Struct('<8sIQQQQQQQQQQQQQ')
+CONSTANT = struct.Struct('<BI')
+
+OPS = list(OP_SET)
+INPUT = 0xFF # The op code of the Inputs
+
+INT = 0
+FLOAT = 1
+NAME = 2
+
+def encodeConstant (constant: Number | str) -> bytes:
+    '''Returns the bytes of the constant record of a number or a name'''
+    if type(constant) is int:
+        payload = constant.to_bytes(constant.bit_length() // 8 +1, 'little', signed=True)
+        return CONSTANT.pack(INT, len(payload)) + payload
+    elif type(constant) is float:
+        return CONSTANT.pack(FLOAT, 8) + struct.pack('<d', constant)
+    elif type(constant) is str:
+        payload = constant.encode('utf-8')
+        return CONSTANT.pack(NAME, len(payload)) + payload
+    assert False, f"Neither an int, a float nor a name: {constant}"
+
+def decodeConstant (buffer: memoryview | mmap.mmap, start: int) -> Number | str:
+    '''Decodes the constant record that starts at `start` in the buffer'''
+    kind, length = CONSTANT.unpack_from(buffer, start)
+    payload = buffer[start + CONSTANT.size : start + CONSTANT.size + length]
+    if kind == INT:
+        return int.from_bytes(payload, 'little', signed=True)
+    elif kind == FLOAT:
+        return struct.unpack('<d', payload)[0]
+    elif kind == NAME:
+        return str(payload, 'utf-8')
+    raise Exception(f"❌ INVALID FILE: A constant is of an unknown kind {kind}")
+
+def keyOf (constant: Number | str) -> tuple:
+    '''The key that identifies a constant. Floats are identified
+    by their bytes, so that `0.0` and `-0.0` are not merged'''
+    if type(constant) is float:
+        return (float, struct.pack('<d', constant))
+    return (type(constant), constant)
+
+def align (stream: BinaryIO) -> None:
+    '''Pads the stream so that what comes next is 8 bytes aligned'''
+    padding = -stream.tell() % 8
+    stream.write(bytes(padding))
+
+def writeOperations (roots: Sequence[Number | Operation], stream: BinaryIO, parameters: Sequence[str]=(), control: dict[str, Number] | None=None) -> None:
+    '''Writes the roots, operations or numbers, to the stream in the binary format.
+    The Operations shared between the roots are written once.\n
+    `parameters`: the names of the main function's parameters, in order, for
+    the Inputs to be given values by their position when loaded. Check `MappedOperations.parameters`\n
+    `control`: maps the names of the parameters that control the bounds of for loops
+    to the values they were specialized for. Check `MappedOperations.control`\n
+    The operations are gone over once, and everything is written as it
+    goes, except for the op codes and the references that are
+    kept in compact arrays until the end. Only the header is written again
+    at the end, so the stream must be seekable.'''
+    start = stream.tell()
+    stream.write(bytes(HEADER.size)) # Filled at the end
+
+    constants_start = stream.tell()
+    constants = {} # Maps the key of a constant to its index
+    constants_offsets = array('q')
+    offset = 0
+
+    def constantOf (constant: Number | str) -> int:
+        '''Returns the reference of the constant, writing it if it's new'''
+        nonlocal offset
+        key = keyOf(constant)
+        index = constants.get(key)
+        if index is None:
+            index = len(constants_offsets)
+            constants[key] = index
+            constants_offsets.append(offset)
+            record = encodeConstant(constant)
+            stream.write(record)
+            offset += len(record)
+        return -(index +1)
+
+    ops = bytearray()
+    a_refs = array('q')
+    b_refs = array('q')
+    indexes = {} # Maps the id of an Operation to its index
+
+    def referenceOf (argument: Number | Operation) -> int:
+        if isinstance(argument, Operation):
+            return indexes[id(argument)]
+        return constantOf(argument)
+
+    visited = set()
+    root_refs = array('q')
+    for root in roots:
+        if isinstance(root, Operation):
+            for node in uniqueOperations(root, visited):
+                indexes[id(node)] = len(ops)
+                if type(node) is Input:
+                    ops.append(INPUT)
+                    a_refs.append(constantOf(node.name))
+                    b_refs.append(constantOf(node.result))
+                else:
+                    ops.append(OPS.index(node.op))
+                    a_refs.append(referenceOf(node.a))
+                    b_refs.append(referenceOf(node.b))
+            root_refs.append(indexes[id(root)])
+            root_refs.append(constantOf(root.result))
+        else:
+            assert isinstance(root, Number), f"Neither a Number nor an Operation: {root}"
+            root_refs.append(constantOf(root))
+            root_refs.append(constantOf(root))
+    parameter_refs = array('q', [constantOf(parameter) for parameter in parameters])
+    control_refs = array('q')
+    for parameter, value in (control or {}).items():
+        control_refs.append(constantOf(parameter))
+        control_refs.append(constantOf(value))
+
+    if sys.byteorder != 'little':
+        for refs in (a_refs, b_refs, root_refs, constants_offsets, parameter_refs, control_refs):
+            refs.byteswap()
+
+    offsets = []
+    for section in (ops, a_refs, b_refs, root_refs, constants_offsets, parameter_refs, control_refs):
+        align(stream)
+        offsets.append(stream.tell() - start)
+        stream.write(section)
+    end = stream.tell()
+
+    stream.seek(start)
+    stream.write(HEADER.pack(MAGIC, VERSION, len(ops), len(roots), len(constants_offsets), len(parameter_refs), len(control_refs) // 2, constants_start - start, *offsets))
+    stream.seek(end)
+
+def exportOperations (roots: Sequence[Number | Operation], file_path: str, parameters: Sequence[str]=(), control: dict[str, Number] | None=None) -> None:
+    '''Writes the roots to the file in the binary format. Check `writeOperations()`'''
+    with open(file_path, 'wb') as file:
+        writeOperations(roots, file, parameters, control)
+
+class MappedOperations ():
+    '''Operations exported in the binary format, mapped in memory as
+    they are. Nothing is created per node when loading, the op codes
+    and the references are read straight from the mapped file.\n
+    The nodes are referred to by their index, and the constants
+    are only decoded when needed.'''
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.__file = open(file_path, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self.__map)
+        self.__views = [buffer]
+
+        if len(buffer) < HEADER.size:
+            self.close()
+            raise Exception(f"❌ INVALID FILE: `{file_path}` is too short to be an exported operation")
+        magic, version, nodes_count, roots_count, constants_count, parameters_count, control_count, constants_start, ops_start, a_start, b_start, roots_start, offsets_start, parameters_start, control_start = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            self.close()
+            raise Exception(f"❌ INVALID FILE: `{file_path}` is not an exported operation")
+        if version != VERSION:
+            self.close()
+            raise Exception(f"❌ INVALID FILE: `{file_path}` is of version {version}, only version {VERSION} is supported")
+
+        views = self.__views # To release them when closing
+
+        def view (start: int, count: int) -> Sequence[int]:
+            '''A view of `count` 8 bytes signed integers'''
+            section = buffer[start : start + count*8]
+            views.append(section)
+            if sys.byteorder == 'little':
+                section = section.cast('q')
+                views.append(section)
+                return section
+            swapped = array('q', section) # Can't be read as it is
+            swapped.byteswap()
+            return swapped
+
+        self.__views = views
+        self.__buffer = buffer
+        self.nodes_count = nodes_count
+        self.ops = buffer[ops_start : ops_start + nodes_count]
+        views.append(self.ops)
+        self.a = view(a_start, nodes_count)
+        self.b = view(b_start, nodes_count)
+        self.__roots = view(roots_start, roots_count*2)
+        self.__constants_start = constants_start
+        self.__constants_offsets = view(offsets_start, constants_count)
+        self.__constants = {} # The decoded constants, by index
+        self.__parameters = view(parameters_start, parameters_count)
+        self.__control = view(control_start, control_count*2)
+
+    @property
+    def roots (self) -> list[int]:
+        '''The references of the roots'''
+        return [self.__roots[2*i] for i in range(len(self.__roots) // 2)]
+
+    @property
+    def results (self) -> list[Number]:
+        '''The results that the roots had when they were exported'''
+        return [self.constant(self.__roots[2*i +1]) for i in range(len(self.__roots) // 2)]
+
+    def constant (self, reference: int) -> Number | str:
+        '''Decodes the constant of the reference'''
+        assert reference < 0, f"Not the reference of a constant: {reference}"
+        index = -reference -1
+        try:
+            return self.__constants[index]
+        except KeyError:
+            pass
+        constant = decodeConstant(self.__buffer, self.__constants_start + self.__constants_offsets[index])
+        self.__constants[index] = constant
+        return constant
+
+    @property
+    def parameters (self) -> list[str]:
+        '''The names of the main function's parameters, in order, as given
+        to `writeOperations()`. The Inputs are named after them, though the
+        ones the operation doesn't depend on have none'''
+        return [self.constant(reference) for reference in self.__parameters]
+
+    @property
+    def control (self) -> dict[str, Number]:
+        '''Maps the names of the parameters that control the bounds of for
+        loops to the values they were specialized for. The operation is
+        only valid when they have these exact same values'''
+        return {self.constant(self.__control[2*i]): self.constant(self.__control[2*i +1]) for i in range(len(self.__control) // 2)}
+
+    def inputs (self) -> dict[str, int]:
+        '''Maps the names of the Inputs to their nodes'''
+        return {self.constant(self.a[i]): i for i in range(self.nodes_count) if self.ops[i] == INPUT}
+
+    def operationsCounts (self) -> list[int]:
+        '''The mathematical operations count of each root, same
+        as `Operation.operations_count`'''
+        counts = [0] * self.nodes_count
+        ops, a, b = self.ops, self.a, self.b
+        for i in range(self.nodes_count):
+            if ops[i] == INPUT:
+                continue
+            count = 1
+            if a[i] >= 0:
+                count += counts[a[i]]
+            if b[i] >= 0:
+                count += counts[b[i]]
+            counts[i] = count
+        return [counts[root] if root >= 0 else 0 for root in self.roots]
+
+    def evaluate (self, inputs: dict[str, Number] | None=None) -> list[Number]:
+        '''Re-evaluates the roots, with the given values for the Inputs, by
+        their names, and returns their results. The Inputs that are not given
+        keep the value they had. Gives the same results as the Operations
+        did, the `((x^2)^0.5)` special case and the int results included.\n
+        The values given to the control parameters must be the ones the
+        operation was specialized for. Check `control`'''
+        if inputs is None:
+            inputs = {}
+        for parameter, value in self.control.items():
+            if parameter in inputs and inputs[parameter] != value:
+                raise Exception(f"❌ INVALID ARGUMENTS: This operation was specialized for `{parameter}` = {value}, because it controls the bounds of for loops, yet {inputs[parameter]} was given. Export it again with this value instead.")
+        values = [None] * self.nodes_count
+        ops, a, b = self.ops, self.a, self.b
+        POW = OPS.index(OP_SET.POW)
+        functions = [op.function for op in OPS]
+
+        def valueOf (reference: int) -> Number:
+            if reference >= 0:
+                return values[reference]
+            return self.constant(reference)
+
+        def isConstant (reference: int, constant: Number) -> bool:
+            '''Whether the reference is this exact constant, type included'''
+            if reference >= 0:
+                return False
+            value = self.constant(reference)
+            return type(value) is type(constant) and value == constant
+
+        for i in range(self.nodes_count):
+            op = ops[i]
+            if op == INPUT:
+                name = self.constant(a[i])
+                values[i] = inputs[name] if name in inputs else self.constant(b[i])
+                continue
+
+            # The absolute function, ((x^2)^0.5), same check as the Operation
+            if (op == POW and isConstant(b[i], 0.5) and a[i] >= 0 and
+                    ops[a[i]] == POW and isConstant(b[a[i]], 2)):
+                result = abs(valueOf(a[a[i]]))
+            else:
+                result = functions[op](valueOf(a[i]), valueOf(b[i]))
+            if type(result) is not int:
+                int_result = int(result)
+                if int_result == result:
+                    result = int_result
+            values[i] = result
+
+        return [valueOf(root) for root in self.roots]
+
+    def close (self) -> None:
+        '''Releases the mapped file. The views must not be used after it'''
+        for view in reversed(self.__views):
+            view.release()
+        self.__map.close()
+        self.__file.close()
+
+    def __enter__(self) -> MappedOperations:
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+def loadOperations (file_path: str) -> MappedOperations:
+    '''Maps the exported operations of the file. Check `MappedOperations`'''
+    return MappedOperations(file_path)
+
+class Difference ():
+    '''The structural difference between two exported operations:\n
+    - `common`: how many distinct sub operations they both have\n
+    - `only_first`: how many distinct sub operations only the first one has\n
+    - `only_second`: how many distinct sub operations only the second one has\n
+    - `same_results`: whether their roots have the same results'''
+
+    def __init__(self, common: int, only_first: int, only_second: int, same_results: bool) -> None:
+        self.common = common
+        self.only_first = only_first
+        self.only_second = only_second
+        self.same_results = same_results
+
+    def __str__(self) -> str:
+        return f"{self.common} sub operations in common, {self.only_first} only in the first one, {self.only_second} only in the second one, and {['different', 'the same'][int(self.same_results)]} results"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+def difference (first: MappedOperations, second: MappedOperations) -> Difference:
+    '''Compares two exported operations by their structure, directly
+    over their mapped files. Two sub operations are the same if they
+    have the same op and the same arguments, recursively. The
+    Inputs are the same if they have the same name.'''
+    canonicals = {} # Maps the structural key of a node to its canonical number
+
+    def canonicalsOf (operations: MappedOperations) -> set[int]:
+        nodes = [0] * operations.nodes_count # The canonical number of each node
+        ops, a, b = operations.ops, operations.a, operations.b
+
+        def referenceKeyOf (reference: int) -> tuple:
+            if reference >= 0:
+                return (nodes[reference],)
+            return keyOf(operations.constant(reference))
+
+        for i in range(operations.nodes_count):
+            if ops[i] == INPUT:
+                key = (INPUT, operations.constant(a[i]))
+            else:
+                key = (ops[i], referenceKeyOf(a[i]), referenceKeyOf(b[i]))
+            nodes[i] = canonicals.setdefault(key, len(canonicals))
+        return set(nodes)
+
+    first_nodes = canonicalsOf(first)
+    second_nodes = canonicalsOf(second)
+    first_results = first.results
+    second_results = second.results
+    same_results = len(first_results) == len(second_results) and all(type(x) is type(y) and x == y for x, y in zip(first_results, second_results))
+    return Difference(len(first_nodes & second_nodes), len(first_nodes - second_nodes), len(second_nodes - first_nodes), same_results)
+
+def rebuildOperations (operations: MappedOperations) -> list[Number | Operation]:
+    '''Creates back the Operations of the exported roots, and returns the
+    roots. The Operations shared between the roots are shared again. Unlike
+    the analyses, this creates an object per node, as it's meant to continue
+    computing with them.'''
+    nodes = [None] * operations.nodes_count
+    ops, a, b = operations.ops, operations.a, operations.b
+
+    def valueOf (reference: int) -> Number | Operation:
+        if reference >= 0:
+            return nodes[reference]
+        return operations.constant(reference)
+
+    for i in range(operations.nodes_count):
+        if ops[i] == INPUT:
+            nodes[i] = Input(operations.constant(a[i]), operations.constant(b[i]))
+        else:
+            nodes[i] = Operation(OPS[ops[i]], valueOf(a[i]), valueOf(b[i]))
+    return [valueOf(root) for root in operations.roots]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+'''Resource budgets. Limits what the construction of a program can
+consume, and lets it be cancelled from another thread. The construction
+checks them cooperatively as it goes, and stops cleanly once one is exceeded'''
+
+from core import Operation, currentContext
+from typing import Any
+import time
+
+# How many ticks there are between two checks of the time, and of the resident set size
+TIME_CHECK_TICKS = 256
+RSS_CHECK_TICKS = 4096
+
+# The names of the limits, as accepted by `Budget()`
+LIMITS = ['max_objects', 'max_operations', 'max_iterations', 'timeout', 'max_rss']
+
+class BudgetExceeded (Exception):
+    '''Raised by the construction once a budget is exceeded, or it's cancelled:\n
+    - `budget`: the name of the exceeded limit, one of the `LIMITS`, or `cancelled`\n
+    - `limit`: its value, `None` if cancelled\n
+    - `location`: where the construction stopped in the source\n
+    - `usage`: what was consumed so far. Check `Budget.usage()`'''
+
+    def __init__(self, budget: str, limit: Any, location: str, usage: dict) -> None:
+        self.budget = budget
+        self.limit = limit
+        self.location = location
+        self.usage = usage
+        if budget == 'cancelled':
+            message = "❌ CANCELLED: The construction was cancelled"
+        else:
+            message = f"❌ BUDGET EXCEEDED: The construction went over its `{budget}` of {limit}"
+        used = ', '.join(f"{name} {'-' if value is None else value}" for name, value in usage.items())
+        super().__init__(f"{message}\n{location}\nUsed: {used}")
+
+    @property
+    def report (self) -> dict:
+        '''The same, as a dict that can be written as JSON'''
+        return {'budget': self.budget, 'limit': self.limit, 'location': self.location, 'usage': self.usage}
+
+class Budget ():
+    '''The budget of a single construction. Any limit that is `None` is not checked:\n
+    - `max_objects`: how many Operation objects can be created\n
+    - `max_operations`: how many mathematical operations a single Operation can stand for,
+    the whole program included\n
+    - `max_iterations`: how many iterations the unwrapped for loops can have, all together\n
+    - `timeout`: how many seconds the construction can take\n
+    - `max_rss`: how many bytes the resident set size of the process can get to\n
+    It's given to `constructProgram()`, and `cancel()` stops it from any other
+    thread, at its next check. Either way, `BudgetExceeded` is raised.'''
+
+    def __init__(self, max_objects: int | None=None, max_operations: int | None=None, max_iterations: int | None=None, timeout: float | None=None, max_rss: int | None=None) -> None:
+        self.max_objects = max_objects
+        self.max_operations = max_operations
+        self.max_iterations = max_iterations
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.cancelled = False
+        self.iterations = 0
+        self.operations = 0 # The most a created Operation stood for
+        self.__ticks = 0
+        self.__start = None
+        self.__deadline = None
+
+    def cancel (self) -> None:
+        '''Cancels the construction, at its next check'''
+        self.cancelled = True
+
+    def start (self) -> None:
+        '''Starts the clock, when the construction starts'''
+        self.__start = time.perf_counter()
+        if self.timeout is not None:
+            self.__deadline = self.__start + self.timeout
+
+    def usage (self, rss: int | None=None) -> dict:
+        '''What was consumed so far: the Operation objects created, the most mathematical operations
+        a single one stood for, the iterations of the for loops, the seconds and the RSS in bytes'''
+        from memstats import currentRSS
+        return {
+            'objects': currentContext().objects_count,
+            'operations': self.operations,
+            'iterations': self.iterations,
+            'seconds': None if self.__start is None else round(time.perf_counter() - self.__start, 6),
+            'rss': rss if rss is not None else currentRSS(),
+        }
+
+    def exceeded (self, budget: str, token: Any, rss: int | None=None) -> None:
+        '''Raises that the `budget` was exceeded while evaluating the `token`'''
+        limit = None if budget == 'cancelled' else getattr(self, budget)
+        raise BudgetExceeded(budget, limit, token.location(), self.usage(rss))
+
+    def tick (self, token: Any) -> None:
+        '''Checks whether it's cancelled, and every so many ticks the time and the
+        RSS. Called as the construction goes, at the `token`'''
+        if self.cancelled:
+            self.exceeded('cancelled', token)
+        self.__ticks += 1
+        if self.__deadline is not None and self.__ticks % TIME_CHECK_TICKS == 0 and time.perf_counter() > self.__deadline:
+            self.exceeded('timeout', token)
+        if self.max_rss is not None and self.__ticks % RSS_CHECK_TICKS == 0:
+            from memstats import currentRSS
+            rss = currentRSS()
+            if rss is not None and rss > self.max_rss:
+                self.exceeded('max_rss', token, rss)
+
+    def created (self, operation: Operation, token: Any) -> None:
+        '''The `operation` of the `token` was just created'''
+        if self.max_objects is not None and currentContext().objects_count > self.max_objects:
+            self.exceeded('max_objects', token)
+        if operation.operations_count > self.operations:
+            self.operations = operation.operations_count
+            if self.max_operations is not None and self.operations > self.max_operations:
+                self.exceeded('max_operations', token)
+        self.tick(token)
+
+    def iterated (self, token: Any) -> None:
+        '''An iteration of the for loop of the `token` is about to be unwrapped'''
+        self.iterations += 1
+        if self.max_iterations is not None and self.iterations > self.max_iterations:
+            self.exceeded('max_iterations', token)
+        self.tick(token)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+'''Checkpoints. Saves the state of a program that is being constructed to
+a file, every so often, so that it can be resumed from there
+instead of from the start.\n
+Part of the state is pickled, and unpickling a file can run arbitrary
+code. The files are checked to be checkpoints before being unpickled, but
+that only catches the wrong files, not the malicious ones. Only resume
+the checkpoints that come from a trusted source'''
+
+from core import Operation, currentContext
+from binary import writeOperations, loadOperations, rebuildOperations
+from numbers import Number
+from typing import Any
+import signal
+import pickle
+import struct
+import time
+import os
+
+MAGIC = b'MALANGCP'
+VERSION = 3
+# magic, version, and the offset of the pickled state. At the very end of the file, the operations are at its start
+TRAILER = struct.Struct('<8sIQ')
+
+class Checkpoint ():
+    '''The state of the main scope between two of its instructions, when
+    nothing else is being evaluated:\n
+    - `content`: the instructions that are left, the unwrapped for loops included\n
+    - `vars`: the variables of the main scope, its return variable included\n
+    - `funcs`: the functions of the main scope\n
+    - `starter`: the token that started the main scope\n
+    - `args`: the arguments of the main function, in case it's not extracted yet\n
+    - `operations_count`: how many Operation objects were created at that point\n
+    - `hoisted_count`: how many variables the hoister synthesized at that point\n
+    - `options`: the options the program was being constructed with, that
+    must stay the same when resuming'''
+
+    def __init__(self, content: list, vars: dict, funcs: list, starter: Any, args: list[Number], operations_count: int, hoisted_count: int, options: dict) -> None:
+        self.content = content
+        self.vars = vars
+        self.funcs = funcs
+        self.starter = starter
+        self.args = args
+        self.operations_count = operations_count
+        self.hoisted_count = hoisted_count
+        self.options = options
+
+def saveCheckpoint (checkpoint: Checkpoint, file_path: str) -> None:
+    '''Writes the checkpoint to the file. The Operations of the variables
+    are written in the binary format, followed by the rest
+    of the state, pickled. The file is replaced at once, so a
+    crash while saving leaves the previous checkpoint as it was.'''
+    roots = []
+    vars = {}
+    for var, state in checkpoint.vars.items():
+        if isinstance(state, Operation):
+            vars[var] = len(roots)
+            roots.append(state)
+        else:
+            vars[var] = state # Numbers are pickled as they are
+
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        writeOperations(roots, file)
+        state_start = file.tell()
+        state = {
+            'content': checkpoint.content,
+            'vars': vars,
+            'operation_vars': [var for var, state in checkpoint.vars.items() if isinstance(state, Operation)],
+            'funcs': checkpoint.funcs,
+            'starter': checkpoint.starter,
+            'args': checkpoint.args,
+            'operations_count': checkpoint.operations_count,
+            'hoisted_count': checkpoint.hoisted_count,
+            'options': checkpoint.options,
+        }
+        pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+        file.write(TRAILER.pack(MAGIC, VERSION, state_start))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, file_path)
+
+def loadCheckpoint (file_path: str) -> Checkpoint:
+    '''Reads back a checkpoint saved with `saveCheckpoint()`, and
+    creates back the Operations of its variables. The file must end
+    with the trailer of this version, and start with exported operations,
+    otherwise it's rejected before anything is unpickled'''
+    with open(file_path, 'rb') as file:
+        size = file.seek(0, os.SEEK_END)
+        if size < TRAILER.size:
+            raise Exception(f"❌ INVALID CHECKPOINT: `{file_path}` is too short to be a checkpoint")
+        file.seek(-TRAILER.size, os.SEEK_END)
+        magic, version, state_start = TRAILER.unpack(file.read(TRAILER.size))
+        if magic != MAGIC:
+            raise Exception(f"❌ INVALID CHECKPOINT: `{file_path}` is not a checkpoint")
+        if version != VERSION:
+            raise Exception(f"❌ INVALID CHECKPOINT: `{file_path}` is of version {version}, only version {VERSION} is supported")
+        if state_start >= size - TRAILER.size:
+            raise Exception(f"❌ INVALID CHECKPOINT: `{file_path}` is truncated")
+
+        with loadOperations(file_path) as operations: # Checks the header of the operations
+            roots = rebuildOperations(operations)
+        file.seek(state_start)
+        state = pickle.load(file)
+
+    vars = state['vars']
+    for var in state['operation_vars']:
+        vars[var] = roots[vars[var]]
+
+    return Checkpoint(state['content'], vars, state['funcs'], state['starter'], state['args'], state['operations_count'], state['hoisted_count'], state['options'])
+
+class Checkpointer ():
+    '''Decides when to save checkpoints, and saves them. Either
+    every `interval` seconds, or every `operations_interval` created Operations, or
+    both, whichever comes first. And also when interrupted (Ctrl + c), after
+    which the construction is stopped.\n
+    The runner asks it between every two instructions of the main scope.'''
+
+    def __init__(self, file_path: str, interval: float | None, operations_interval: int | None, options: dict) -> None:
+        '''`options`: the options the program is constructed with, saved with the checkpoints'''
+        self.file_path = file_path
+        self.interval = interval
+        self.operations_interval = operations_interval
+        self.options = options
+        self.saved_count = 0
+        self.interrupted = False
+        self.__previous_handler = None
+        self.__last_time = time.monotonic()
+        self.__last_count = currentContext().objects_count
+
+    def start (self) -> None:
+        '''Starts counting, and catches the interruptions'''
+        self.__last_time = time.monotonic()
+        self.__last_count = currentContext().objects_count
+
+        def interrupt (signum, frame) -> None:
+            if self.interrupted: # Interrupted twice, stop right away
+                raise KeyboardInterrupt
+            self.interrupted = True
+
+        self.__previous_handler = signal.signal(signal.SIGINT, interrupt)
+
+    def stop (self) -> None:
+        '''Stops catching the interruptions'''
+        if self.__previous_handler is not None:
+            signal.signal(signal.SIGINT, self.__previous_handler)
+            self.__previous_handler = None
+
+    def isDue (self) -> bool:
+        '''Whether a checkpoint should be saved now'''
+        if self.interrupted:
+            return True
+        if self.operations_interval is not None and currentContext().objects_count - self.__last_count >= self.operations_interval:
+            return True
+        return self.interval is not None and time.monotonic() - self.__last_time >= self.interval
+
+    def save (self, content: list, vars: dict, funcs: list, starter: Any, args: list[Number]) -> None:
+        '''Saves a checkpoint of the main scope. Check `Checkpoint`. If
+        it was interrupted, then the construction is stopped afterwards'''
+        context = currentContext()
+        saveCheckpoint(Checkpoint(content, vars, funcs, starter, args, context.objects_count, context.hoisted_count, self.options), self.file_path)
+        self.saved_count += 1
+        self.__last_time = time.monotonic()
+        self.__last_count = context.objects_count
+        if self.interrupted:
+            self.stop()
+            raise Exception(f"🛑 INTERRUPTED: Saved a checkpoint to `{self.file_path}`. Run with `--resume {self.file_path}` to continue from there.")
+
+def restore (checkpoint: Checkpoint) -> None:
+    '''Restores the counters of the current run to what they were when the checkpoint was saved'''
+    context = currentContext()
+    context.objects_count = checkpoint.operations_count
+    context.hoisted_count = checkpoint.hoisted_count
@@ -0,0 +1,77 @@
+'''The client of the evaluation daemon. Sends it the run requests and
+prints their results. Only imports what talking over a socket needs, so
+that it starts faster than running the program in this process would.
+Check `daemon.py` for the requests and the responses'''
+
+import socket
+import json
+import sys
+import os
+
+# The options that `--client` takes into account. Check `runClient()`
+CLIENT_OPTIONS = {'file_path', 'client', 'verbose', 'interpret', 'hoist', 'inline_threshold', 'max_objects', 'max_operations', 'max_iterations', 'timeout', 'max_rss', 'startup_profile'}
+
+def sendRequest (socket_path: str, request: dict) -> dict:
+    '''Sends a single run request to the daemon listening on `socket_path`, and returns its response'''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode() +b'\n')
+        with client.makefile('rb') as file:
+            line = file.readline()
+    if not line:
+        raise Exception(f"❌ NO RESPONSE: The daemon on `{socket_path}` closed the connection")
+    return json.loads(line)
+
+def runClient (options: dict, args: list) -> None:
+    '''Runs a program on the daemon listening on the `--client`
+    socket instead of in this process, and prints its result'''
+    FILE_PATH = options['file_path']
+    CLIENT = options['client']
+    VERBOSE = options['verbose']
+    INTERPRET = options['interpret']
+    STARTUP_PROFILE = options['startup_profile']
+    
+    # Every option that isn't forwarded to the daemon would be silently ignored, so they're rejected. The
+    #   defaults of `memory_budget` and `metrics_format` only matter along `--spill` and `--metrics-out`
+    unsupported = [option for option, value in options.items() if option not in CLIENT_OPTIONS and option not in ('memory_budget', 'metrics_format') and value is not None and value is not False]
+    if len(unsupported) != 0:
+        flags = [f"`--{option.replace('_', '-')}`" for option in unsupported]
+        raise Exception(f"❌ INVALID OPTIONS: {', '.join(flags)} can't be used with `--client`")
+    
+    response = sendRequest(CLIENT, {
+        'file': os.path.abspath(FILE_PATH),
+        'args': args,
+        'interpret': INTERPRET,
+        'hoist': options['hoist'],
+        'inline_threshold': options['inline_threshold'],
+        # Same as `runner.budgetLimits()`, without importing the runner
+        'budget': {
+            'max_objects': options['max_objects'],
+            'max_operations': options['max_operations'],
+            'max_iterations': options['max_iterations'],
+            'timeout': options['timeout'],
+            'max_rss': options['max_rss'] * 2**20 if options['max_rss'] is not None else None,
+            },
+        })
+    if 'error' in response:
+        raise Exception(response['error'])
+    
+    result = response['result']
+    if VERBOSE:
+        from runner import formatCount # Only when verbose, it's what the client avoids importing
+        count = formatCount(response['operations_count'])
+        objects_count = response['objects_count']
+        if INTERPRET:
+            print(f"📠 The interpreted result is `{result}`")
+        else:
+            print(f"🧾 The result is {result}")
+        print(f"🏃🏻 It took {count} mathematical operation{['', 's'][0 if count == 1 else 1]} to compute the result (but only {objects_count} Operation object{['', 's'][0 if objects_count == 1 else 1]})")
+        print(f"📦 {'Used the already compiled program' if response['cached'] else 'Compiled the program'} in {response['compile_duration']} seconds")
+        print(f"⏱️  Constructing and evaluating the Operation took {response['run_duration']} seconds")
+    else:
+        print(result, end='')
+    if STARTUP_PROFILE:
+        from startup import mark, report
+        mark('run on the daemon')
+        sys.stdout.flush()
+        report(sys.stderr)
@@ -3,8 +3,10 @@ from __future__ import annotations
 '''The core file. Has the possible operations'''
 
 from enum import Enum
-from typing import Callable, Type
+from typing import Callable, Type, Iterator
 from numbers import Number
+from contextlib import contextmanager
+import threading
 
 class OP_SET (Enum):
     '''The possible operations, but I say OP here in the sense of machine OP, like MOV or JMP'''
@@ -45,6 +47,45 @@ class OP_SET (Enum):
     def __repr__(self) -> str:
         return self.__str__()
 
+class Context ():
+    '''The state of a single run, so that many programs can
+    run in the same process, even concurrently from different threads. Each
+    thread has its current context, check `currentContext()` and `runningIn()`.\n
+    - `objects_count`: how many Operation objects were created\n
+    - `hoisted_count`: how many variables were synthesized by the hoister, to number them\n
+    - `scopes_count`: how many Scopes were created\n
+    - `cache_hits`, `cache_misses`: how many included files were taken from
+    the parsing cache, and how many had to be parsed, check `parseSourceFile()`'''
+    
+    def __init__(self) -> None:
+        self.objects_count = 0
+        self.hoisted_count = 0
+        self.scopes_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+class _Current (threading.local):
+    def __init__(self) -> None:
+        '''The current context of each thread'''
+        self.context = Context()
+
+_current = _Current()
+
+def currentContext () -> Context:
+    '''The context of the run going on in this thread'''
+    return _current.context
+
+@contextmanager
+def runningIn (context: Context) -> Iterator[Context]:
+    '''Makes `context` the current context of this thread
+    for the duration of the `with` block'''
+    previous = _current.context
+    _current.context = context
+    try:
+        yield context
+    finally:
+        _current.context = previous
+
 class Operation ():
     '''An operation object represents a mathematical
     operation (+, -, *,.., namely one from the OP_SET)
@@ -91,17 +132,20 @@ class Operation ():
     float limitations.
     '''
     
-    count = 0
+    # There are millions of them, so no `__dict__` for each one. The weak
+    #   reference is for the spill store
+    __slots__ = ('op', 'a', 'b', 'result', 'operations_count', '__weakref__')
+    
     def __init__(self, op: OP_SET, a: Number | Type[Operation], b: Number | Type[Operation]) -> None:
         '''`op`: the operation to preform, one from the OP_SET\n
         `a`: the first argument as a number or another Operation\n
         `b`: the second argument as a number or another Operation\n'''
         assert type(op) == OP_SET, f"Not from the OP set: {op}"
-        assert type(a) == Operation or isinstance(a, Number), f"Neither a Number nor an Operation: {a}"
-        assert type(b) == Operation or isinstance(b, Number), f"Neither a Number nor an Operation: {b}"
+        assert isinstance(a, Operation) or isinstance(a, Number), f"Neither a Number nor an Operation: {a}"
+        assert isinstance(b, Operation) or isinstance(b, Number), f"Neither a Number nor an Operation: {b}"
         
-        # Increment the count
-        Operation.count += 1
+        # Increment the count of the current run
+        _current.context.objects_count += 1
         
         # Initial operations count is 1, which is self.
         operations_count = 1 
@@ -112,7 +156,7 @@ class Operation ():
         if (op            is OP_SET.POW and # If this is an exponentiation operation, and
                 type(b)   is float      and # its right hand side is a float, and
                 b         == 0.5        and # that float is equal to 0.5 (square root), and
-                type(a)   is Operation  and # its left hand side is an operation, and
+                isinstance(a, Operation)  and # its left hand side is an operation, and
                 a.op      is OP_SET.POW and # that operation is an exponentiation operation, and
                 type(a.b) is int        and # the right hand side of that operation is an int, and
                 a.b       == 2):            # that int is equal to 2, then
@@ -123,7 +167,7 @@ class Operation ():
             # Then get x, which is the left hand side of (x^2)
             x = a.a
             # Extract its result if it's an operation
-            if type(x) is Operation:
+            if isinstance(x, Operation):
                 x = x.result
             # Finally, apply the abs function
             result = abs(x)
@@ -136,10 +180,10 @@ class Operation ():
             # Then check if they are operations, if so:
             #   - Add their count
             #   - Extract their result
-            if type(a) is Operation:
+            if isinstance(a, Operation):
                 operations_count += a.operations_count
                 a_value = a.result
-            if type(b) is Operation:
+            if isinstance(b, Operation):
                 operations_count += b.operations_count
                 b_value = b.result
             # Now a_value and b_value have the left hand 
@@ -168,4 +212,94 @@ class Operation ():
         return f"({self.a} {self.op} {self.b})"
     
     def __repr__(self) -> str:
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
+
+
+class Input (Operation):
+    '''A symbolic input of a program, a leaf of the operation
+    just like numbers are, except that it stands for a value that
+    can change. For example the parameters of the main function.
+
+    It still has a `result`, which is the value it was given
+    when the operation was created, so that everything
+    can be computed as usual. It's not a mathematical operation, so
+    its `operations_count` is 0, and its `op`, `a` and `b` are `None`.'''
+    
+    __slots__ = ('name',)
+    
+    def __init__(self, name: str, value: Number) -> None:
+        '''`name`: the name of the input, used when printing the operation\n
+        `value`: the value of this input for this computation'''
+        assert type(name) == str, f"Not a string: {name}"
+        assert isinstance(value, Number), f"Not a Number: {value}"
+        
+        self.name = name
+        self.op = None
+        self.a = None
+        self.b = None
+        self.operations_count = 0
+        self.result = value
+    
+    def __str__(self) -> str:
+        return self.name
+
+
+def uniqueOperations (operation: Operation, visited: set[int] | None=None) -> list[Operation]:
+    '''Returns every distinct Operation object reachable
+    from `operation` (itself included) in post-order, that is,
+    each Operation comes after its arguments.\n
+    The traversal is iterative and not recursive, so it
+    works with operations of any depth, and each reused Operation
+    is only listed once. The Inputs are listed too.\n
+    `visited`: the ids of the Operations to skip, because they were already
+    listed. The ids of the listed ones are added to it. Used to go over
+    many operations that share Operations'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+    
+    order = []
+    if visited is None:
+        visited = set()
+    stack = [(operation, False)]
+    while len(stack) != 0:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        stack.append((node, True))
+        # Push b first so that a gets visited first
+        for argument in (node.b, node.a):
+            if isinstance(argument, Operation) and id(argument) not in visited:
+                stack.append((argument, False))
+    return order
+
+
+def findInputs (operation: Operation, memo: dict[int, tuple[Operation, frozenset[Input]]]) -> frozenset[Input]:
+    '''Returns the Inputs that `operation` depends on.\n
+    `memo`: maps the id of an already visited Operation to itself and
+    the Inputs it depends on, so that calling this repeatedly on
+    parts of the same operation does not go over the same Operations
+    again. The Operation is kept in there so that its id can't be reused'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+    
+    stack = [(operation, False)]
+    while len(stack) != 0:
+        node, expanded = stack.pop()
+        if id(node) in memo:
+            continue
+        arguments = [argument for argument in (node.a, node.b) if isinstance(argument, Operation)]
+        if type(node) is Input:
+            memo[id(node)] = (node, frozenset((node,)))
+        elif expanded:
+            inputs = frozenset()
+            for argument in arguments:
+                inputs = inputs.union(memo[id(argument)][1])
+            memo[id(node)] = (node, inputs)
+        else:
+            stack.append((node, True))
+            for argument in arguments:
+                if id(argument) not in memo:
+                    stack.append((argument, False))
+    return memo[id(operation)][1]
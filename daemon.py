@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+'''The evaluation daemon. Listens on a Unix domain socket for run requests
+and dispatches them to a pool of worker processes, that stay warm: each
+one keeps the libraries it parsed and the programs it compiled, so
+running many small programs doesn't pay for starting Python and parsing
+the libraries every time. The client that sends it the requests is in `client.py`.\n
+The requests and the responses are JSON lines, any number of them per
+connection, answered in order. A request is:\n
+- `file`: the absolute path of the program to run\n
+- `args`: the arguments of its main function\n
+- `interpret`, `hoist` and `inline_threshold`: same as the runner's options\n
+And a response has either an `error`, or:\n
+- `result`: the result of the program\n
+- `operations_count` and `objects_count`: check `engine.Stats`\n
+- `cached`: whether the program was already compiled\n
+- `compile_duration`, `run_duration`: how many seconds compiling and running it took'''
+
+from engine import Program
+from budget import Budget, BudgetExceeded
+from runner import parseSourceFile, constructAST, interpretResult, INLINE_THRESHOLD
+from snapshot import loadSnapshot
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+import asyncio
+import json
+import time
+import os
+
+# The caches of the worker processes. Check `compileProgram()`. The libraries start
+#   from their snapshot, loaded by each worker when it starts. Check `initializeWorker()`
+_libraries = {}
+_programs = {}
+
+def initializeWorker () -> None:
+    '''Loads the snapshot of the libraries in a worker, once, when it starts'''
+    global _libraries
+    _libraries = loadSnapshot()
+
+def stamps (paths: set[str]) -> dict[str, tuple[int, int] | None]:
+    '''When each of the files was last modified and its size, `None` for the ones that can't be found'''
+    result = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            result[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            result[path] = None
+    return result
+
+def compileProgram (path: str) -> tuple[Program, bool]:
+    '''Compiles the program at `path`, in a worker, or takes it from its
+    cache if neither it nor what it includes changed since. Also
+    returns whether it was cached'''
+    entry = _programs.get(path)
+    if entry is not None:
+        program, program_stamps = entry
+        if stamps(set(program_stamps)) == program_stamps:
+            return (program, True)
+    includes = set()
+    program = Program(constructAST(parseSourceFile(path, cache=_libraries, includes=includes)))
+    _programs[path] = (program, stamps(includes))
+    return (program, False)
+
+def handle (request: dict) -> dict:
+    '''Handles a single run request, in a worker. Errors are reported in the response'''
+    try:
+        start = time.time()
+        program, cached = compileProgram(request['file'])
+        compile_duration = time.time() - start
+        budget = Budget(**request.get('budget', {}))
+        result = program.run(request.get('args', []), hoist=request.get('hoist', False), inline_threshold=request.get('inline_threshold', INLINE_THRESHOLD), budget=budget)
+    except BudgetExceeded as e:
+        return {'error': str(e), 'budget': e.report}
+    except Exception as e:
+        return {'error': str(e)}
+    return {
+        'result': interpretResult(result.value) if request.get('interpret', False) else result.value,
+        'operations_count': result.stats.operations_count,
+        'objects_count': result.stats.objects_count,
+        'cached': cached,
+        'compile_duration': compile_duration,
+        'run_duration': result.stats.duration,
+        }
+
+async def serve (socket_path: str, workers: int | None=None, ready: Callable[[], None] | None=None) -> None:
+    '''Serves the requests on the Unix domain socket `socket_path` with `workers`
+    processes, until it's cancelled. `ready` is called once it's listening'''
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(workers, initializer=initializeWorker) as pool:
+
+        async def connection (reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                while line := await reader.readline():
+                    try:
+                        request = json.loads(line)
+                        if type(request) is not dict or type(request.get('file')) is not str:
+                            raise ValueError
+                    except ValueError:
+                        response = {'error': f"❌ INVALID REQUEST: `{line.decode(errors='replace').strip()}`"}
+                    else:
+                        response = await loop.run_in_executor(pool, handle, request)
+                    writer.write(json.dumps(response).encode() +b'\n')
+                    await writer.drain()
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(connection, socket_path)
+        try:
+            if ready is not None:
+                ready()
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+'''The embeddable engine. Compiles a Malang program once, and then
+runs it from Python as many times as needed, without printing anything.
+Each run has its own context, so many programs can run in the
+same process, concurrently from different threads too'''
+
+from core import Operation, Context, runningIn
+from runner import Node, parseSourceFile, constructAST, constructProgram, decodeString, INLINE_THRESHOLD
+from numbers import Number
+from typing import Sequence, TextIO, TYPE_CHECKING
+import copy
+import time
+
+if TYPE_CHECKING:
+    from budget import Budget
+    from hooks import Hooks
+
+# The file path given to a source that doesn't come from a file. Its includes are resolved from the working directory
+SOURCE_FILE_PATH = '<source>'
+
+class Stats ():
+    '''What it took to run a program:\n
+    - `operations_count`: how many mathematical operations it took to compute the result\n
+    - `objects_count`: how many Operation objects were created to do so\n
+    - `duration`: how many seconds constructing and computing the operation took'''
+
+    def __init__(self, operations_count: int, objects_count: int, duration: float) -> None:
+        self.operations_count = operations_count
+        self.objects_count = objects_count
+        self.duration = duration
+
+class Result ():
+    '''The result of running a program:\n
+    - `value`: the raw result, a Number\n
+    - `operation`: the Operation that computed it\n
+    - `stats`: check `Stats`'''
+
+    def __init__(self, value: Number, operation: Operation, stats: Stats) -> None:
+        self.value = value
+        self.operation = operation
+        self.stats = stats
+
+    @property
+    def text (self) -> str | None:
+        '''The value decoded as a Malang string, or `None` if it's not one'''
+        return decodeString(self.value)
+
+class Program ():
+    '''A compiled program, that is its AST. It's never changed by
+    the runs, so it can be run many times, concurrently too'''
+
+    def __init__(self, ast: Node) -> None:
+        '''`ast`: the AST of the program, as returned by `constructAST()`'''
+        self.ast = ast
+
+    def run (self, args: Sequence[Number]=(), hoist: bool=False, inline_threshold: int=INLINE_THRESHOLD, output: TextIO | None=None, budget: Budget | None=None, hooks: Hooks | None=None) -> Result:
+        '''Runs the program with `args` as the arguments of its main
+        function. Check `constructProgram()` for the other parameters.\n
+        To stop a run that is taking too long from another thread, give it a `Budget`
+        and call its `cancel()`. The run then raises `BudgetExceeded`.\n
+        To observe the run, give it `Hooks` with callbacks registered for its events'''
+        # The construction unwraps the constant for loops of the AST in place, so each run gets its own
+        ast = copy.deepcopy(self.ast)
+        context = Context()
+        with runningIn(context):
+            start = time.time()
+            operation = constructProgram(ast, list(args), hoist=hoist, inline_threshold=inline_threshold, output=output, budget=budget, hooks=hooks)
+            duration = time.time() - start
+        return Result(operation.result, operation, Stats(operation.operations_count, context.objects_count, duration))
+
+def compile (path: str | None=None, source: str | None=None) -> Program:
+    '''Compiles a program, either from the file at `path`, or from
+    its `source`. If both are given, then the `path` is only used
+    to resolve the includes of the `source` and to point out errors'''
+    if path is None and source is None:
+        raise Exception(f"❌ NOTHING TO COMPILE: Either a path or a source must be given")
+    if path is None:
+        path = SOURCE_FILE_PATH
+    return Program(constructAST(parseSourceFile(path, source)))
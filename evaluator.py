@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+'''Re-evaluation of an already constructed Operation, for
+new values of its Inputs, without constructing it again'''
+
+from core import OP_SET, Operation, Input, uniqueOperations
+from numbers import Number
+from typing import Callable, Sequence
+
+try:
+    import numpy
+except ImportError: # NumPy is optional, it's only used to vectorize the evaluations
+    numpy = None
+
+class Plan ():
+    '''An operation flattened, once, into a list of steps in
+    topological order, so that it can be re-evaluated as many
+    times as needed.\n
+    Every unique Operation, Input and number of the operation
+    gets a slot in a list of values. A step computes the value of
+    an Operation slot from the values of its arguments' slots, the same way
+    the Operation computed its result when it was created. That
+    includes the `((x^2)^0.5)` special case, and keeping the
+    integer results as ints.'''
+
+    def __init__(self, operation: Operation) -> None:
+        '''The attributes are as follow:\n
+        - `inputs`: a `dict` that maps each Input of the operation to its slot\n
+        - `values`: the initial values of the slots, with the numbers in place and the
+        Inputs having the value they were given when the operation was created\n
+        - `steps`: a list of `(slot, function, a_slot, b_slot)`, where `function` is `None`
+        for the absolute function, in which case `a_slot` is the slot of `x`\n
+        - `root`: the slot of the operation itself'''
+        assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+
+        slots = {} # Maps the id of an Operation to its slot
+        values = []
+        inputs = {}
+        steps = []
+
+        def slotOf (argument: Number | Operation) -> int:
+            '''Returns the slot of an already visited Operation, or
+            a new slot for a number'''
+            if isinstance(argument, Operation):
+                return slots[id(argument)]
+            values.append(argument)
+            return len(values) -1
+
+        for node in uniqueOperations(operation):
+            slot = len(values)
+            values.append(node.result)
+            slots[id(node)] = slot
+
+            if type(node) is Input:
+                inputs[node] = slot
+
+            elif isAbsolute(node):
+                steps.append((slot, None, slotOf(node.a.a), None))
+
+            else:
+                steps.append((slot, node.op.function, slotOf(node.a), slotOf(node.b)))
+
+        self.inputs = inputs
+        self.values = values
+        self.steps = steps
+        self.root = slots[id(operation)]
+        self.__levels = None
+
+    def evaluate (self, inputs: dict[Input, Number]) -> Number:
+        '''Evaluates the operation with the given values for its
+        Inputs and returns the result. The Inputs that are not
+        given keep the value they had'''
+        values = self.values.copy()
+        for input, value in inputs.items():
+            values[self.inputs[input]] = value
+
+        for slot, function, a, b in self.steps:
+            if function is None:
+                result = abs(values[a])
+            else:
+                result = function(values[a], values[b])
+            # Same as the Operation, keep the integer results as ints
+            if type(result) is not int:
+                int_result = int(result)
+                if int_result == result:
+                    result = int_result
+            values[slot] = result
+
+        return values[self.root]
+
+    def evaluateMany (self, inputs: dict[Input, Sequence[Number]], vectorize: bool=False) -> list[Number]:
+        '''Evaluates the operation for many values of its Inputs at once.
+        `inputs` maps an Input to the sequence of its values, all of
+        the same length, and the results are returned in that same order.\n
+        By default, each evaluation is done on its own, and gives the same
+        result as `evaluate()`. If `vectorize` is `True` and NumPy is available,
+        the whole sequences go trough each step at once as arrays instead. In that
+        case the computations are done the NumPy way, that is with fixed size
+        numbers, so the big ints overflow or lose precision without any
+        warning, and the integer results are not kept as ints. Only ask for it
+        when the values are known to fit.'''
+        lengths = {len(values) for values in inputs.values()}
+        assert len(lengths) <= 1, f"The sequences of values are not all of the same length"
+
+        if len(inputs) == 0:
+            return []
+
+        if not vectorize or numpy is None:
+            count = lengths.pop()
+            return [self.evaluate({input: values[i] for input, values in inputs.items()}) for i in range(count)]
+
+        values = self.values.copy()
+        for input, array in inputs.items():
+            values[self.inputs[input]] = numpy.asarray(array)
+
+        for slot, function, a, b in self.steps:
+            if function is None:
+                values[slot] = numpy.abs(values[a])
+            else:
+                values[slot] = function(values[a], values[b])
+
+        result = values[self.root]
+        # The result may not depend on the Inputs at all
+        return numpy.broadcast_to(result, (lengths.pop(),)).tolist()
+
+    @property
+    def levels (self) -> Levels:
+        '''The steps scheduled by level. Created the first time it's needed'''
+        if self.__levels is None:
+            self.__levels = Levels(self)
+        return self.__levels
+
+    def evaluateLevels (self, inputs: dict[Input, Number]) -> Number:
+        '''Same as `evaluate()`, and gives the exact same result, but
+        evaluates the steps level by level, with the float computations
+        of each level vectorized with NumPy. Falls back
+        to `evaluate()` if NumPy is not available'''
+        if numpy is None:
+            return self.evaluate(inputs)
+        return self.levels.evaluate(inputs)
+
+class Levels ():
+    '''The steps of a Plan scheduled by level, for a vectorized evaluation.\n
+    The level of a step is one more than the highest level of its
+    arguments, the numbers and the Inputs being at level 0. All the
+    steps of a level only depend on the previous levels, so
+    the steps of a level that have the same op are grouped together
+    and computed with a single NumPy call.\n
+    Only the float computations go trough NumPy, that is when one of
+    the arguments is a float and the other one is either a float or an
+    int that can be represented exactly as a float, and only for the ops
+    that IEEE 754 requires to be correctly rounded: `+`, `-`, `*` and `/`,
+    along with the absolute function. That way they give the exact same
+    result as Python would. `//` and `^` are computed by NumPy and Python
+    with different algorithms, which don't always give the same bits, so
+    they're never vectorized. Which steps are float
+    computations is decided from the values the operation had when
+    it was created, and checked again when evaluating. The rest, namely
+    the int computations that can give arbitrarily big ints, go trough
+    the same scalar path as `Plan.evaluate()`. So does a whole group
+    if NumPy ends up raising any floating point error on it (division
+    by zero, overflow, invalid..), so that Python raises its own error, or
+    gives its own result.\n
+    The values of the slots are kept in a list, same as `Plan.evaluate()`, and
+    mirrored in NumPy arrays: `floats` has the value as a float if it's
+    a float or an exact int, which `is_float` and `exact` respectively
+    say. A value only crosses from one to the other when a step
+    of the other path needs it.'''
+
+    # The largest magnitude under which all ints can be represented exactly as floats
+    EXACT_INT_LIMIT = 2**53
+
+    # Stands for the value of a slot that is only in the arrays
+    PENDING = object()
+
+    def __init__(self, plan: Plan) -> None:
+        '''The attributes are as follow:\n
+        - `plan`: the Plan these levels schedule\n
+        - `levels`: a list of `(groups, steps)`, one per level, in order of evaluation:\n
+            - `groups`: a list of `(function, ufunc, slots, a_slots, b_slots, exports)`, where
+            the slots are NumPy arrays. For the absolute function `function`
+            and `b_slots` are `None` and `ufunc` is `numpy.abs`. `exports` are
+            the indexes in `slots` of the results that the scalar path needs\n
+            - `steps`: the scalar steps, a list of `(slot, function, a_slot, b_slot, mirror)`
+            same as the Plan's steps, where `mirror` says if the result is needed by a group\n
+        - `values`, `floats`, `is_float` and `exact`: the initial state of the values'''
+        assert numpy is not None, f"NumPy is required to schedule the levels"
+
+        UFUNCS = {
+            OP_SET.ADD:  numpy.add,
+            OP_SET.SUB:  numpy.subtract,
+            OP_SET.MUL:  numpy.multiply,
+            OP_SET.DIV:  numpy.true_divide,
+        } # The correctly rounded ops only, check the docstring of the class
+        FUNCTIONS = {op.function: op for op in OP_SET}
+
+        def isExact (value: Number) -> bool:
+            return type(value) is float or (type(value) is int and -self.EXACT_INT_LIMIT < value < self.EXACT_INT_LIMIT)
+
+        count = len(plan.values)
+        levels = [0] * count
+        vectorized = [False] * count # Whether the slot is the result of a group
+        read_by_group = [False] * count
+        read_by_step = [False] * count
+        schedule = {} # Maps a level to its groups, as a dict that maps a function to its lists of slots, and its steps
+        for slot, function, a, b in plan.steps:
+            level = levels[a] if function is None else max(levels[a], levels[b])
+            level += 1
+            levels[slot] = level
+            groups, steps = schedule.setdefault(level, ({}, []))
+
+            a_value = plan.values[a]
+            if function is None:
+                vector = isExact(a_value)
+            else:
+                b_value = plan.values[b]
+                vector = FUNCTIONS[function] in UFUNCS and isExact(a_value) and isExact(b_value) and (type(a_value) is float or type(b_value) is float)
+
+            arguments = (a,) if function is None else (a, b)
+            if vector:
+                group = groups.setdefault(function, ([], [], []))
+                group[0].append(slot)
+                group[1].append(a)
+                group[2].append(b)
+                vectorized[slot] = True
+                for argument in arguments:
+                    read_by_group[argument] = True
+            else:
+                steps.append([slot, function, a, b])
+                for argument in arguments:
+                    read_by_step[argument] = True
+
+        self.plan = plan
+        self.levels = []
+        for level in sorted(schedule):
+            groups, steps = schedule[level]
+            level_groups = []
+            for function, (slots, a_slots, b_slots) in groups.items():
+                ufunc = numpy.abs if function is None else UFUNCS[FUNCTIONS[function]]
+                b_slots = None if function is None else numpy.array(b_slots, dtype=numpy.intp)
+                exports = numpy.array([i for i, slot in enumerate(slots) if read_by_step[slot] or slot == plan.root], dtype=numpy.intp)
+                level_groups.append((function, ufunc, numpy.array(slots, dtype=numpy.intp), numpy.array(a_slots, dtype=numpy.intp), b_slots, exports))
+            level_steps = [(slot, function, a, b, read_by_group[slot]) for slot, function, a, b in steps]
+            self.levels.append((level_groups, level_steps))
+
+        self.values = [self.PENDING if vectorized[slot] else value for slot, value in enumerate(plan.values)]
+        self.floats = numpy.zeros(count)
+        self.is_float = numpy.zeros(count, dtype=bool)
+        self.exact = numpy.zeros(count, dtype=bool)
+        for slot, value in enumerate(plan.values):
+            if not vectorized[slot]:
+                self.mirror(slot, value, self.floats, self.is_float, self.exact)
+
+    @classmethod
+    def mirror (cls, slot: int, value: Number, floats, is_float, exact) -> None:
+        '''Mirrors the value of a slot in the arrays'''
+        if type(value) is float:
+            floats[slot] = value
+            is_float[slot] = True
+            exact[slot] = True
+        else:
+            is_float[slot] = False
+            exact[slot] = type(value) is int and -cls.EXACT_INT_LIMIT < value < cls.EXACT_INT_LIMIT
+            if exact[slot]:
+                floats[slot] = value
+
+    def evaluate (self, inputs: dict[Input, Number]) -> Number:
+        '''Evaluates the operation with the given values for its Inputs
+        and returns the result, the same way `Plan.evaluate()` does'''
+        PENDING = self.PENDING
+        plan = self.plan
+        values = self.values.copy()
+        floats = self.floats.copy()
+        is_float = self.is_float.copy()
+        exact = self.exact.copy()
+        mirror = self.mirror
+        for input, value in inputs.items():
+            slot = plan.inputs[input]
+            values[slot] = value
+            mirror(slot, value, floats, is_float, exact)
+
+        def valueOf (slot: int) -> Number:
+            '''Returns the value of a slot as Python would have it'''
+            value = values[slot]
+            if value is PENDING:
+                value = float(floats[slot]) if is_float[slot] else int(floats[slot])
+                values[slot] = value
+            return value
+
+        def scalar (slot: int, function: Callable | None, a: int, b: int | None) -> Number:
+            '''Computes a step the same way `Plan.evaluate()` does'''
+            if function is None:
+                result = abs(valueOf(a))
+            else:
+                result = function(valueOf(a), valueOf(b))
+            if type(result) is not int:
+                int_result = int(result)
+                if int_result == result:
+                    result = int_result
+            values[slot] = result
+            return result
+
+        for groups, steps in self.levels:
+            for function, ufunc, slots, a_slots, b_slots, exports in groups:
+                # Check that the steps are still float computations
+                if b_slots is None:
+                    eligible = exact[a_slots]
+                else:
+                    eligible = exact[a_slots] & exact[b_slots] & (is_float[a_slots] | is_float[b_slots])
+
+                if eligible.all():
+                    try:
+                        with numpy.errstate(all='raise'):
+                            if b_slots is None:
+                                results = ufunc(floats[a_slots])
+                            else:
+                                results = ufunc(floats[a_slots], floats[b_slots])
+                    except FloatingPointError:
+                        eligible[:] = False
+                    else:
+                        # Same as the Operation, the integer results are ints
+                        integral = results == numpy.trunc(results)
+                        floats[slots] = results
+                        is_float[slots] = ~integral
+                        exact[slots] = ~integral | (numpy.abs(results) < self.EXACT_INT_LIMIT)
+                        if len(exports) != 0:
+                            exported = results[exports]
+                            for slot, value, integer in zip(slots[exports].tolist(), exported.tolist(), integral[exports].tolist()):
+                                values[slot] = int(value) if integer else value
+                        continue
+
+                # Otherwise, the ones that are not go trough the scalar path, and the rest as well so that it's simpler
+                for i in range(len(slots)):
+                    slot = int(slots[i])
+                    result = scalar(slot, function, int(a_slots[i]), None if b_slots is None else int(b_slots[i]))
+                    mirror(slot, result, floats, is_float, exact)
+
+            for slot, function, a, b, needs_mirror in steps:
+                if function is None:
+                    result = abs(values[a])
+                else:
+                    result = function(values[a], values[b])
+                if type(result) is not int:
+                    int_result = int(result)
+                    if int_result == result:
+                        result = int_result
+                values[slot] = result
+                if needs_mirror:
+                    mirror(slot, result, floats, is_float, exact)
+
+        return valueOf(plan.root)
+
+def isAbsolute (operation: Operation) -> bool:
+    '''Whether this operation is the absolute function `((x^2)^0.5)`,
+    the exact same check that the Operation does when it's created'''
+    a = operation.a
+    b = operation.b
+    return (operation.op is OP_SET.POW and
+            type(b) is float and
+            b == 0.5 and
+            isinstance(a, Operation) and
+            a.op is OP_SET.POW and
+            type(a.b) is int and
+            a.b == 2)
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+'''Loop-invariant hoisting. Finds the parts of a for loop's body that
+evaluate to the same thing in every iteration, so that they are
+evaluated once before the loop gets unwrapped, instead of once per iteration'''
+
+from runner import Token, Node
+from core import currentContext
+from typing import Callable, Iterator
+
+RETURN_VAR_NAME = 'res'
+EXTERNAL_RETURN_VAR_NAME = 'ext_res'
+
+class Hoisting ():
+    '''The result of hoisting the invariants of a for loop:\n
+    - `original`: the original Node.FOR_LOOP\n
+    - `assigns`: the Node.VAR_ASSIGNs of the hoisted values, to be
+    evaluated, in this order, right before the loop\n
+    - `for_loop`: the Node.FOR_LOOP whose body references the hoisted
+    values instead of evaluating them. It's the `original` if nothing was hoisted\n
+    - `resolutions`: the function calls that were resolved trough the scope
+    while hoisting, and the Node.FUNC_DEF they were resolved to. Since
+    functions are resolved dynamically, the hoisting only holds for the
+    scopes where these calls resolve the same way'''
+
+    def __init__(self, original: Node, assigns: list[Node], for_loop: Node, resolutions: list[tuple[Node, Node | None]]) -> None:
+        self.original = original
+        self.assigns = assigns
+        self.for_loop = for_loop
+        self.resolutions = resolutions
+
+    def holdsFor (self, resolveCall: Callable[[Node], Node | None] | None) -> bool:
+        '''Whether this hoisting holds for the scope that `resolveCall` resolves from'''
+        if len(self.resolutions) == 0:
+            return True
+        if resolveCall is None:
+            return False
+        for func_call, func_def in self.resolutions:
+            if resolveCall(func_call) is not func_def:
+                return False
+        return True
+
+def hoistInvariants (for_loop: Node, resolveCall: Callable[[Node], Node | None] | None) -> Hoisting:
+    '''Hoists the invariant values out of the body of `for_loop`.\n
+    A value is invariant if it does not read any variable that
+    gets assigned in the body (the loop's variable included), and only calls
+    functions that don't assign to external variables and that
+    don't read such variables either.\n
+    Only the values that are sure to be evaluated in the first
+    iteration are hoisted, that is the ones that come before any
+    return, and not the ones inside the body of nested for loops. That way hoisting
+    does not evaluate anything that the loop wouldn't have evaluated, and
+    the result is the exact same.\n
+    `resolveCall`: resolves a Node.FUNC_CALL to its Node.FUNC_DEF from
+    the scope where the loop is, or returns `None` if it doesn't exist. If
+    not given, then nothing is hoisted out of a body that calls functions'''
+    assert for_loop.type == Node.Type.FOR_LOOP, f"Not a Node.FOR_LOOP {for_loop}"
+
+    resolutions = []
+    summaries = {} # Maps the id of a Node.FUNC_DEF to its summary
+    call_summaries = {} # Maps the id of a Node.FUNC_CALL to the summary of the function it calls
+    nothing = Hoisting(for_loop, [], for_loop, resolutions)
+
+    def summarize (func_def: Node, enclosing_defs: list[Node]) -> tuple[frozenset[str], frozenset[str]] | None:
+        '''Returns the names of the external variables that the function
+        assigns to, and the names of the variables that it reads, the called
+        functions included. Or `None` if a called function can't be resolved'''
+        if id(func_def) in summaries:
+            return summaries[id(func_def)]
+        summaries[id(func_def)] = None # Can't be called recursively, but just in case
+
+        body = func_def.components['body']
+        visible_defs = [element for element in elements(body) if type(element) == Node and element.type == Node.Type.FUNC_DEF] + enclosing_defs
+        exts = set()
+        reads = set()
+        for element in elements(body):
+            if type(element) == Token:
+                if element.type == Token.Type.IDENTIFIER:
+                    reads.add(element.lexeme)
+            elif element.type == Node.Type.VAR_ASSIGN:
+                if element.components['ext']:
+                    exts.add(element.components['var'].lexeme)
+            elif element.type == Node.Type.FUNC_CALL:
+                summary = summarizeCall(element, visible_defs)
+                if summary is None:
+                    return None
+                exts.update(summary[0])
+                reads.update(summary[1])
+        reads.difference_update(param.lexeme for param in func_def.components['params'])
+        reads.discard(RETURN_VAR_NAME) # It's always its own
+
+        summary = (frozenset(exts), frozenset(reads))
+        summaries[id(func_def)] = summary
+        return summary
+
+    def summarizeCall (func_call: Node, visible_defs: list[Node]) -> tuple[frozenset[str], frozenset[str]] | None:
+        '''Summarizes the function that `func_call` calls'''
+        if id(func_call) in call_summaries:
+            return call_summaries[id(func_call)]
+        summary = None
+        for func_def in visible_defs:
+            if isCalledBy(func_def, func_call):
+                summary = summarize(func_def, visible_defs)
+                break
+        else:
+            if resolveCall is not None:
+                func_def = resolveCall(func_call)
+                resolutions.append((func_call, func_def))
+                if func_def is not None:
+                    summary = summarize(func_def, [])
+        call_summaries[id(func_call)] = summary
+        return summary
+
+    body = for_loop.components['body']
+
+    # The variables that change in the body
+    variants = set()
+    if for_loop.components['has_var']:
+        variants.add(for_loop.components['var'].lexeme)
+    for element in elements(body):
+        if type(element) == Token:
+            continue
+        if element.type == Node.Type.FUNC_DEF:
+            return nothing # Would change how the calls are resolved
+        elif element.type == Node.Type.VAR_ASSIGN:
+            variants.add(element.components['var'].lexeme)
+        elif element.type == Node.Type.FOR_LOOP:
+            if element.components['has_var']:
+                variants.add(element.components['var'].lexeme)
+        elif element.type == Node.Type.FUNC_CALL:
+            summary = summarizeCall(element, [])
+            if summary is None:
+                return nothing
+            variants.update(summary[0])
+
+    invariants = {} # Maps the id of a value element to whether it's invariant
+
+    def isInvariant (value: Node | Token, in_anon: bool) -> bool:
+        '''Whether `value` evaluates to the same thing in every iteration.\n
+        `in_anon`: whether `value` is inside an anonymous function, where
+        the return variables refer to other scopes than the loop's one'''
+        if type(value) == Token:
+            if value.type == Token.Type.NUMBER:
+                return True
+            name = value.lexeme
+            if name == EXTERNAL_RETURN_VAR_NAME or (in_anon and name == RETURN_VAR_NAME):
+                return False
+            return name not in variants
+
+        if id(value) in invariants:
+            return invariants[id(value)]
+        comps = value.components
+        invariant = False
+        if value.type == Node.Type.OP:
+            invariant = isInvariant(comps['l_value'], in_anon) and isInvariant(comps['r_value'], in_anon)
+        elif value.type == Node.Type.ORDER_PAREN:
+            invariant = isInvariant(comps['value'], in_anon)
+        elif value.type == Node.Type.FUNC_CALL:
+            exts, reads = call_summaries[id(value)] # All the calls of the body were summarized
+            invariant = (len(exts) == 0 and
+                    EXTERNAL_RETURN_VAR_NAME not in reads and
+                    reads.isdisjoint(variants) and
+                    all(isInvariant(arg, in_anon) for arg in comps['args']))
+        invariants[id(value)] = invariant
+        return invariant
+
+    assigns = []
+    starter = for_loop.components['starter']
+
+    def hoist (value: Node) -> Token:
+        '''Adds the assignment of `value` to a synthesized variable, and returns that variable'''
+        # Numbered per run. Their names contain a `#` so that they can't clash with the code's ones
+        context = currentContext()
+        context.hoisted_count += 1
+        var = Token.synthesizeIdentifier(f"hoisted#{context.hoisted_count}", starter)
+        assigns.append(Node.makeVarAssign(False, var, value))
+        return var
+
+    def rewriteValue (value: Node | Token, in_anon: bool) -> Node | Token:
+        '''Returns `value` with its invariant parts replaced by their
+        synthesized variables. Nodes are copied and not modified'''
+        if type(value) == Token:
+            return value
+        if isInvariant(value, in_anon):
+            inner = value
+            while type(inner) == Node and inner.type == Node.Type.ORDER_PAREN:
+                inner = inner.components['value'] # No need to hoist the parenthesis themselves
+            if type(inner) == Node:
+                return hoist(inner)
+            return value # Not worth hoisting a single number or variable
+
+        comps = value.components
+        if value.type == Node.Type.OP:
+            return copyNode(value, l_value=rewriteValue(comps['l_value'], in_anon), r_value=rewriteValue(comps['r_value'], in_anon))
+        elif value.type == Node.Type.ORDER_PAREN:
+            return copyNode(value, value=rewriteValue(comps['value'], in_anon))
+        elif value.type == Node.Type.FUNC_CALL:
+            return copyNode(value, args=[rewriteValue(arg, in_anon) for arg in comps['args']])
+        elif value.type == Node.Type.ANON_FUNC:
+            return copyNode(value, body=rewriteBody(comps['body'], True)[0])
+        assert False, f"Unreachable"
+
+    def rewriteBody (body: list[Node], in_anon: bool) -> tuple[list[Node], bool]:
+        '''Rewrites the nodes of `body` that are sure to be evaluated
+        when the body is. Returns the new body, and whether
+        the nodes after it are sure to be evaluated as well'''
+        body = body.copy()
+        for i, node in enumerate(body):
+            comps = node.components
+            if node.type == Node.Type.VAR_ASSIGN:
+                body[i] = copyNode(node, value=rewriteValue(comps['value'], in_anon))
+            elif node.type == Node.Type.FUNC_CALL:
+                # It's an instruction, so only its arguments can be replaced
+                body[i] = copyNode(node, args=[rewriteValue(arg, in_anon) for arg in comps['args']])
+            elif node.type == Node.Type.ANON_FUNC:
+                body[i] = copyNode(node, body=rewriteBody(comps['body'], True)[0])
+            elif node.type == Node.Type.RETURN:
+                if comps['has_value']:
+                    body[i] = copyNode(node, value=rewriteValue(comps['value'], in_anon))
+                return body, False
+            elif node.type == Node.Type.FOR_LOOP:
+                body[i] = copyNode(node,
+                        begin=rewriteValue(comps['begin'], in_anon),
+                        end=rewriteValue(comps['end'], in_anon),
+                        step=rewriteValue(comps['step'], in_anon))
+                # Its body might not be evaluated at all, and if it returns, then what comes after it might not be either
+                if any(returns(element) for element in comps['body']):
+                    return body, False
+            else:
+                assert False, f"Forgot to update instruction nodes here {node}"
+        return body, True
+
+    new_body = rewriteBody(body, False)[0]
+    if len(assigns) == 0:
+        return nothing
+    return Hoisting(for_loop, assigns, copyNode(for_loop, body=new_body), resolutions)
+
+def elements (body: list[Node]) -> Iterator[Node | Token]:
+    '''Yields every Node and value Token in `body`, recursively, the
+    bodies of the nested functions, anonymous functions and for loops included'''
+    stack = list(reversed(body))
+    while len(stack) != 0:
+        element = stack.pop()
+        yield element
+        if type(element) == Token:
+            continue
+
+        comps = element.components
+        children = []
+        if element.type == Node.Type.VAR_ASSIGN:
+            children = [comps['value']]
+        elif element.type == Node.Type.OP:
+            children = [comps['l_value'], comps['r_value']]
+        elif element.type == Node.Type.ORDER_PAREN:
+            children = [comps['value']]
+        elif element.type == Node.Type.FUNC_CALL:
+            children = comps['args']
+        elif element.type in [Node.Type.FUNC_DEF, Node.Type.ANON_FUNC]:
+            children = comps['body']
+        elif element.type == Node.Type.RETURN:
+            if comps['has_value']:
+                children = [comps['value']]
+        elif element.type == Node.Type.FOR_LOOP:
+            children = [comps['begin'], comps['end'], comps['step']] + comps['body']
+        else:
+            assert False, f"Forgot to update the Nodes here {element}"
+        stack.extend(reversed(children))
+
+def callsFunctions (for_loop: Node) -> bool:
+    '''Whether the body of `for_loop` calls any function'''
+    return any(type(element) == Node and element.type == Node.Type.FUNC_CALL for element in elements(for_loop.components['body']))
+
+def returns (node: Node) -> bool:
+    '''Whether the instruction `node` is, or contains, a
+    return that returns from the scope it's in'''
+    if node.type == Node.Type.RETURN:
+        return True
+    if node.type == Node.Type.FOR_LOOP:
+        return any(returns(element) for element in node.components['body'])
+    return False
+
+def isCalledBy (func_def: Node, func_call: Node) -> bool:
+    '''Whether `func_call` calls the function `func_def`, that is if
+    they have the same name and number of parameters, or the same alias'''
+    if func_call.components['with_als']:
+        return func_def.components['has_als'] and func_def.components['als'] == func_call.components['als']
+    return func_def.components['func'] == func_call.components['func'] and len(func_def.components['params']) == len(func_call.components['args'])
+
+def copyNode (node: Node, **components) -> Node:
+    '''Returns a copy of `node` with some of its components replaced, or
+    `node` itself if they are all the same'''
+
+    def isSame (old: Node | Token | list, new: Node | Token | list) -> bool:
+        if type(new) == list:
+            return len(old) == len(new) and all(a is b for a, b in zip(old, new))
+        return old is new
+
+    if all(isSame(node.components[key], value) for key, value in components.items()):
+        return node
+    return Node(node.type, **{**node.components, **components})
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+'''Instrumentation hooks. Callbacks can be registered for the events of
+the construction of a program, and `constructProgram()` calls them as
+it goes. The events nobody listens to are not even checked for, so a
+construction without hooks pays nothing for them'''
+
+from typing import Any, Callable
+
+# The events, and what their HookEvent has
+SCOPE_ENTER = 'scope_enter' # `node`: the Node.FUNC_DEF, Node.ANON_FUNC or Node.ROOT (`None` if resumed) of the scope. `token`: what started it. `name`: the function's name, `main`, or `None` if anonymous
+SCOPE_EXIT = 'scope_exit' # Same as SCOPE_ENTER. `value`: what the scope returned
+CALL_START = 'call_start' # `node`: the called Node.FUNC_DEF, inlined or not. `token`: the identifier at the call site. `name`: its name. `value`: the arguments
+CALL_END = 'call_end' # Same as CALL_START. `value`: what the function returned
+LOOP_UNWRAP = 'loop_unwrap' # `node`: the Node.FOR_LOOP. `token`: its `for` keyword. `name`: its variable's name, or `None`. `value`: how many iterations it has
+VAR_ASSIGN = 'var_assign' # `node`: the Node.VAR_ASSIGN. `token`: the variable. `name`: its name. `value`: the assigned value
+OPERATION_CREATED = 'operation_created' # `node`: `None`. `token`: the operator. `name`: its symbol. `value`: the created Operation
+EVENTS = [SCOPE_ENTER, SCOPE_EXIT, CALL_START, CALL_END, LOOP_UNWRAP, VAR_ASSIGN, OPERATION_CREATED]
+
+class HookEvent ():
+    '''What a callback is given when its event happens:\n
+    - `event`: which one of the `EVENTS` it is\n
+    - `node`: the Node it happened at, if there is one\n
+    - `token`: the Token it happened at, to locate it in the source\n
+    - `name`: the name of what it happened to, if it has one\n
+    - `value`: a value that depends on the event. Check the `EVENTS`'''
+
+    __slots__ = ('event', 'node', 'token', 'name', 'value')
+
+    def __init__(self, event: str, node: Any, token: Any, name: str | None, value: Any) -> None:
+        self.event = event
+        self.node = node
+        self.token = token
+        self.name = name
+        self.value = value
+
+    @property
+    def location (self) -> str | None:
+        '''Where it happened in the source, or `None` if it's not known'''
+        return self.token.location() if self.token is not None else None
+
+class Hooks ():
+    '''A registry of callbacks, for the events of the construction. It's
+    given to `constructProgram()`, which takes the callbacks that are
+    registered when it starts.'''
+
+    def __init__(self) -> None:
+        self.callbacks = {event: [] for event in EVENTS}
+
+    def register (self, event: str, callback: Callable[[HookEvent], None]) -> Callable[[HookEvent], None]:
+        '''Calls `callback` whenever `event` happens. Returns it back, so that it can be used as a decorator'''
+        if event not in self.callbacks:
+            raise Exception(f"❌ UNKNOWN EVENT: `{event}` is not one of {', '.join(f'`{event}`' for event in EVENTS)}")
+        self.callbacks[event].append(callback)
+        return callback
+
+    def on (self, event: str) -> Callable[[Callable[[HookEvent], None]], Callable[[HookEvent], None]]:
+        '''Registers the decorated function for `event`'''
+        return lambda callback: self.register(event, callback)
+
+    def unregister (self, event: str, callback: Callable[[HookEvent], None]) -> None:
+        self.callbacks[event].remove(callback)
+
+    def dispatcher (self, event: str) -> Callable[[Any, Any, str | None, Any], None] | None:
+        '''What calls the callbacks of `event`, given the node, the token, the name
+        and the value of the HookEvent. Or `None` if it has no callbacks'''
+        callbacks = tuple(self.callbacks[event])
+        if len(callbacks) == 0:
+            return None
+        if len(callbacks) == 1:
+            callback = callbacks[0]
+            return lambda node, token, name, value: callback(HookEvent(event, node, token, name, value))
+        def dispatch (node: Any, token: Any, name: str | None, value: Any) -> None:
+            hook_event = HookEvent(event, node, token, name, value)
+            for callback in callbacks:
+                callback(hook_event)
+        return dispatch
@@ -1,9 +1,33 @@
 #!/usr/bin/env python
 
 if __name__ == '__main__':
+    from startup import mark # First, its import is the start
     import argparse
+    mark('import argparse')
     
     MAIN_FUNCTION_ARGS_NAME = 'args' # The name of the argument in the ArgumentParser that refers to the args that will be passed to the main function
+    TEST_COMMAND = 'test' # Runs the tests instead of a file. A file named so can still be run as `./test`
+    
+    import sys
+    if sys.argv[1:2] == [TEST_COMMAND]:
+        parser = argparse.ArgumentParser(
+            prog=f'Malang {TEST_COMMAND}',
+            description='Runs the tests of the `*_test.mlg` files. Each of their functions whose name starts with `test_` and that takes no parameters is a test, or the whole file if it has none. A test fails when one of its asserts does not hold.',
+            epilog='https://github.com/telos-matter/Malang'
+            )
+        parser.add_argument('paths', nargs='*', default=['.'], metavar='DIR', help='the directories to look for the test files in, and in the ones under them, or test files. Default is the working directory.')
+        parser.add_argument('-v', '--verbose', action='store_true', help='be verbose about the collected tests.')
+        parser.add_argument('--workers', type=int, metavar='N', help='how many processes run the tests. Default is the number of CPUs.')
+        parser.add_argument('--timeout', type=float, metavar='SECONDS', help='the most a single test can take, after which it stops and is reported as timed out.')
+        parser.add_argument('--hoist', action='store_true', help='evaluates the parts of the for loops that are the same in every iteration only once, before unwrapping them.')
+        parser.add_argument('--inline-threshold', type=int, default=32, metavar='SIZE', help='the biggest size, in value elements, of the functions that get inlined. 0 to disable inlining. Default is 32.')
+        parser.add_argument('--no-snapshot', action='store_true', help="parse the standard libraries from their source instead of loading their snapshot, and don't save it either.")
+        options = vars(parser.parse_args(sys.argv[2:]))
+        mark('parse the options')
+        
+        from runner import runTestFiles
+        mark('import the runner')
+        sys.exit(runTestFiles(options))
     
     parser = argparse.ArgumentParser(
         prog='Malang',
@@ -15,15 +39,66 @@ if __name__ == '__main__':
     parser.add_argument('-s', '--show', action='store_true', help='show the operation, a.k.a. the program. Use only with small programs.')
     parser.add_argument('-v', '--verbose', action='store_true', help='be verbose about the program and the output.')
     parser.add_argument('-i', '--interpret', action='store_true', help='tries to interpret the output if possible. Either as ASCII chars or a boolean value.')
-    parser.add_argument('file_path', help='the file to run.')
+    parser.add_argument('-O', '--optimize', action='store_true', help='simplifies the resulting operation (constant folding and algebraic simplification) before showing it.')
+    parser.add_argument('--verify', action='store_true', help='evaluates the resulting operation again, level by level and vectorized with NumPy if it is available, and checks that it gives the same result.')
+    parser.add_argument('--cse', action='store_true', help='merges the structurally identical sub operations of the resulting operation (common subexpression elimination).')
+    parser.add_argument('-a', '--analyze', action='store_true', help='reports the unique operations count, the depth and the sharing factor of the resulting operation.')
+    parser.add_argument('--symbolic', action='store_true', help="keeps the main function's arguments as symbolic inputs in the operation, except for the ones that control for loops.")
+    parser.add_argument('--let', action='store_true', help='show the operation as a sequence of bindings, one per unique operation, instead of expanding it. Implies `--show`.')
+    parser.add_argument('--hoist', action='store_true', help='evaluates the parts of the for loops that are the same in every iteration only once, before unwrapping them. Gives the same result with fewer Operation objects.')
+    parser.add_argument('--inline-threshold', type=int, default=32, metavar='SIZE', help='the biggest size, in value elements, of the functions whose bodies are evaluated right at their call sites instead of in a scope of their own. 0 to disable inlining. Default is 32.')
+    parser.add_argument('--share', type=int, metavar='SIZE', help='show the operation with each shared sub operation written once as a numbered binding, instead of expanding it. The shared ones that are at most SIZE operations are still written in place, 0 to not write any in place. Implies `--show`.')
+    parser.add_argument('-o', '--output', metavar='FILE', help='write the shown operation to FILE instead of printing it.')
+    parser.add_argument('--export', metavar='FILE', help='export the resulting operation to FILE in a compact binary format, to be analysed later on with `--load`.')
+    parser.add_argument('--load', action='store_true', help='analyse an operation exported with `--export` instead of running a Malang file. The args are the new values of its inputs, in the order of the main function parameters if it was exported with `--symbolic`.')
+    parser.add_argument('--diff', metavar='FILE', help='with `--load` and `-v`, compare the structure of the loaded operation to the one exported in FILE.')
+    parser.add_argument('--spill', metavar='DIR', help='keep the operation within the memory budget while constructing it, by spilling its older parts to a temporary file in DIR. For programs too big for the memory.')
+    parser.add_argument('--memory-budget', type=int, default=1024, metavar='MB', help='with `--spill`, roughly how many megabytes the operation can take in memory. Default is 1024.')
+    parser.add_argument('--checkpoint', metavar='FILE', help='save the progress of the construction to FILE every so often, so that it can be resumed with `--resume` after a crash or an interruption. Interrupting it (Ctrl + c) saves it one last time before stopping.')
+    parser.add_argument('--checkpoint-interval', type=float, metavar='SECONDS', help='with `--checkpoint`, save it every SECONDS seconds. Default is 300 if `--checkpoint-operations` is not given either.')
+    parser.add_argument('--checkpoint-operations', type=int, metavar='N', help='with `--checkpoint`, save it every N created Operation objects.')
+    parser.add_argument('--resume', metavar='FILE', help='resume the construction from the checkpoint FILE instead of running a Malang file, and keep saving the checkpoints to it. It continues with the args and options it was started with. Only resume checkpoints from a trusted source, loading one can run arbitrary code from the file.')
+    parser.add_argument('--stream', action='store_true', help="print what the program prints with the string library's `print` as soon as it's printed, instead of only at the end with `-i`.")
+    parser.add_argument('--batch', metavar='FILE', help="run the program once for each line of FILE, which are comma separated arguments, or of the standard input if FILE is `-`. It's only parsed once, and the lines are run in parallel. The results are printed as JSON lines, in the same order.")
+    parser.add_argument('--workers', type=int, metavar='N', help='with `--batch` or `--serve`, how many processes run the programs. Default is the number of CPUs.')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS', help='the most the construction can take, after which it stops. With `--batch`, the most a single line can take, after which its error is printed instead.')
+    parser.add_argument('--max-objects', type=int, metavar='N', help='stop the construction once it created more than N Operation objects.')
+    parser.add_argument('--max-operations', type=int, metavar='N', help='stop the construction once an Operation stands for more than N mathematical operations.')
+    parser.add_argument('--max-iterations', type=int, metavar='N', help='stop the construction once its unwrapped for loops have more than N iterations, all together.')
+    parser.add_argument('--max-rss', type=int, metavar='MB', help='stop the construction once the RSS of the process is more than MB megabytes.')
+    parser.add_argument('--serve', metavar='SOCKET', help='run a daemon that runs the programs sent to it on the Unix domain SOCKET with `--client`. It keeps the parsed libraries and the compiled programs, so that running them is faster.')
+    parser.add_argument('--client', metavar='SOCKET', help='run the file on the daemon listening on SOCKET, started with `--serve`, instead of in this process.')
+    parser.add_argument('--startup-profile', action='store_true', help='report how long each phase of the startup took, up to the evaluation, on the standard error.')
+    parser.add_argument('--no-snapshot', action='store_true', help="parse the standard libraries from their source instead of loading their snapshot, and don't save it either.")
+    parser.add_argument('--profile', action='store_true', help='report, for each Malang function and anonymous scope that was evaluated, how many times it was called, the time spent in it, the Operation objects it created, and the mathematical operations it added on top of its arguments, on the standard error.')
+    parser.add_argument('--profile-stacks', metavar='FILE', help='write the profiled stacks to FILE in the collapsed format of the flame graph tools, with the microseconds spent in each.')
+    parser.add_argument('--pyprofile', metavar='DIR', help="profile the runner itself, each phase of the run (parse, ast, construct, transform, show and interpret, along with the validation of the functions and the unwrapping of the constant for loops that happen during the construction) on its own with cProfile, and save their `.pstats` files and a summary of their top functions to DIR.")
+    parser.add_argument('--pyprofile-interval', type=float, metavar='MS', help='with `--pyprofile`, sample the stack every MS milliseconds of CPU time instead, and save the samples in the collapsed format of the flame graph tools. Costs far less for the long runs.')
+    parser.add_argument('--memstats', action='store_true', help='report, for each phase of the run, the peak and retained memory allocated by Python, the peak and final resident set size, and how many Tokens, Nodes, Scopes, Operations and big integer results are alive at its end, on the standard error. Slows the run down a lot.')
+    parser.add_argument('--memstats-json', metavar='FILE', help='write the same report to FILE as JSON. Implies measuring it, like `--memstats`.')
+    parser.add_argument('--progress', type=float, nargs='?', const=5.0, metavar='SECONDS', help='report the progress of the construction every SECONDS seconds, 5 if not given, on the standard error: the elapsed time, the Operation objects created and how fast, the RSS, how deep the scopes are, and the iteration of the innermost for loop.')
+    parser.add_argument('--metrics-out', metavar='FILE', help='write the metrics of the run to FILE: the duration of each phase, the counts of tokens, Nodes, Scopes and Operation objects, the mathematical operations count, the peak memory, the hit rate of the snapshot, and the hash of the program with its arguments.')
+    parser.add_argument('--metrics-format', choices=['json', 'prometheus'], default='json', help='with `--metrics-out`, write them as JSON, or in the Prometheus text format for the textfile collector. Default is json.')
+    parser.add_argument('file_path', nargs='?', help='the file to run.')
     parser.add_argument(MAIN_FUNCTION_ARGS_NAME, type=float, nargs='*', help='arguments to be passed to the main function.')
     
     options = vars(parser.parse_args())
     args = options[MAIN_FUNCTION_ARGS_NAME]
     del options[MAIN_FUNCTION_ARGS_NAME]
+    if options['file_path'] is None and options['resume'] is None and options['serve'] is None:
+        parser.error('the following arguments are required: file_path')
+    
+    mark('parse the options')
     
-    from runner import run
-    run(options, args)
+    if options['client'] is not None and not options['load'] and options['batch'] is None and options['serve'] is None:
+        # Without importing the runner, the client doesn't need it. Check `runner.run()` for the other modes
+        from client import runClient
+        mark('import the client')
+        runClient(options, args)
+    else:
+        from runner import run
+        mark('import the runner')
+        run(options, args)
 
 else:
     raise Exception(f"This file is expected to be run as the main one")
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+'''Memory accounting. Measures the memory of each phase of a run, with
+`tracemalloc` and by sampling the resident set size, and counts the
+objects of the types that make up a program at the end of each one'''
+
+from core import Operation
+from typing import TextIO
+import tracemalloc
+import threading
+import json
+import sys
+import gc
+import os
+
+# The types that are counted, by name. Some of them are defined in functions, so they can't be imported
+TYPES = ['Token', 'Node', 'Scope', 'FunctionSignature', 'Operation', 'Input']
+# The results that are bigger than this, in bits, are counted as big integers
+BIG_INT_BITS = 64
+# How often the resident set size is sampled, in seconds
+RSS_INTERVAL = 0.01
+
+def currentRSS () -> int | None:
+    '''The resident set size of this process, in bytes, or `None` if it can't be known on this platform'''
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peakRSS () -> int | None:
+    '''The peak resident set size of this process so far, in bytes, or `None` if it can't be known on this platform'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # Kilobytes on Linux
+
+def census () -> dict:
+    '''Counts the live objects of each of the `TYPES`, and roughly
+    how many bytes they take, their attributes not included. The
+    results of the Operations that are big integers are counted as `big int`.
+    Collect the garbage first, otherwise it's counted as well'''
+    counts = {name: {'count': 0, 'bytes': 0} for name in TYPES +['big int']}
+    big_ints = counts['big int']
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name not in counts:
+            continue
+        count = counts[name]
+        count['count'] += 1
+        count['bytes'] += sys.getsizeof(obj)
+        if hasattr(obj, '__dict__'):
+            count['bytes'] += sys.getsizeof(obj.__dict__)
+        if isinstance(obj, Operation) and type(obj.result) is int and obj.result.bit_length() > BIG_INT_BITS:
+            big_ints['count'] += 1
+            big_ints['bytes'] += sys.getsizeof(obj.result)
+    return counts
+
+class MemoryStats ():
+    '''Measures the memory of the phases of a run, one after the other. Call
+    `phase()` at the start of each one, and `finish()` at the end of the
+    last one. For each phase, `phases` has:\n
+    - `name`: its name\n
+    - `peak`: the most bytes allocated by Python at once during it\n
+    - `retained`: the bytes allocated by Python that were still there at its end\n
+    - `peak_rss`: the biggest sampled resident set size during it\n
+    - `rss`: the resident set size at its end\n
+    - `objects`: the `census()` at its end\n
+    Tracing the allocations slows the run down a lot, as every
+    allocation is traced.'''
+
+    def __init__(self) -> None:
+        self.phases = []
+        self.__current = None
+        self.__peak_rss = None
+        self.__stopped = threading.Event()
+        self.__sampler = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __sample (self) -> None:
+        '''Samples the resident set size until stopped, keeping the biggest of the current phase'''
+        while not self.__stopped.wait(RSS_INTERVAL):
+            rss = currentRSS()
+            if rss is not None and (self.__peak_rss is None or rss > self.__peak_rss):
+                self.__peak_rss = rss
+
+    def phase (self, name: str) -> None:
+        '''Ends the current phase if there is one, and starts the next one'''
+        self.__end()
+        self.__current = name
+        self.__peak_rss = currentRSS()
+        tracemalloc.reset_peak()
+        if self.__sampler is None:
+            self.__sampler = threading.Thread(target=self.__sample, daemon=True)
+            self.__sampler.start()
+
+    def __end (self) -> None:
+        if self.__current is None:
+            return
+        # The garbage that wasn't collected yet is not retained, nor alive
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        rss = currentRSS()
+        peak_rss = self.__peak_rss
+        if rss is not None and (peak_rss is None or rss > peak_rss):
+            peak_rss = rss
+        self.phases.append({
+            'name': self.__current,
+            'peak': peak,
+            'retained': retained,
+            'peak_rss': peak_rss,
+            'rss': rss,
+            'objects': census(),
+        })
+        self.__current = None
+
+    def finish (self) -> None:
+        '''Ends the last phase, and stops measuring'''
+        self.__end()
+        self.__stopped.set()
+        if self.__sampler is not None:
+            self.__sampler.join()
+        tracemalloc.stop()
+
+    def report (self, file: TextIO) -> None:
+        '''Writes the phases in a human readable table, followed by their objects'''
+        megabytes = lambda count: '-' if count is None else f"{count / 2**20:.1f}"
+        print(f"{'phase':<12} {'peak [MB]':>10} {'retained [MB]':>14} {'peak RSS [MB]':>14} {'RSS [MB]':>9}", file=file)
+        for phase in self.phases:
+            print(f"{phase['name']:<12} {megabytes(phase['peak']):>10} {megabytes(phase['retained']):>14} {megabytes(phase['peak_rss']):>14} {megabytes(phase['rss']):>9}", file=file)
+        print(f"\n{'phase':<12} " +' '.join(f"{name:>22}" for name in TYPES +['big int']), file=file)
+        for phase in self.phases:
+            cells = [f"{count['count']} ({megabytes(count['bytes'])} MB)" for count in phase['objects'].values()]
+            print(f"{phase['name']:<12} " +' '.join(f"{cell:>22}" for cell in cells), file=file)
+
+    def writeJSON (self, file: TextIO) -> None:
+        json.dump({'phases': self.phases}, file, indent=2)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+'''Run metrics. Records the durations of the phases of a run and what it
+counted along the way, to be written as a JSON record, or as a
+Prometheus textfile, for the tools that collect them'''
+
+from numbers import Number
+from typing import Any, TextIO
+import hashlib
+import json
+import math
+import time
+import os
+
+VERSION = 1
+# The prefix of the names of the Prometheus metrics
+PROMETHEUS_PREFIX = 'malang'
+
+def countNodes (ast: Any) -> int:
+    '''How many distinct Nodes there are in the AST, itself included. The
+    ones that are shared are counted once'''
+    from runner import Node
+    seen = set()
+    stack = [ast]
+    while len(stack) != 0:
+        value = stack.pop()
+        if isinstance(value, Node):
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            stack.extend(value.components.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return len(seen)
+
+def programHash (paths: set[str]) -> str:
+    '''The SHA-256 of the files of a program, the main one and the ones it includes, in hex'''
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode() +b'\0')
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class Metrics ():
+    '''The metrics of a run. Call `phase()` at the start of each
+    of its phases and `finish()` at the end of the last one, their
+    durations are measured with a monotonic clock. The rest is set
+    on `record`, which is what's written:\n
+    - `version`: the version of the record\n
+    - `file`, `program_hash` and `args`: the program and its arguments\n
+    - `phases`: the seconds of each phase\n
+    - `counts`: the tokens, the Nodes, the Scopes and the Operation objects\n
+    - `operations_count` and `operations_log10`: the mathematical operations it took, exactly and as a log10\n
+    - `peak_rss`: the peak resident set size of the process, in bytes\n
+    - `caches`: the hits, the misses and the hit rate of each cache that was used'''
+
+    def __init__(self) -> None:
+        self.record = {
+            'version': VERSION,
+            'file': None,
+            'program_hash': None,
+            'args': [],
+            'phases': {},
+            'counts': {},
+            'operations_count': None,
+            'operations_log10': None,
+            'peak_rss': None,
+            'caches': {},
+        }
+        self.__current = None
+
+    def phase (self, name: str) -> None:
+        '''Ends the current phase if there is one, and starts the next one'''
+        self.__end()
+        self.__current = (name, time.perf_counter())
+
+    def __end (self) -> None:
+        if self.__current is not None:
+            name, start = self.__current
+            self.record['phases'][name] = time.perf_counter() - start
+            self.__current = None
+
+    def finish (self) -> None:
+        '''Ends the last phase'''
+        self.__end()
+
+    def setOperationsCount (self, operations_count: int) -> None:
+        self.record['operations_count'] = operations_count
+        self.record['operations_log10'] = math.log10(operations_count) if operations_count > 0 else None
+
+    def setCache (self, name: str, hits: int, misses: int) -> None:
+        lookups = hits + misses
+        self.record['caches'][name] = {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups != 0 else None}
+
+    def writeJSON (self, file: TextIO) -> None:
+        json.dump(self.record, file, indent=2)
+        file.write('\n')
+
+    def writePrometheus (self, file: TextIO) -> None:
+        '''Writes the record in the Prometheus text format, for the textfile collector. Each
+        metric is labelled with the file and the hash of the program'''
+        record = self.record
+        labels = f'file="{escapeLabel(str(record["file"]))}",program_hash="{record["program_hash"] or ""}"'
+        def metric (name: str, help: str, samples: list[tuple[str, Any]]) -> None:
+            samples = [(extra, value) for extra, value in samples if isinstance(value, Number) and value is not True and value is not False]
+            if len(samples) == 0:
+                return
+            file.write(f"# HELP {PROMETHEUS_PREFIX}_{name} {help}\n# TYPE {PROMETHEUS_PREFIX}_{name} gauge\n")
+            for extra, value in samples:
+                file.write(f"{PROMETHEUS_PREFIX}_{name}{{{labels}{extra}}} {formatSample(value)}\n")
+        metric('phase_seconds', 'The duration of each phase of the run.', [(f',phase="{phase}"', seconds) for phase, seconds in record['phases'].items()])
+        metric('objects', 'How many objects of each kind the run counted.', [(f',kind="{kind}"', count) for kind, count in record['counts'].items()])
+        metric('operations', 'How many mathematical operations it took to compute the result.', [('', record['operations_count'])])
+        metric('operations_log10', 'The log10 of how many mathematical operations it took to compute the result.', [('', record['operations_log10'])])
+        metric('peak_rss_bytes', 'The peak resident set size of the process.', [('', record['peak_rss'])])
+        metric('cache_hit_rate', 'The hit rate of each cache.', [(f',cache="{cache}"', counts['hit_rate']) for cache, counts in record['caches'].items()])
+
+def formatSample (value: Number) -> str:
+    '''The value of a sample, the integers that are too big for a float are infinite'''
+    try:
+        return repr(float(value))
+    except OverflowError:
+        return '+Inf'
+
+def escapeLabel (value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
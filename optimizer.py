@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+'''The optimizer. Simplifies an already computed Operation
+into a smaller, mathematically equivalent one'''
+
+from core import OP_SET, Operation, Input, uniqueOperations
+from numbers import Number
+
+def optimize (operation: Operation) -> Operation:
+    '''Returns a simplified version of `operation` that computes
+    the same result with fewer mathematical operations. The
+    original operation is left untouched, and Operations that
+    don't change are reused as they are, so the sharing is kept.\n
+    Two kinds of simplifications are done, bottom up:\n
+        - Constant folding: an operation whose both arguments are
+    literals, i.e. numbers that appear as-is in the operation, is
+    replaced by its result. For example: `(1 - 1)` becomes `0`. The
+    result of a folding is not considered a literal itself, otherwise,
+    since the arguments of the main function are baked in as numbers,
+    every program would fold all the way down to its own result. That
+    is unless the operation has Inputs, in which case everything
+    that does not depend on them is folded.\n
+        - Algebraic simplification: identities such as `x * 1`, `x + 0`,
+    `0 * y`, `x ^ 1`, `x - x` and so on are replaced by what they
+    evaluate to. These apply to folded numbers as well, so
+    `(1 - 1) / -1` becomes `0`, and an `if` with a literal
+    boolean collapses to the chosen branch.\n
+    Every replacement is checked against the result that was
+    computed when the original Operation was created, and is only
+    kept if it gives back the exact same result (value and type). That
+    way the float precision and the `((x^2)^0.5)` special
+    case can't make the optimized operation drift from the original one.'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+
+    nodes = uniqueOperations(operation)
+    has_inputs = any(type(node) is Input for node in nodes)
+
+    # Maps the id of an original Operation to what replaces it, either a Number or an Operation
+    replacements = {}
+
+    def replacementOf (argument: Number | Operation) -> tuple[Number | Operation, bool]:
+        '''Returns the replacement of an argument, and whether
+        it is a literal or not'''
+        if isinstance(argument, Operation):
+            replacement = replacements[id(argument)]
+            return replacement, has_inputs and isinstance(replacement, Number)
+        return argument, True
+
+    for node in nodes:
+        if type(node) is Input:
+            replacements[id(node)] = node
+            continue
+
+        a, a_literal = replacementOf(node.a)
+        b, b_literal = replacementOf(node.b)
+
+        replacement = None
+        if a_literal and b_literal:
+            replacement = node.result
+        else:
+            replacement = simplify(node.op, a, b)
+
+        if replacement is None or not sameResult(replacement, node.result):
+            # Nothing to simplify, or the simplification does not give back
+            #   the same result. Rebuild it only if its arguments changed
+            replacement = node
+            if a is not node.a or b is not node.b:
+                rebuilt = Operation(node.op, a, b)
+                if sameResult(rebuilt, node.result):
+                    replacement = rebuilt
+
+        replacements[id(node)] = replacement
+
+    optimized = replacements[id(operation)]
+    # Always return an operation, same as the runner does
+    if isinstance(optimized, Number) or type(optimized) is Input:
+        optimized = Operation(OP_SET.ADD, optimized, 0)
+    return optimized
+
+def simplify (op: OP_SET, a: Number | Operation, b: Number | Operation) -> Number | Operation | None:
+    '''Applies the algebraic identities to `a op b` and returns
+    what it simplifies to, or `None` if none applies'''
+
+    def isNumber (value: Number | Operation, number: Number) -> bool:
+        '''Whether `value` is a number equal to `number`'''
+        return isinstance(value, Number) and value == number
+
+    if op is OP_SET.ADD:
+        if isNumber(a, 0):
+            return b
+        if isNumber(b, 0):
+            return a
+
+    elif op is OP_SET.SUB:
+        if isNumber(b, 0):
+            return a
+        if a is b:
+            return 0
+
+    elif op is OP_SET.MUL:
+        if isNumber(a, 0) or isNumber(b, 0):
+            return 0
+        if isNumber(a, 1):
+            return b
+        if isNumber(b, 1):
+            return a
+
+    elif op is OP_SET.DIV:
+        if isNumber(b, 1):
+            return a
+        if isNumber(a, 0) and isinstance(b, Number) and b != 0:
+            return 0
+        if a is b:
+            return 1
+
+    elif op is OP_SET.IDIV:
+        if isNumber(a, 0) and isinstance(b, Number) and b != 0:
+            return 0
+        if a is b:
+            return 1
+
+    elif op is OP_SET.POW:
+        if isNumber(b, 0) or isNumber(a, 1):
+            return 1
+        if isNumber(b, 1):
+            return a
+
+    else:
+        assert False, f"Forgot to update the OP_SET here {op}"
+
+    return None
+
+def sameResult (value: Number | Operation, result: Number) -> bool:
+    '''Whether `value` evaluates to exactly `result`, same value and same type'''
+    if isinstance(value, Operation):
+        value = value.result
+    return type(value) is type(result) and value == result
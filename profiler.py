@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+'''The Malang profiler. Attributes the construction of a program to the
+Malang functions and anonymous scopes that were evaluated, so that
+the slow ones can be found and rewritten'''
+
+from core import Operation, currentContext
+from hooks import Hooks, HookEvent, SCOPE_ENTER, SCOPE_EXIT, CALL_START, CALL_END, OPERATION_CREATED
+from typing import Any, TextIO
+import weakref
+import time
+
+# The name of the frames of the anonymous scopes
+ANONYMOUS_NAME = '{anonymous}'
+
+class Entry ():
+    '''What was recorded about a single function or anonymous scope, over
+    all of its calls. The attributes are as follow:\n
+    - `name`: the name of the function, or `ANONYMOUS_NAME`\n
+    - `location`: where it's defined, as `file:line`\n
+    - `calls`: how many times it was called, inlined or not\n
+    - `inclusive`: the seconds spent in it, its callees included\n
+    - `exclusive`: the seconds spent in it, its callees excluded\n
+    - `objects_inclusive`: the Operation objects created in it, its callees included\n
+    - `objects_exclusive`: the Operation objects created in it, its callees excluded\n
+    - `operations`: the mathematical operations it added, its callees included. That's what the
+    values it returned stand for, minus what its arguments and the values it read from outer scopes
+    stood for already: only the Operations created while it was on the stack are counted'''
+
+    __slots__ = ('name', 'location', 'calls', 'inclusive', 'exclusive', 'objects_inclusive', 'objects_exclusive', 'operations', 'active')
+
+    def __init__(self, name: str, location: str) -> None:
+        self.name = name
+        self.location = location
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.objects_inclusive = 0
+        self.objects_exclusive = 0
+        self.operations = 0
+        self.active = 0 # How many of its calls are on the stack
+
+class Profiler ():
+    '''Records the calls of a program while it's being constructed. It's
+    attached to the Hooks given to `constructProgram()`, which tell it
+    whenever a frame is entered and left, and it's reported afterwards.\n
+    - `entries`: maps the name and the location of each function or anonymous scope to its Entry\n
+    - `stacks`: maps each stack of frames, joined by `;`, to the seconds spent in its top frame'''
+
+    def __init__(self) -> None:
+        self.entries = {}
+        self.stacks = {}
+        # The frames on the stack. Each one is its Entry, its stack, when it started, the objects
+        #   count then, and the seconds and objects of its callees so far
+        self.__frames = []
+        # Maps each created Operation to the order it was created in, to tell
+        #   which ones a frame added. Check `added()`
+        self.__created = weakref.WeakKeyDictionary()
+        self.__created_count = 0
+
+    def attach (self, hooks: Hooks) -> None:
+        '''Registers the callbacks that record the frames: the calls of the
+        functions, inlined or not, the anonymous scopes and the main scope'''
+        from runner import Node
+        def scopeEnter (event: HookEvent) -> None:
+            if event.node is None or event.node.type != Node.Type.FUNC_DEF: # The functions are recorded by their calls
+                self.enter(event.name if event.name is not None else ANONYMOUS_NAME, event.token)
+        def scopeExit (event: HookEvent) -> None:
+            if event.node is None or event.node.type != Node.Type.FUNC_DEF:
+                self.leave(event.value)
+        hooks.register(SCOPE_ENTER, scopeEnter)
+        hooks.register(SCOPE_EXIT, scopeExit)
+        hooks.register(CALL_START, lambda event: self.enter(event.name, event.node.components['func']))
+        hooks.register(CALL_END, lambda event: self.leave(event.value))
+        hooks.register(OPERATION_CREATED, lambda event: self.created(event.value))
+
+    def created (self, operation: Operation) -> None:
+        '''Records that the `operation` was just created'''
+        self.__created[operation] = self.__created_count
+        self.__created_count += 1
+
+    def added (self, value: Any, since: int) -> int:
+        '''How many mathematical operations the `value` stands for, counting
+        only the Operations created since the `since`th one. The sub operations
+        that existed before are not gone into, so it only costs as much as what was added'''
+        created = self.__created
+        def isAdded (argument: Any) -> bool:
+            return isinstance(argument, Operation) and created.get(argument, -1) >= since
+        if not isAdded(value):
+            return 0
+        counts = {} # Maps the id of each added Operation to the mathematical operations it added
+        stack = [(value, False)]
+        while len(stack) != 0:
+            node, expanded = stack.pop()
+            if expanded:
+                count = 1
+                for argument in (node.a, node.b):
+                    if isAdded(argument):
+                        count += counts[id(argument)]
+                counts[id(node)] = count
+                continue
+            if id(node) in counts:
+                continue
+            counts[id(node)] = None # Being gone into
+            stack.append((node, True))
+            for argument in (node.b, node.a):
+                if isAdded(argument) and id(argument) not in counts:
+                    stack.append((argument, False))
+        return counts[id(value)]
+
+    def enter (self, name: str, token: Any) -> None:
+        '''Enters the frame of the function or anonymous scope named `name`, that's
+        defined at the `token`. Either the function's identifier in its definition or the scope's starter'''
+        location = f"{token.file}:{token.line_number}"
+        key = (name, location)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = Entry(name, location)
+            self.entries[key] = entry
+        entry.calls += 1
+        entry.active += 1
+        frame = f"{name} ({location})"
+        stack = frame if len(self.__frames) == 0 else f"{self.__frames[-1][1]};{frame}"
+        self.__frames.append([entry, stack, time.perf_counter(), currentContext().objects_count, 0.0, 0, self.__created_count])
+
+    def leave (self, value: Any) -> None:
+        '''Leaves the current frame, that returned `value`'''
+        end = time.perf_counter()
+        objects_count = currentContext().objects_count
+        entry, stack, start, start_objects, callees_seconds, callees_objects, start_created = self.__frames.pop()
+        seconds = end - start
+        objects = objects_count - start_objects
+        entry.active -= 1
+        if entry.active == 0: # Otherwise the outer call already counts it
+            entry.inclusive += seconds
+            entry.objects_inclusive += objects
+            entry.operations += self.added(value, start_created)
+        entry.exclusive += seconds - callees_seconds
+        entry.objects_exclusive += objects - callees_objects
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + seconds - callees_seconds
+        if len(self.__frames) != 0:
+            caller = self.__frames[-1]
+            caller[4] += seconds
+            caller[5] += objects
+
+    def report (self, file: TextIO, limit: int | None=None) -> None:
+        '''Writes a table of the entries, the ones that took the
+        most time by themselves first. Only the first `limit` ones if given'''
+        entries = sorted(self.entries.values(), key=lambda entry: entry.exclusive, reverse=True)
+        if limit is not None:
+            entries = entries[:limit]
+        print(f"{'calls':>9} {'incl. [s]':>10} {'excl. [s]':>10} {'incl. objs':>11} {'excl. objs':>11} {'added ops':>12}  function", file=file)
+        for entry in entries:
+            print(f"{entry.calls:>9} {entry.inclusive:>10.4f} {entry.exclusive:>10.4f} {entry.objects_inclusive:>11} {entry.objects_exclusive:>11} {entry.operations:>12}  {entry.name} ({entry.location})", file=file)
+
+    def writeStacks (self, file: TextIO) -> None:
+        '''Writes the stacks in the collapsed format of the flame
+        graph tools, one per line, with the microseconds spent in their top frame'''
+        for stack, seconds in self.stacks.items():
+            microseconds = round(seconds * 1_000_000)
+            if microseconds > 0:
+                file.write(f"{stack} {microseconds}\n")
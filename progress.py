@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+'''Progress reporting. The construction publishes where it is, which scope
+and which iteration of which for loop, and a background thread reports
+it every so often along with how fast the Operation objects are created'''
+
+from core import Context
+from typing import TextIO
+import threading
+import time
+
+class Loop ():
+    '''An unwrapped for loop of a scope that's being evaluated:\n
+    - `name`: the name of its variable, or `None` if it has none\n
+    - `count`: how many iterations it has\n
+    - `iteration`: how many of them were started\n
+    - `content`: the content of the scope it was unwrapped in\n
+    - `tail`: how many instructions come after it in the `content`. Unlike
+    its end, it doesn't move when the for loops in its body are unwrapped\n
+    - `starts`: the ids of the instructions that start its iterations'''
+
+    __slots__ = ('name', 'count', 'iteration', 'content', 'tail', 'starts')
+
+    def __init__(self, name: str | None, count: int, content: list, tail: int, starts: set[int]) -> None:
+        self.name = name
+        self.count = count
+        self.iteration = 0
+        self.content = content
+        self.tail = tail
+        self.starts = starts
+
+class Progress ():
+    '''Where the construction is, published by `constructProgram()`:\n
+    - `depth`: how many scopes are being evaluated, the main one included\n
+    - `loops`: the unwrapped for loops that are being evaluated, the innermost last'''
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.loops = []
+
+    def enter (self) -> int:
+        '''Enters a scope. Returns how many for loops are outside of it'''
+        self.depth += 1
+        return len(self.loops)
+
+    def leave (self, base: int, value):
+        '''Leaves the scope that was entered with `base` for loops outside of
+        it. Returns `value` back, so that the return can be wrapped'''
+        del self.loops[base:]
+        self.depth -= 1
+        return value
+
+    def unwrapped (self, name: str | None, count: int, content: list, tail: int, starts: set[int]) -> None:
+        '''A for loop was unwrapped in the `content` of the current scope. Check `Loop`'''
+        if count != 0 and len(starts) != 0:
+            self.loops.append(Loop(name, count, content, tail, starts))
+
+    def advance (self, base: int, content: list, i: int) -> None:
+        '''The current scope, entered with `base` for loops outside of it, is
+        about to evaluate the instruction at `i` in its `content`'''
+        loops = self.loops
+        while len(loops) > base and i >= len(content) - loops[-1].tail:
+            loops.pop() # Left behind
+        if len(loops) > base and id(content[i]) in loops[-1].starts:
+            loops[-1].iteration += 1
+
+class ProgressReporter ():
+    '''Reports the `progress` of the run of the `context` to the
+    `file` every `interval` seconds, from a thread of its own,
+    between `start()` and `stop()`'''
+
+    def __init__(self, progress: Progress, context: Context, interval: float, file: TextIO) -> None:
+        self.progress = progress
+        self.context = context
+        self.interval = interval
+        self.file = file
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start (self) -> None:
+        self.__start = time.perf_counter()
+        self.__thread.start()
+
+    def stop (self) -> None:
+        self.__stopped.set()
+        self.__thread.join()
+
+    def __run (self) -> None:
+        from memstats import currentRSS
+        previous_time, previous_count = self.__start, self.context.objects_count
+        while not self.__stopped.wait(self.interval):
+            now, count = time.perf_counter(), self.context.objects_count
+            rate = (count - previous_count) / (now - previous_time)
+            previous_time, previous_count = now, count
+            parts = [f"⏳ {now - self.__start:.0f}s", f"{count} Operation objects", f"{rate:,.0f}/s"]
+            rss = currentRSS()
+            if rss is not None:
+                parts.append(f"RSS {rss / 2**20:.0f} MB")
+            parts.append(f"depth {self.progress.depth}")
+            try:
+                loop = self.progress.loops[-1]
+                parts.append(f"for {loop.name + ': ' if loop.name is not None else ''}{loop.iteration}/{loop.count}")
+            except IndexError:
+                pass # Not in a for loop, or it just left it
+            print(' | '.join(parts), file=self.file, flush=True)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+'''Python-level profiling of the runner. Profiles each phase of a run
+in a session of its own, so that they're not mixed together, either
+deterministically with `cProfile`, or by sampling the stack every
+so often, which costs far less for the long runs'''
+
+from contextlib import contextmanager
+from typing import Iterator
+import cProfile
+import signal
+import pstats
+import os
+
+SUMMARY_FILE_NAME = 'summary.txt'
+STACKS_FILE_NAME = 'stacks.txt'
+
+class PhaseProfiler ():
+    '''Profiles the phases of a run, one after the other. Call `phase()` at the
+    start of each one, and `finish()` at the end of the last one. The
+    profiles are written to the `directory`:\n
+    - Deterministically, each phase is saved as `NN-phase.pstats`, to be
+    read with `pstats` or any of its viewers\n
+    - When sampling every `interval` seconds, the sampled stacks of all the phases
+    are saved in the collapsed format of the flame graph tools as `stacks.txt`, each
+    one under the name of its phase, with how many times it was sampled\n
+    Either way, the functions that took the most time in each phase are saved in `summary.txt`.\n
+    Some phases happen in the middle of another one, and maybe many times
+    over, like the validation of the functions during the construction. They're
+    profiled with `nested()`, which pauses the current phase meanwhile.'''
+
+    def __init__(self, directory: str, interval: float | None=None) -> None:
+        if interval is not None and not hasattr(signal, 'setitimer'):
+            raise Exception(f"❌ UNSUPPORTED: Sampling the stack is not supported on this platform")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+        # The phases so far, in order. Each one is its name and its profile, or the
+        #   samples of its stacks if sampling, mapping each stack to how many times it was sampled
+        self.phases = []
+        self.__profile = None # The profile that is enabled, of the current phase or of a nested one
+        # The name and the samples of the phase being sampled
+        self.__sampled = None
+        # The nested phases of the current phase, by name. Each one is its profile or its samples
+        self.__nested = {}
+        # How many times each nested phase is entered at the moment, by name
+        self.__depths = {}
+
+    def phase (self, name: str) -> None:
+        '''Ends the current phase if there is one, and starts the next one'''
+        self.__stop()
+        self.__nested = {}
+        if self.interval is None:
+            self.__profile = cProfile.Profile()
+            self.phases.append((name, self.__profile))
+            self.__profile.enable()
+        else:
+            samples = {}
+            self.phases.append((name, samples))
+            self.__sampled = (name, samples)
+            def sample (signum: int, frame) -> None:
+                name, samples = self.__sampled
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(name)
+                stack = ';'.join(reversed(stack))
+                samples[stack] = samples.get(stack, 0) + 1
+            signal.signal(signal.SIGPROF, sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    @contextmanager
+    def nested (self, name: str) -> Iterator[None]:
+        '''Profiles what's done within as the phase `name`, nested in the current one. Each
+        time it's entered adds up to the same profile. cProfile sessions can't be
+        enabled together, so the one that was active is paused meanwhile, and so its time
+        is not counted twice. Nested phases can be nested in one another, and re-entered
+        while they're already running, as the validation of the functions does: only the
+        outermost entering and exiting of a name switch the profiles'''
+        depth = self.__depths.get(name, 0)
+        self.__depths[name] = depth +1
+        if depth != 0:
+            try:
+                yield
+            finally:
+                self.__depths[name] = depth
+            return
+        profile = self.__nested.get(name)
+        if profile is None:
+            profile = cProfile.Profile() if self.interval is None else {}
+            self.__nested[name] = profile
+            self.phases.append((name, profile))
+        try:
+            if self.interval is None:
+                outer = self.__profile
+                if outer is not None:
+                    outer.disable()
+                self.__profile = profile
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+                    self.__profile = outer
+                    if outer is not None:
+                        outer.enable()
+            else:
+                outer = self.__sampled
+                self.__sampled = (name, profile)
+                try:
+                    yield
+                finally:
+                    self.__sampled = outer
+        finally:
+            self.__depths[name] = depth
+
+    def __stop (self) -> None:
+        if self.interval is None:
+            if self.__profile is not None:
+                self.__profile.disable()
+                self.__profile = None
+        elif len(self.phases) != 0:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def finish (self, limit: int=10) -> str:
+        '''Ends the last phase, and writes the profiles and the summary, in
+        which each phase has its first `limit` functions. Returns the summary'''
+        self.__stop()
+        if self.interval is None:
+            for i, (name, profile) in enumerate(self.phases):
+                profile.dump_stats(os.path.join(self.directory, f"{i +1:02}-{name}.pstats"))
+        else:
+            with open(os.path.join(self.directory, STACKS_FILE_NAME), 'w') as file:
+                for _, samples in self.phases:
+                    for stack, count in samples.items():
+                        file.write(f"{stack} {count}\n")
+        summary = ''.join(self.__summarize(name, profile, limit) for name, profile in self.phases)
+        with open(os.path.join(self.directory, SUMMARY_FILE_NAME), 'w') as file:
+            file.write(summary)
+        return summary
+
+    def __summarize (self, name: str, profile: cProfile.Profile | dict, limit: int) -> str:
+        '''The first `limit` functions of a phase, by the time spent in
+        themselves. Or by how many times they were on top of the stack if sampling'''
+        lines = []
+        if self.interval is None:
+            stats = pstats.Stats(profile).stats
+            total = sum(tt for _, _, tt, _, _ in stats.values())
+            lines.append(f"{name}: {total:.4f} seconds")
+            lines.append(f"{'tottime':>10} {'cumtime':>10} {'calls':>10}  function")
+            top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+            for (file, line, function), (_, calls, tt, ct, _) in top:
+                lines.append(f"{tt:>10.4f} {ct:>10.4f} {calls:>10}  {os.path.basename(file)}:{line}({function})")
+        else:
+            leaves = {}
+            for stack, count in profile.items():
+                leaf = stack.rsplit(';', 1)[1] if ';' in stack else stack
+                leaves[leaf] = leaves.get(leaf, 0) + count
+            total = sum(leaves.values())
+            lines.append(f"{name}: {total} sample{['', 's'][0 if total == 1 else 1]}, roughly {total * self.interval:.4f} seconds")
+            lines.append(f"{'samples':>10} {'share':>7}  function")
+            top = sorted(leaves.items(), key=lambda item: item[1], reverse=True)[:limit]
+            for leaf, count in top:
+                lines.append(f"{count:>10} {count / total:>7.1%}  {leaf}")
+        return '\n'.join(lines) +'\n\n'
@@ -6,11 +6,19 @@ if __name__ == '__main__':
     raise Exception('The runner should not be run directly.')
 
 import os
-from core import OP_SET, Operation
-from typing import Type
+from core import OP_SET, Operation, Input, findInputs, Context, currentContext, runningIn
+from typing import Type, TextIO, TYPE_CHECKING
 from enum import Enum, auto
 from numbers import Number
 
+if TYPE_CHECKING: # Only imported as needed, check `constructProgram()`
+    from spill import SpillStore
+    from checkpoint import Checkpointer, Checkpoint
+    from hooks import Hooks
+    from progress import Progress
+    from budget import Budget
+    from pyprofile import PhaseProfiler
+
 # TODO: consider adding +=, -=, *=.. ?
 # TODO: optimization: how about not checking and adding functions every time you enter the same scope?
 
@@ -135,11 +143,20 @@ class Token ():
         
         return Token(Token.Type.IDENTIFIER, name, *synthesizer.getSynthesizedInfo())
 
-def parseSourceFile (file_path: str) -> list[Token]:
+def parseSourceFile (file_path: str, content: str | None=None, cache: dict | None=None, includes: set[str] | None=None) -> list[Token]:
     '''Takes a source file and parses its content to tokens
     Does not check for structure validity,
     only checks for content correctness\n
-    Also handles includes'''
+    Also handles includes\n
+    `content`: the content to parse instead of reading
+    the file, which then doesn't need to exist. The `file_path` is still
+    used to resolve the includes and to point out errors\n
+    `cache`: if given, the tokens of the included files are kept in
+    it, and taken from it the next time they're included in the same
+    way, as long as the files didn't change. To parse many programs
+    that include the same libraries\n
+    `includes`: if given, the absolute paths of the parsed
+    files, the main one included, are added to it'''
     
     def parsingError (message: str, temp_token: Token) -> None:
         '''Raises a parsing error exception'''
@@ -190,6 +207,66 @@ def parseSourceFile (file_path: str) -> list[Token]:
             else:
                 return None
     
+    def stamp (abs_path: str) -> tuple[int, int] | None:
+        '''When the file was last modified and its size, or
+        `None` if it can't be found anymore'''
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def resolves (file_path: str, main_file_path: str, abs_path: str) -> bool:
+        '''Whether the file still resolves to `abs_path`. It's
+        resolved relative to the main file first'''
+        result = resolveFile(file_path, main_file_path)
+        return result is not None and result[1] == abs_path
+    
+    # The includes resolved while parsing each of the included files being parsed. Check `include()`
+    recorders = []
+    
+    def include (content: str, file_path: str, abs_path: str, main_file_path: str, includes: set[str]) -> list[Token]:
+        '''Parses an included file along with what it includes in turn, or
+        takes its tokens from the `cache`. They're the same as long as the
+        files are the same, they include the same files, and the same ones
+        were included before it. The main file aside, which is excluded from
+        the key unless the included file reaches it'''
+        if cache is None:
+            includes.add(abs_path)
+            return parse(content, file_path, False, main_file_path, includes)
+        
+        before = includes - {main_file_path}
+        key = (abs_path, file_path, frozenset(before))
+        entry = cache.get(key)
+        if entry is not None:
+            stamps, resolutions, tokens, added = entry
+            if (all(stamp(path) == path_stamp for path, path_stamp in stamps.items()) and
+                    all(resolves(name, main_file_path, path) for name, path in resolutions)):
+                for recorder in recorders:
+                    recorder.extend(resolutions)
+                includes.update(added)
+                currentContext().cache_hits += 1
+                return tokens
+        
+        currentContext().cache_misses += 1
+        # Parse it without the main file, to find out whether it reaches it
+        reached = before | {abs_path}
+        resolutions = []
+        recorders.append(resolutions)
+        try:
+            tokens = parse(content, file_path, False, main_file_path, reached)
+        finally:
+            recorders.pop()
+        for recorder in recorders:
+            recorder.extend(resolutions)
+        added = reached - before
+        if main_file_path in added:
+            includes.add(abs_path)
+            return parse(content, file_path, False, main_file_path, includes)
+        cache[key] = ({path: stamp(path) for path in added}, resolutions, tokens, added)
+        includes.update(added)
+        return tokens
+    
     def parse (content: str, file_path: str, main: bool, main_file_path: str, includes: set[str]) -> list[Token]:
         '''The functions that actually parses the file\n
         `content`: content to parse\n
@@ -337,9 +414,10 @@ def parseSourceFile (file_path: str) -> list[Token]:
                                 temp_token = Token(None, line[i :], line, len(line) -i, file_path, line_index, i)
                                 raise Exception(f"❌ NO SUCH FILE: Couldn't locate this file `{included_file_path}` that you wanted to include in here\n{temp_token.pointOut()}\n{temp_token.location()}")
                             included_file_content, included_file_abs_path = result
+                            for recorder in recorders:
+                                recorder.append((included_file_path, included_file_abs_path))
                             if included_file_abs_path not in includes:
-                                includes.add(included_file_abs_path)
-                                tokens.extend(parse(included_file_content, included_file_path, False, main_file_path, includes))
+                                tokens.extend(include(included_file_content, included_file_path, included_file_abs_path, main_file_path, includes))
                         break
                     
                     else:
@@ -418,11 +496,16 @@ def parseSourceFile (file_path: str) -> list[Token]:
         
         return tokens
     
-    result = resolveFile(file_path, file_path)
-    if result is None:
-        raise Exception(f"❌ FILE DOES NOT EXISTS: `{file_path}`")
-    content, abs_path = result
-    includes = {abs_path}
+    if content is None:
+        result = resolveFile(file_path, file_path)
+        if result is None:
+            raise Exception(f"❌ FILE DOES NOT EXISTS: `{file_path}`")
+        content, abs_path = result
+    else:
+        abs_path = os.path.abspath(file_path)
+    if includes is None:
+        includes = set()
+    includes.add(abs_path)
     return parse(content, file_path, True, abs_path, includes)
 
 
@@ -1015,7 +1098,111 @@ def constructAST (tokens: list[Token]) -> Node:
     return construct(tokens, True)
 
 
-def constructProgram (ast: Node, args: list[Number]) -> Operation:
+# The default biggest size of the inlined functions. Calling a function costs
+#   about as much as evaluating this many value elements, past it the call is not
+#   worth saving
+INLINE_THRESHOLD = 32
+
+def isInlinable (func_def: Node, threshold: int) -> bool:
+    '''Whether the function can be inlined at its call sites, that is its
+    body evaluated right in the scope of the caller, without creating
+    a scope for it.\n
+    That's the case for small functions whose body is only local Node.VAR_ASSIGNs
+    followed by a return with a value, which only use operations, parenthesis, numbers,
+    variables and function calls. And which neither use the return variable nor the
+    external one. Like most of the std functions, `not`, `null`, `if`..\n
+    `threshold`: the biggest size allowed for the body, in value elements'''
+    assert func_def.type == Node.Type.FUNC_DEF, f"Not a Node.FUNC_DEF {func_def}"
+    
+    body = func_def.components['body']
+    if len(body) == 0:
+        return False
+    last = body[-1]
+    if last.type != Node.Type.RETURN or not last.components['has_value']:
+        return False
+    
+    size = 0
+    values = [last.components['value']]
+    for node in body[:-1]:
+        if node.type != Node.Type.VAR_ASSIGN or node.components['ext'] or node.components['var'].lexeme in ['res', 'ext_res']:
+            return False
+        values.append(node.components['value'])
+    while len(values) != 0:
+        value = values.pop()
+        size += 1
+        if size > threshold:
+            return False
+        if type(value) == Token:
+            if value.type == Token.Type.IDENTIFIER and value.lexeme in ['res', 'ext_res']:
+                return False
+        elif value.type == Node.Type.OP:
+            values.append(value.components['l_value'])
+            values.append(value.components['r_value'])
+        elif value.type == Node.Type.ORDER_PAREN:
+            values.append(value.components['value'])
+        elif value.type == Node.Type.FUNC_CALL:
+            values.extend(value.components['args'])
+        else:
+            return False
+    return True
+
+# The library whose `print` functions are streamed. Check `isLibraryPrint()`
+PRINT_LIBRARY_NAME = 'str'
+PRINT_FUNCTION_NAME = 'print'
+
+def callSite (func_call: Node) -> Token:
+    '''The token that a Node.FUNC_CALL calls with, its identifier or its alias'''
+    return func_call.components['als'] if func_call.components['with_als'] else func_call.components['func']
+
+def isLibraryPrint (func_def: Node) -> bool:
+    '''Whether the function is one of the `print` functions of the
+    string library. They append what they print to the return variable
+    of their caller, and so its value is known as soon as they are called'''
+    func = func_def.components['func']
+    if func.lexeme != PRINT_FUNCTION_NAME:
+        return False
+    # The tokens of an included file keep the path it was included with
+    library = os.path.basename(func.file)
+    return library in [PRINT_LIBRARY_NAME, PRINT_LIBRARY_NAME +'.mlg']
+
+def decodeString (value: Number) -> str | None:
+    '''Decodes a Malang string, or returns `None` if
+    the value is not one. Check `libs/str.mlg`'''
+    if isinstance(value, float):
+        if not value.is_integer(): # NaN and infinities aren't either
+            return None
+        value = int(value)
+    if value < 0:
+        return None
+    return value.to_bytes((value.bit_length() +7) // 8, 'big').decode('latin-1')
+
+def interpretResult (result: Number) -> bool | str | Number:
+    '''Interprets the result of a program if possible, either as
+    a boolean value or as a string, otherwise returns it as is'''
+    if result in [0, 1]:
+        return bool(result)
+    elif result == 69:
+        return 'Nice'
+    elif result >= 0 and int(result) == result:
+        return decodeString(result)
+    return result
+
+class StreamedOutput ():
+    def __init__(self, stream: TextIO) -> None:
+        '''Writes what's streamed with `--stream` to the `stream`, and
+        keeps it in `text` so that only what wasn't streamed gets
+        printed at the end'''
+        self.stream = stream
+        self.text = ''
+    
+    def write (self, text: str) -> None:
+        self.stream.write(text)
+        self.text += text
+    
+    def flush (self) -> None:
+        self.stream.flush()
+
+def constructProgram (ast: Node | None, args: list[Number | Input], control_inputs: set[Input] | None=None, hoist: bool=False, inline_threshold: int=INLINE_THRESHOLD, store: SpillStore | None=None, checkpointer: Checkpointer | None=None, checkpoint: Checkpoint | None=None, output: TextIO | None=None, hooks: Hooks | None=None, progress: Progress | None=None, budget: Budget | None=None, phases: PhaseProfiler | None=None) -> Operation:
     '''Constructs the program by translating
     Nodes into Operations (only a single Operation
     is returned of course)\n
@@ -1023,7 +1210,35 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
     a none existing variable, defining an already existing
     function, recursion and
     cyclic calls.\n
-    - `args`: The args that will be passed to the main function'''
+    The `ast` is not modified by the evaluation, and so
+    it can be used to construct the program again.\n
+    - `args`: The args that will be passed to the main function. Either
+    numbers, or Inputs to have them as symbolic inputs in the operation\n
+    - `control_inputs`: if given, the Inputs that end up
+    controlling the bounds of a for loop are added to it. The
+    operation is only valid for the values these Inputs had\n
+    - `hoist`: whether to hoist the invariant values out of the for
+    loops, so that they are evaluated once and not once per iteration. Gives
+    the same operation, only with fewer Operation objects\n
+    - `inline_threshold`: the biggest size, in value elements, of the functions
+    that are inlined at their call sites. 0 to not inline any. Check `isInlinable()`\n
+    - `store`: if given, every created Operation is added to it, so that
+    the older ones are spilled to disk once there are too many of them\n
+    - `checkpointer`: if given, it's asked between every two instructions of
+    the main scope whether to save a checkpoint, and saves it if so\n
+    - `checkpoint`: if given, the construction is resumed from it instead
+    of starting from the `ast`, which is then not needed\n
+    - `output`: if given, what the main scope prints with the string library's
+    `print` is written to it as soon as it's printed, on top of
+    being appended to the result as usual\n
+    - `hooks`: if given, the callbacks registered in it when the construction
+    starts are called as their events happen. Check `hooks.py`\n
+    - `progress`: if given, the depth of the scopes and the iterations of the for
+    loops that are being evaluated are published to it, to be reported while it runs\n
+    - `budget`: if given, what the construction consumes is checked against it as it
+    goes, and `BudgetExceeded` is raised once it's exceeded or cancelled\n
+    - `phases`: if given, the validation of the functions and the unwrapping of the
+    constant for loops are profiled as phases of their own. Check `PhaseProfiler.nested()`'''
     
     RETURN_VAR_NAME = 'res'
     EXTERNAL_RETURN_VAR_NAME = 'ext_res'
@@ -1039,6 +1254,10 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
     class Scope:
     
         class FunctionSignature:
+            # Maps the id of a Node.FUNC_DEF to it and its signature. They're looked up
+            #   over and over. The Node.FUNC_DEF is kept so that its id can't be reused
+            __signatures = {}
+            
             def __init__(self, identifier: Token, als: Token, params_count: int) -> None:
                 '''A struct that refers to / identifies a function, either
                 from a function call or a function definition\n
@@ -1060,12 +1279,18 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             
             @classmethod
             def __fromFuncDef (cls, func_def: Node) -> Scope.FunctionSignature:
-                '''Creates a FunctionSignature from a Node.FUNC_DEF'''
+                '''Creates a FunctionSignature from a Node.FUNC_DEF, once per Node.FUNC_DEF'''
                 assert func_def.type == Node.Type.FUNC_DEF, f"Not a Node.FUNC_DEF {func_def}"
+                try:
+                    return cls.__signatures[id(func_def)][1]
+                except KeyError:
+                    pass
                 als = None
                 if func_def.components['has_als']:
                     als = func_def.components['als']
-                return cls(func_def.components['func'], als, len(func_def.components['params']))
+                signature = cls(func_def.components['func'], als, len(func_def.components['params']))
+                cls.__signatures[id(func_def)] = (func_def, signature)
+                return signature
             
             @classmethod
             def __fromFuncCall (cls, func_call: Node) -> Scope.FunctionSignature:
@@ -1114,9 +1339,9 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                 and returns the Node.FUNC_DEF corresponding to it. Or
                 throws an InvalidCode exception if it didn't find it'''
                 assert func_call.type == Node.Type.FUNC_CALL, f"Not a Node.FUNC_CALL {func_call}"
-                func_sig = cls.__fromFuncCall(func_call)
-                func_def = func_sig.__lookRecursively(scope)
+                func_def = cls.lookFromFuncCall(func_call, scope)
                 if func_def is None:
+                    func_sig = cls.__fromFuncCall(func_call)
                     call = func_sig.identifier
                     if call == None:
                         call = func_sig.als
@@ -1124,6 +1349,13 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                 else:
                     return func_def
             
+            @classmethod
+            def lookFromFuncCall (cls, func_call: Node, scope: Scope) -> Node | None:
+                '''Same as `findFromFuncCall()`, but returns `None`
+                if it didn't find it'''
+                assert func_call.type == Node.Type.FUNC_CALL, f"Not a Node.FUNC_CALL {func_call}"
+                return cls.__fromFuncCall(func_call).__lookRecursively(scope)
+            
             @classmethod
             def checkFuncCall (cls, func_call: Node, scope: Scope) -> None:
                 '''Checks if this Node.FUNC_CALL is calling
@@ -1162,6 +1394,7 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             - `funcs`: a `list` of Node.FUNC_DEF'''
             
             Scope.__counter += 1 # Inc the counter
+            currentContext().scopes_count += 1
             # Create the return var
             return_var = Token.synthesizeIdentifier(RETURN_VAR_NAME, starter)
             
@@ -1204,12 +1437,32 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             assert func_call.type == Node.Type.FUNC_CALL, f"Not Node.FUNC_CALL {func_call}"
             
             func_def = Scope.FunctionSignature.findFromFuncCall(func_call, self)
-            func_scope = Scope(self, func_def.components['func'])
+            if output is not None and self.main and isLibraryPrint(func_def):
+                streamPrint(args)
+            if on_call_start is not None:
+                on_call_start(func_def, callSite(func_call), func_def.components['func'].lexeme, args)
+            if inlinable(func_def):
+                return_value = callInline(func_def, args, self, [])
+            else:
+                return_value = self.callFunc(func_def, args)
+            if on_call_end is not None:
+                on_call_end(func_def, callSite(func_call), func_def.components['func'].lexeme, return_value)
+            return return_value
+        
+        def callFunc (self, func_def: Node, args: list[Number | Operation]) -> Number | Operation:
+            '''Calls (evaluates) the function in a new scope with the given arguments'''
+            identifier = func_def.components['func']
+            func_scope = Scope(self, identifier)
             params = func_def.components['params']
             assert len(args) == len(params), f"Unreachable" # The correct fun_def is returned
             for param, arg in zip(params, args):
                 func_scope.setVarState(param, False, arg)
-            return evaluateScope(func_def.components['body'], func_scope, None)
+            if on_scope_enter is not None:
+                on_scope_enter(func_def, identifier, identifier.lexeme, None)
+            return_value = evaluateScope(func_def.components['body'], func_scope, None)
+            if on_scope_exit is not None:
+                on_scope_exit(func_def, identifier, identifier.lexeme, return_value)
+            return return_value
         
         def setVarState (self, identifier: Token, ext: bool, state: Number | Operation) -> None:
             '''Sets the new state for a variable, and if it doesn't exist add
@@ -1286,14 +1539,21 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                 
                 scope = Scope(parent_scope, starter)
                 content = content.copy() # Make a copy to be able to append Node.FOR_LOOP content so that it's checked too
+                # The ids of the nodes already checked. The unwrapped constant for loops repeat the same nodes, and
+                #   functions only get added to the scope, so what was valid stays valid. Still, every Node.FUNC_DEF is added
+                checked = set()
                 
                 i = 0
                 while i < len(content):
                     node = content[i]
                     nodeType = node.type
                     
-                    if nodeType == Node.Type.VAR_ASSIGN:
+                    if id(node) in checked:
+                        i += 1
+                    
+                    elif nodeType == Node.Type.VAR_ASSIGN:
                         checkCalledFuncs(node.components['value'], scope)
+                        checked.add(id(node))
                         i += 1
                     
                     elif nodeType == Node.Type.FUNC_DEF:
@@ -1302,11 +1562,13 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                     
                     elif nodeType in [Node.Type.FUNC_CALL, Node.Type.ANON_FUNC]:
                         checkCalledFuncs(node, scope)
+                        checked.add(id(node))
                         i += 1
                     
                     elif nodeType == Node.Type.RETURN:
                         if node.components['has_value']:
                             checkCalledFuncs(node.components['value'], scope)
+                        checked.add(id(node))
                         i += 1
                     
                     elif nodeType == Node.Type.FOR_LOOP:
@@ -1323,7 +1585,11 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             assert func_def.type == Node.Type.FUNC_DEF, f"Something other than Node.FUNC_DEF {func_def}"
             
             Scope.FunctionSignature.checkAlreadyDefined(func_def, self)
-            validateScopeFuncCalls(func_def.components['body'], self, func_def.components['func'])
+            if phases is None:
+                validateScopeFuncCalls(func_def.components['body'], self, func_def.components['func'])
+            else:
+                with phases.nested('validate'):
+                    validateScopeFuncCalls(func_def.components['body'], self, func_def.components['func'])
             self.funcs.append(func_def)
         
         def getReturnVarState (self) -> Number | Operation:
@@ -1351,20 +1617,9 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                 
             elif type(value_element) == Node:
                 if value_element.type == Node.Type.OP:
-                    op = OP_SET.fromSymbol(value_element.components['op'].lexeme)
                     l_value = processValueElement(value_element.components['l_value'], scope)
                     r_value = processValueElement(value_element.components['r_value'], scope)
-                    
-                    # A try-except block to catch all kinds of errors (ZeroDivisionError, OverflowError, etc..)
-                    try:
-                        return Operation(op, l_value, r_value)
-                    except Exception as e:
-                        op = value_element.components['op']
-                        l_value = l_value if isinstance(l_value, Number) else l_value.result
-                        r_value = r_value if isinstance(r_value, Number) else r_value.result                        
-                        msg = f"❌ ERROR: This exception `{e.__class__.__name__}: {e}` occurred while evaluating this Operation `{l_value} {op} {r_value}`"
-                        msg += f"\n{op.pointOut()}\n{op.location()}"
-                        raise Exception(msg)
+                    return createOperation(value_element.components['op'], l_value, r_value)
                 
                 elif value_element.type == Node.Type.ORDER_PAREN:
                     return processValueElement(value_element.components['value'], scope)
@@ -1376,18 +1631,134 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                     return scope.resolveFuncCall(value_element, args)
                 
                 elif value_element.type == Node.Type.ANON_FUNC:
-                    return evaluateScope(value_element.components['body'], (scope, value_element.components['starter']), None)
+                    starter = value_element.components['starter']
+                    if on_scope_enter is not None:
+                        on_scope_enter(value_element, starter, None, None)
+                    return_value = evaluateScope(value_element.components['body'], (scope, starter), None)
+                    if on_scope_exit is not None:
+                        on_scope_exit(value_element, starter, None, return_value)
+                    return return_value
             
             assert False, f"Unreachable"
     
+    def createOperation (op: Token, l_value: Number | Operation, r_value: Number | Operation) -> Operation:
+        '''Creates the Operation of the `op` Token with the given values'''
+        # A try-except block to catch all kinds of errors (ZeroDivisionError, OverflowError, etc..)
+        try:
+            operation = Operation(OP_SET.fromSymbol(op.lexeme), l_value, r_value)
+        except Exception as e:
+            l_value = l_value if isinstance(l_value, Number) else l_value.result
+            r_value = r_value if isinstance(r_value, Number) else r_value.result
+            msg = f"❌ ERROR: This exception `{e.__class__.__name__}: {e}` occurred while evaluating this Operation `{l_value} {op} {r_value}`"
+            msg += f"\n{op.pointOut()}\n{op.location()}"
+            raise Exception(msg)
+        if store is not None:
+            store.add(operation)
+        if budget is not None:
+            budget.created(operation, op)
+        if on_operation_created is not None:
+            on_operation_created(None, op, op.lexeme, operation)
+        return operation
+    
+    def streamPrint (args: list[Number | Operation]) -> None:
+        '''Writes what a call to the library's `print` prints to the `output`: the
+        string, followed by the end or a new line. Strings that aren't valid are skipped'''
+        chunks = [decodeString(arg.result if isinstance(arg, Operation) else arg) for arg in args]
+        if len(args) == 1:
+            chunks.append('\n')
+        output.write(''.join(chunk for chunk in chunks if chunk is not None))
+        output.flush()
+    
+    def inlinable (func_def: Node) -> bool:
+        '''Whether the function gets inlined. Check `isInlinable()`'''
+        try:
+            return inlinables[id(func_def)]
+        except KeyError:
+            inlinable = inline_threshold > 0 and isInlinable(func_def, inline_threshold)
+            inlinables[id(func_def)] = inlinable
+            return inlinable
+    
+    def callInline (func_def: Node, args: list[Number | Operation], scope: Scope, frames: list[tuple[Node, dict]]) -> Number | Operation:
+        '''Calls the inlinable function without creating a scope for it. Its
+        variables are kept in a frame instead, that comes before the `scope` when
+        resolving variables, just like its scope would have.\n
+        - `scope`: the scope of the caller, or of the first caller that was not inlined\n
+        - `frames`: the frames of the inlined callers, if it's called from one. Each
+        frame is the called Node.FUNC_DEF and a `dict` that maps a Token.IDENTIFIER
+        to an Operation / Number'''
+        frame_vars = {}
+        for param, arg in zip(func_def.components['params'], args):
+            frame_vars[param] = arg
+        frames = frames + [(func_def, frame_vars)]
+        
+        body = func_def.components['body']
+        for i in range(len(body) -1):
+            var_assign = body[i]
+            state = processInlineValue(var_assign.components['value'], scope, frames)
+            frame_vars[var_assign.components['var']] = state
+            if on_var_assign is not None:
+                on_var_assign(var_assign, var_assign.components['var'], var_assign.components['var'].lexeme, state)
+        return processInlineValue(body[-1].components['value'], scope, frames)
+    
+    def processInlineValue (value_element: Node | Token, scope: Scope, frames: list[tuple[Node, dict]]) -> Number | Operation:
+        '''Same as `processValueElement()` but for a value element of
+        an inlined function. Check `callInline()`'''
+        if type(value_element) == Token:
+            if value_element.type == Token.Type.NUMBER:
+                return value_element.lexeme
+            for _, frame_vars in reversed(frames):
+                if value_element in frame_vars:
+                    return frame_vars[value_element]
+            return scope.resolveVar(value_element)
+        
+        comps = value_element.components
+        if value_element.type == Node.Type.OP:
+            l_value = processInlineValue(comps['l_value'], scope, frames)
+            r_value = processInlineValue(comps['r_value'], scope, frames)
+            return createOperation(comps['op'], l_value, r_value)
+        
+        elif value_element.type == Node.Type.ORDER_PAREN:
+            return processInlineValue(comps['value'], scope, frames)
+        
+        elif value_element.type == Node.Type.FUNC_CALL:
+            args = []
+            for arg in comps['args']:
+                args.append(processInlineValue(arg, scope, frames))
+            # The inlined functions have no functions of their own, so the lookup starts from the scope
+            func_def = Scope.FunctionSignature.findFromFuncCall(value_element, scope)
+            if on_call_start is not None:
+                on_call_start(func_def, callSite(value_element), func_def.components['func'].lexeme, args)
+            if inlinable(func_def):
+                return_value = callInline(func_def, args, scope, frames)
+            
+            else:
+                # Can't be inlined, so create the scopes that the frames stand for. The
+                #   called function might read their variables, or assign to them
+                caller_scope = scope
+                frame_scopes = []
+                for frame_func_def, frame_vars in frames:
+                    caller_scope = Scope(caller_scope, frame_func_def.components['func'])
+                    caller_scope.vars.update(frame_vars)
+                    frame_scopes.append((caller_scope, frame_vars))
+                return_value = caller_scope.callFunc(func_def, args)
+                for frame_scope, frame_vars in frame_scopes:
+                    for var in frame_vars:
+                        frame_vars[var] = frame_scope.vars[var]
+            if on_call_end is not None:
+                on_call_end(func_def, callSite(value_element), func_def.components['func'].lexeme, return_value)
+            return return_value
+        
+        assert False, f"Unreachable, checked that it is inlinable"
+    
     def unwrapForLoop(content: list[Node], where: int, scope: Scope) -> None:
         '''Unwraps the for loop located at `where` after evaluating its
         bounds'''
         
-        def insertIteration(for_loop: Node, content: list[Node], where: int, iteration: int, var_value: Number) -> None:
+        def insertIteration(for_loop: Node, content: list[Node], where: int, iteration: int, var_value: Number) -> Node | None:
             '''Insert the body of the `for_loop` in the
             appropriate position for the given iteration (computes it
-            from the iteration and length of the body)\n
+            from the iteration and length of the body). Returns the
+            instruction that starts the iteration, if there is one\n
             `where`: the original `for_loop` position\n
             `var_value`: the value to assign to the loop's var
             in this iteration if it has a var'''
@@ -1413,6 +1784,7 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                 offset += 1
             # Insert the body
             content[offset:offset] = body
+            return var_assign if has_var else (body[0] if len(body) != 0 else None)
         
         assert content[where].type == Node.Type.FOR_LOOP, f"Not a Node.FOR_LOOP"
         
@@ -1426,7 +1798,9 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
         ]
         for i, parameter in enumerate(parameters):
             parameter = processValueElement(parameter, scope)
-            if type(parameter) == Operation:
+            if isinstance(parameter, Operation):
+                if control_inputs is not None:
+                    control_inputs.update(findInputs(parameter, inputs_memo))
                 parameter = parameter.result
             parameters[i] = parameter
         begin, end, step = parameters
@@ -1434,18 +1808,62 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
         if step == 0:
             invalidCode(f"For loops can't have a zero step (infinite loop). This for loop step was evaluated and it was zero", for_loop.components['for_kw'])
         
-        # Now we iterate and insert the body
-        iteration = 0
+        # Get the values the var is going to take
+        values = []
         if step > 0:
             while begin <= end:
-                insertIteration(for_loop, content, where, iteration, begin)
+                if budget is not None:
+                    budget.iterated(for_loop.components['for_kw'])
+                values.append(begin)
                 begin += step
-                iteration += 1
         else:
             while end >= begin:
-                insertIteration(for_loop, content, where, iteration, end)
+                if budget is not None:
+                    budget.iterated(for_loop.components['for_kw'])
+                values.append(end)
                 end += step
-                iteration += 1
+        
+        if on_loop_unwrap is not None:
+            on_loop_unwrap(for_loop, for_loop.components['for_kw'], for_loop.components['var'].lexeme if for_loop.components['has_var'] else None, len(values))
+        
+        # Hoist the invariants, only if there is more than one iteration to gain from it
+        if hoist and len(values) > 1:
+            assigns, for_loop = hoistInvariants(for_loop, scope)
+            content[where:where] = assigns
+            where += len(assigns)
+        
+        # Now we iterate and insert the body
+        starts = set()
+        for iteration, value in enumerate(values):
+            if budget is not None: # Inserting them takes longer than counting them
+                budget.tick(for_loop.components['for_kw'])
+            start = insertIteration(for_loop, content, where, iteration, value)
+            if start is not None:
+                starts.add(id(start))
+        
+        # The constant for loops are unwrapped before the scope is evaluated, they're not followed
+        if progress is not None and scope is not None:
+            stride = len(for_loop.components['body']) +int(for_loop.components['has_var'])
+            name = for_loop.components['var'].lexeme if for_loop.components['has_var'] else None
+            progress.unwrapped(name, len(values), content, len(content) - where - stride*len(values), starts)
+    
+    def hoistInvariants (for_loop: Node, scope: Scope | None) -> tuple[list[Node], Node]:
+        '''Returns the Node.VAR_ASSIGNs of the invariant values of the `for_loop`,
+        and the for loop that references them. Check `hoister.hoistInvariants()`'''
+        from hoister import hoistInvariants
+        
+        resolveCall = None
+        if scope is not None:
+            resolveCall = lambda func_call: Scope.FunctionSignature.lookFromFuncCall(func_call, scope)
+        
+        # The same loop gets unwrapped again each time its scope is evaluated, so reuse the hoisting when it holds
+        loop_hoistings = hoistings.setdefault(id(for_loop), [])
+        for hoisting in loop_hoistings:
+            if hoisting.holdsFor(resolveCall):
+                return hoisting.assigns, hoisting.for_loop
+        hoisting = hoistInvariants(for_loop, resolveCall)
+        loop_hoistings.append(hoisting)
+        return hoisting.assigns, hoisting.for_loop
     
     def evaluateScope (content: list[Node], scope: Scope | tuple[Scope | None, Token], args: list[Number] | None) -> Number | Operation:
         '''Evaluates a scope and returns 
@@ -1459,8 +1877,9 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
         - `args`: the command line arguments for this program. Should only be present if it's the main scope 
         '''
         
-        def extractMainFunction (content: list[Node], i: int, args: list[args]) -> None:
-            '''Extracts the main function into the main scope content.\n
+        def extractMainFunction (content: list[Node], i: int, args: list[Number | Input]) -> None:
+            '''Extracts the main function into the main scope content, and
+            assigns the arguments to its parameters in the main scope.\n
             - `i`: where is the main function in the content?'''
             assert content[i].type == Node.Type.FUNC_DEF, f"Not a Node.FUNC_DEF. {content[i]}"
             
@@ -1480,11 +1899,11 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             
             # Then remove the function
             content.pop(i)
-            # Append the parameters
+            # Assign the parameters
             for param, arg in zip(params, args):
-                var_assign = Node.makeVarAssign(False, param, Token.synthesizeNumber(arg, param))
-                content.insert(i, var_assign)
-                i += 1
+                if type(arg) is Input:
+                    arg.name = param.lexeme # Name the Inputs after the parameters
+                scope.setVarState(param, False, arg)
             # Finally, append the body
             content[i : i] = comps['body']
         
@@ -1498,16 +1917,30 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
         # Assert that args only exist with main scope
         assert scope.main == (args is not None), f"Main scope with no args, or args outside main scope. Scope: {scope}. Args: {args}"
         
-        if not scope.main:
-            content = content.copy() # Make a copy in which the for loops (if they exist) are going to get unwrapped for this scope
+        if progress is not None:
+            loops_base = progress.enter()
+        
+        content = content.copy() # Make a copy in which the for loops (if they exist) are going to get unwrapped for this scope
         i = 0
         while i < len(content):
+            if progress is not None:
+                progress.advance(loops_base, content, i)
+            if budget is not None:
+                budget.tick(scope.return_var)
+            
+            # Between two instructions of the main scope, nothing else is being evaluated, and
+            #   the unwrapped for loops are in the content. So that's all the state there is to save
+            if scope.main and checkpointer is not None and checkpointer.isDue():
+                checkpointer.save(content[i:], scope.vars, scope.funcs, main_starter, args)
+            
             node = content[i]
             nodeType = node.type
             
             if nodeType == Node.Type.VAR_ASSIGN:
                 state = processValueElement(node.components['value'], scope)
                 scope.setVarState(node.components['var'], node.components['ext'], state)
+                if on_var_assign is not None:
+                    on_var_assign(node, node.components['var'], node.components['var'].lexeme, state)
                 i += 1
             
             elif nodeType == Node.Type.FUNC_DEF:
@@ -1527,9 +1960,10 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             
             elif nodeType == Node.Type.RETURN:
                 if node.components['has_value']:
-                    return processValueElement(node.components['value'], scope)
+                    return_value = processValueElement(node.components['value'], scope)
                 else:
-                    return scope.getReturnVarState()
+                    return_value = scope.getReturnVarState()
+                return return_value if progress is None else progress.leave(loops_base, return_value)
             
             elif nodeType == Node.Type.FOR_LOOP:
                 unwrapForLoop(content, i, scope)
@@ -1540,7 +1974,8 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
         
         # print(f"Content after [SCOPE #{scope.id}]: {content}") # DEBUG
         
-        return scope.getReturnVarState()
+        return_value = scope.getReturnVarState()
+        return return_value if progress is None else progress.leave(loops_base, return_value)
     
     def unwrapConstantForLoops (content: list[Node]) -> None:
         '''Iterates trough all the content and unwraps constant
@@ -1592,11 +2027,13 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
                 unwrapConstantForLoops(comps['body'])
                 i += 1
             
-            # Else if it's a Node.FOR_LOOP with constant indexes and step, then actually unwrap it
+            # Else if it's a Node.FOR_LOOP with constant indexes and step, then actually unwrap it. Unless
+            #   its invariants are to be hoisted and it calls functions, as these can only be resolved from its scope
             elif (nodeType == Node.Type.FOR_LOOP and
                     isValueElementConstant(comps['begin']) and
                     isValueElementConstant(comps['end']) and
-                    isValueElementConstant(comps['step'])):
+                    isValueElementConstant(comps['step']) and
+                    not (hoist and callsFunctions(node))):
                 unwrapForLoop(content, i, None) # NOTE: ATM having scope == None works fine because it does not need it. If we change something later on in the called functions then fix this
                 # Don't increment the `i` because it gets unwrapped in its place, and it may have other for loops
             
@@ -1604,27 +2041,109 @@ def constructProgram (ast: Node, args: list[Number]) -> Operation:
             else:
                 i += 1
     
-    assert ast.type == Node.Type.ROOT, f"Not Node.ROOT"
+    assert checkpoint is not None or ast.type == Node.Type.ROOT, f"Not Node.ROOT"
     
-    content = ast.components['content'] # For ease of reference
+    # The Inputs already traced back from the for loops' bounds
+    inputs_memo = {}
+    # Maps the id of a Node.FOR_LOOP to its hoistings. They keep the for loop so that its id can't be reused
+    hoistings = {}
+    # Maps the id of a Node.FUNC_DEF to whether it gets inlined. The AST is kept alive during the construction, so ids can't be reused
+    inlinables = {}
     
-    # Unwrap constant Node.FOR_LOOPs
-    unwrapConstantForLoops(content)
+    if hoist:
+        from hoister import callsFunctions
+    if budget is not None:
+        budget.start()
+    # The callbacks of each event, `None` if it has none so that it costs nothing
+    on_scope_enter = on_scope_exit = on_call_start = on_call_end = on_loop_unwrap = on_var_assign = on_operation_created = None
+    if hooks is not None:
+        from hooks import SCOPE_ENTER, SCOPE_EXIT, CALL_START, CALL_END, LOOP_UNWRAP, VAR_ASSIGN, OPERATION_CREATED
+        on_scope_enter = hooks.dispatcher(SCOPE_ENTER)
+        on_scope_exit = hooks.dispatcher(SCOPE_EXIT)
+        on_call_start = hooks.dispatcher(CALL_START)
+        on_call_end = hooks.dispatcher(CALL_END)
+        on_loop_unwrap = hooks.dispatcher(LOOP_UNWRAP)
+        on_var_assign = hooks.dispatcher(VAR_ASSIGN)
+        on_operation_created = hooks.dispatcher(OPERATION_CREATED)
+    main_node = ast if checkpoint is None else None
+    if on_scope_enter is not None:
+        on_scope_enter(main_node, checkpoint.starter if checkpoint is not None else ast.components['boc'], MAIN_FUNCTION_NAME, None)
     
-    # Evaluate the main scope
-    return_value = evaluateScope(content, (None, ast.components['boc']), args)
+    if checkpoint is None:
+        content = ast.components['content'] # For ease of reference
+        main_starter = ast.components['boc']
+        
+        # Unwrap constant Node.FOR_LOOPs
+        if phases is None:
+            unwrapConstantForLoops(content)
+        else:
+            with phases.nested('unwrap'):
+                unwrapConstantForLoops(content)
+        
+        # Evaluate the main scope
+        return_value = evaluateScope(content, (None, main_starter), args)
     
-    # If the resulting value is just a Number then make the simple operation of that_number + 0. So that's always an operation
-    if isinstance(return_value, Number):
+    else:
+        # Resume the main scope where it was left, its constant for loops were already unwrapped
+        main_starter = checkpoint.starter
+        scope = Scope(None, main_starter)
+        scope.vars = checkpoint.vars
+        scope.funcs = checkpoint.funcs
+        return_value = evaluateScope(checkpoint.content, scope, checkpoint.args)
+    
+    if on_scope_exit is not None:
+        on_scope_exit(main_node, main_starter, MAIN_FUNCTION_NAME, return_value)
+    
+    # If the resulting value is just a Number (or an Input) then make the simple operation of that_number + 0. So that's always an operation
+    if isinstance(return_value, Number) or type(return_value) is Input:
         return_value = Operation(OP_SET.ADD, return_value, 0)
+        if store is not None:
+            store.add(return_value)
     return return_value
 
 
+def formatCount (count: int) -> int | str:
+    '''Formats an operations count to be printed. Counts
+    that are too big are given as a power of 10'''
+    if count > 10**100:
+        import math
+        count = int(math.log10(count)) # Actually surprised log is implemented in a way that it can handle this big of numbers. It wouldn't be dividing on 10 and counting, would it?
+        count = f'around 10^{count}'
+    return count
+
+def budgetLimits (options: dict) -> dict:
+    '''The limits of the budget given with the options, as accepted by `Budget()`. The ones that are not given are `None`'''
+    return {
+        'max_objects': options['max_objects'],
+        'max_operations': options['max_operations'],
+        'max_iterations': options['max_iterations'],
+        'timeout': options['timeout'],
+        'max_rss': options['max_rss'] * 2**20 if options['max_rss'] is not None else None,
+    }
+
 def run (options: dict, args: list[Number]) -> None:
-    '''Runs a program from source code with the specified options.\n
+    '''Runs a program from source code with the specified options, or
+    analyses an exported one with `--load`. Each run has its own context.\n
     - `args`: The args that will be passed to the main function'''
+    with runningIn(Context()):
+        if options['load']:
+            return runExported(options, args)
+        if options['batch'] is not None:
+            return runBatched(options, args)
+        if options['serve'] is not None:
+            return runDaemon(options)
+        if options['client'] is not None:
+            from client import runClient
+            return runClient(options, args)
+        return runSource(options, args)
+
+def runSource (options: dict, args: list[Number]) -> None:
+    '''Runs a program from source code, or resumes one from
+    a checkpoint, with the specified options. Check `run()`'''
     
     import time
+    import sys
+    from startup import mark, report
     runner_start = time.time()
     
     FILE_PATH = options['file_path']
@@ -1632,60 +2151,265 @@ def run (options: dict, args: list[Number]) -> None:
     SHOW = options['show']
     DEBUG = options['debug']
     INTERPRET = options['interpret']
+    OPTIMIZE = options['optimize']
+    CSE = options['cse']
+    ANALYZE = options['analyze']
+    LET = options['let']
+    SYMBOLIC = options['symbolic']
+    VERIFY = options['verify']
+    HOIST = options['hoist']
+    INLINE_THRESHOLD = options['inline_threshold']
+    SHARE = options['share']
+    OUTPUT = options['output']
+    EXPORT = options['export']
+    SPILL = options['spill']
+    MEMORY_BUDGET = options['memory_budget']
+    CHECKPOINT = options['checkpoint']
+    CHECKPOINT_INTERVAL = options['checkpoint_interval']
+    CHECKPOINT_OPERATIONS = options['checkpoint_operations']
+    RESUME = options['resume']
+    STREAM = options['stream']
+    STARTUP_PROFILE = options['startup_profile']
+    NO_SNAPSHOT = options['no_snapshot']
+    PROFILE = options['profile']
+    PROFILE_STACKS = options['profile_stacks']
+    PYPROFILE = options['pyprofile']
+    PYPROFILE_INTERVAL = options['pyprofile_interval']
+    MEMSTATS = options['memstats']
+    MEMSTATS_JSON = options['memstats_json']
+    PROGRESS = options['progress']
+    METRICS_OUT = options['metrics_out']
+    METRICS_FORMAT = options['metrics_format']
     
+    if SYMBOLIC and (CHECKPOINT is not None or RESUME is not None):
+        raise Exception(f"❌ INVALID OPTIONS: Checkpoints can't be saved nor resumed with `--symbolic`")
+    if SYMBOLIC and STREAM:
+        raise Exception(f"❌ INVALID OPTIONS: Can't stream what's printed with `--symbolic`, it's not known yet")
     
-    if VERBOSE:
-        print('👨🏻‍🍳 Parsing..')
-    tokens = parseSourceFile(FILE_PATH)
-    if VERBOSE:
-        print('✅ Parsed')
-    if DEBUG:
-        print("Tokens:\n", tokens)
+    # What is told about the start of each phase of the run, to measure them on their own
+    phase_trackers = []
+    pyprofiler = None
+    if PYPROFILE is not None:
+        from pyprofile import PhaseProfiler
+        pyprofiler = PhaseProfiler(PYPROFILE, PYPROFILE_INTERVAL / 1000 if PYPROFILE_INTERVAL is not None else None)
+        phase_trackers.append(pyprofiler)
+    if MEMSTATS or MEMSTATS_JSON is not None:
+        from memstats import MemoryStats
+        memstats = MemoryStats()
+        phase_trackers.append(memstats)
+    if METRICS_OUT is not None:
+        from metrics import Metrics
+        metrics = Metrics()
+        phase_trackers.append(metrics)
+    def phase (name: str) -> None:
+        for tracker in phase_trackers:
+            tracker.phase(name)
     
-    if VERBOSE:
-        print('👨🏻‍🍳 Constructing the AST..')
-    ast = constructAST(tokens)
-    if VERBOSE:
-        print('✅ Constructed the AST')
-    if DEBUG:
-        print("Node.ROOT['content']:")
-        for node in ast.components['content']:
-            print("\t-", node)
+    checkpoint = None
+    ast = None
+    if RESUME is not None:
+        from checkpoint import loadCheckpoint, restore
+        phase('resume')
+        if VERBOSE:
+            print(f"👨🏻‍🍳 Loading the checkpoint `{RESUME}`..")
+        checkpoint = loadCheckpoint(RESUME)
+        restore(checkpoint)
+        # The checkpoint was constructed with these, they can't change midway
+        HOIST = checkpoint.options['hoist']
+        INLINE_THRESHOLD = checkpoint.options['inline_threshold']
+        args = checkpoint.args
+        if VERBOSE:
+            print(f"✅ Loaded the checkpoint, {len(checkpoint.content)} instruction{['', 's'][0 if len(checkpoint.content) == 1 else 1]} of the main scope are left")
+    
+    else:
+        if VERBOSE:
+            print('👨🏻‍🍳 Parsing..')
+        phase('parse')
+        parse_start = time.time()
+        included = set() # The files of the program, to hash them for the metrics
+        if NO_SNAPSHOT:
+            tokens = parseSourceFile(FILE_PATH, includes=included)
+            mark('parse')
+        else:
+            from snapshot import loadSnapshot, saveSnapshot
+            cache = loadSnapshot()
+            snapshot = dict(cache)
+            mark('load the snapshot')
+            tokens = parseSourceFile(FILE_PATH, cache=cache, includes=included)
+            mark('parse')
+            if any(snapshot.get(key) is not entry for key, entry in cache.items()):
+                saveSnapshot(cache)
+                mark('save the snapshot')
+        if VERBOSE:
+            parse_duration = time.time() - parse_start
+            print(f"✅ Parsed {len(tokens)} token{['', 's'][0 if len(tokens) == 1 else 1]} in {parse_duration} seconds ({len(tokens) / max(parse_duration, 1e-9):,.0f} tokens/s)")
+        if DEBUG:
+            print("Tokens:\n", tokens)
+        
+        if VERBOSE:
+            print('👨🏻‍🍳 Constructing the AST..')
+        phase('ast')
+        ast_start = time.time()
+        ast = constructAST(tokens)
+        mark('construct the AST')
+        if METRICS_OUT is not None: # Before the construction unwraps the for loops of the AST in place
+            from metrics import countNodes
+            nodes_count = countNodes(ast)
+        if VERBOSE:
+            ast_duration = time.time() - ast_start
+            print(f"✅ Constructed the AST in {ast_duration} seconds ({len(tokens) / max(ast_duration, 1e-9):,.0f} tokens/s)")
+        if DEBUG:
+            print("Node.ROOT['content']:")
+            for node in ast.components['content']:
+                print("\t-", node)
+    
+    phase('construct')
+    checkpointer = None
+    if CHECKPOINT is not None or RESUME is not None:
+        from checkpoint import Checkpointer
+        if CHECKPOINT_INTERVAL is None and CHECKPOINT_OPERATIONS is None:
+            CHECKPOINT_INTERVAL = 300
+        checkpointer = Checkpointer(CHECKPOINT if CHECKPOINT is not None else RESUME, CHECKPOINT_INTERVAL, CHECKPOINT_OPERATIONS, {'hoist': HOIST, 'inline_threshold': INLINE_THRESHOLD})
     
     if VERBOSE:
         print('👨🏻‍🍳 Constructing and computing the operation..')
+    store = None
+    if SPILL is not None:
+        from spill import SpillStore
+        store = SpillStore(SPILL, MEMORY_BUDGET * 2**20)
+    hooks = profiler = None
+    if PROFILE or PROFILE_STACKS is not None:
+        from profiler import Profiler
+        from hooks import Hooks
+        hooks = Hooks()
+        profiler = Profiler()
+        profiler.attach(hooks)
+    budget = None
+    limits = budgetLimits(options)
+    if any(limit is not None for limit in limits.values()):
+        from budget import Budget
+        budget = Budget(**limits)
+    progress = reporter = None
+    if PROGRESS is not None:
+        from progress import Progress, ProgressReporter
+        progress = Progress()
+        reporter = ProgressReporter(progress, currentContext(), PROGRESS, sys.stderr)
+        reporter.start()
     program_start = time.time()
-    program = constructProgram(ast, args)
+    try:
+        if SYMBOLIC:
+            from template import buildTemplate
+            template = buildTemplate(ast, args, HOIST, INLINE_THRESHOLD, store, hooks, progress, budget, pyprofiler)
+            program = template.operation
+        else:
+            streamed = StreamedOutput(sys.stdout) if STREAM else None
+            if checkpointer is not None:
+                checkpointer.start()
+            try:
+                program = constructProgram(ast, args, hoist=HOIST, inline_threshold=INLINE_THRESHOLD, store=store, checkpointer=checkpointer, checkpoint=checkpoint, output=streamed, hooks=hooks, progress=progress, budget=budget, phases=pyprofiler)
+            finally:
+                if checkpointer is not None:
+                    checkpointer.stop()
+    finally:
+        if reporter is not None:
+            reporter.stop()
     program_duration = time.time() - program_start
+    mark('construct and compute the operation')
+    phase('transform')
     if VERBOSE:
         print('✅ Constructed and computed the operation')
-    if SHOW:
-        print("NOTE: Printing the operation could be, literally, physically impossible if the program is too big. Consider interrupting (Ctrl + c) this process and re-running it without the `-s` option. If you finished reading this and it still didn't print then it's probably not going to..")
-        print('Operation:')
-        str_program = str(program)[1:-1]
-        print(str_program)
+        if SYMBOLIC and len(template.inputs) != 0:
+            symbolic = [f"`{input}`" for i, input in enumerate(template.inputs) if i not in template.control]
+            specialized = [f"`{input}`" for i, input in enumerate(template.inputs) if i in template.control]
+            if len(symbolic) != 0:
+                print(f"🧩 Kept {', '.join(symbolic)} as symbolic input{['', 's'][0 if len(symbolic) == 1 else 1]}")
+            if len(specialized) != 0:
+                print(f"📌 Specialized {', '.join(specialized)} because {['it controls', 'they control'][0 if len(specialized) == 1 else 1]} the bounds of for loops")
+    operations_objects_count = currentContext().objects_count
+    if PROFILE:
+        sys.stdout.flush()
+        profiler.report(sys.stderr)
+    if PROFILE_STACKS is not None:
+        with open(PROFILE_STACKS, 'w') as file:
+            profiler.writeStacks(file)
+        if VERBOSE:
+            print(f"🔥 Wrote the profiled stacks to `{PROFILE_STACKS}`")
+    if checkpointer is not None and VERBOSE:
+        print(f"💾 Saved {checkpointer.saved_count} checkpoint{['', 's'][0 if checkpointer.saved_count == 1 else 1]} to `{checkpointer.file_path}`")
+    if store is not None and VERBOSE:
+        print(f"💾 Spilled {store.spilled_count} Operation{['', 's'][0 if store.spilled_count == 1 else 1]} to disk, and kept the last {len(store.hot)} in memory")
+    if OPTIMIZE:
+        from optimizer import optimize
+        if VERBOSE:
+            print('👨🏻‍🍳 Optimizing the operation..')
+        original_count = program.operations_count
+        program = optimize(program)
+        if VERBOSE:
+            print(f"✅ Optimized the operation from {formatCount(original_count)} down to {formatCount(program.operations_count)} mathematical operations")
+    if VERIFY:
+        from evaluator import Plan
+        if VERBOSE:
+            print('👨🏻‍🍳 Verifying the operation by evaluating it again..')
+        verify_start = time.time()
+        verified_result = Plan(program).evaluateLevels({})
+        if type(verified_result) is not type(program.result) or verified_result != program.result:
+            raise Exception(f"❌ VERIFICATION FAILED: evaluating the operation again gave `{verified_result}` instead of `{program.result}`")
+        if VERBOSE:
+            print(f"✅ Verified the operation in {time.time() - verify_start} seconds")
+    if CSE:
+        from analysis import eliminateCommonSubexpressions
+        if VERBOSE:
+            print('👨🏻‍🍳 Eliminating the common subexpressions..')
+        program = eliminateCommonSubexpressions(program)
+        if VERBOSE:
+            print('✅ Eliminated the common subexpressions')
+    if EXPORT is not None:
+        from binary import exportOperations
+        if VERBOSE:
+            print(f"👨🏻‍🍳 Exporting the operation to `{EXPORT}`..")
+        # The names of the Inputs, in the order of the main function's parameters, for `--load` to give them the args by position
+        # And the values of the ones that were specialized, for `--load` to only accept these
+        exportOperations([program], EXPORT, [input.name for input in template.inputs] if SYMBOLIC else (), {template.inputs[i].name: value for i, value in template.control.items()} if SYMBOLIC else None)
+        if VERBOSE:
+            print('✅ Exported the operation')
+    if ANALYZE:
+        from analysis import analyze
+        analysis = analyze(program)
+        print(f"🔬 The operation has {analysis.unique_count} unique operation{['', 's'][0 if analysis.unique_count == 1 else 1]}, a depth of {analysis.depth} and a sharing factor of {analysis.sharing_factor:.4g}")
+    phase('show')
+    if LET or SHOW or SHARE is not None:
+        stream = sys.stdout
+        if OUTPUT is not None:
+            stream = open(OUTPUT, 'w')
+        else:
+            if not LET and SHARE is None:
+                print("NOTE: The expanded operation could be, literally, physically impossible to print if the program is too big, even if it's written bit by bit. Consider interrupting (Ctrl + c) this process and re-running it with the `--share` option instead. If you finished reading this and it still didn't print then it's probably not going to..")
+            print('Operation:')
+        try:
+            if LET:
+                from analysis import letBindings
+                for binding in letBindings(program):
+                    stream.write(binding +'\n')
+            elif SHARE is not None:
+                from serializer import writeBindings
+                writeBindings(program, stream, SHARE)
+            else:
+                from serializer import writeExpanded
+                writeExpanded(program, stream)
+        finally:
+            if OUTPUT is not None:
+                stream.close()
+        if OUTPUT is not None and VERBOSE:
+            print(f"📝 Wrote the operation to `{OUTPUT}`")
     
-    count = program.operations_count
-    if count > 10**100:
-        import math
-        count = int(math.log10(count)) # Actually surprised log is implemented in a way that it can handle this big of numbers. It wouldn't be dividing on 10 and counting, would it?
-        count = f'around 10^{count}'
+    phase('interpret')
+    count = formatCount(program.operations_count)
     
     original_result = program.result
     
     result = original_result
     if INTERPRET:
-        if result in [0, 1]:
-            result = bool(result)
-        elif result == 69:
-            result = 'Nice'
-        elif result >= 0 and int(result) == result:
-            chars = ''
-            while result > 0:
-                num = result & 0b1111_1111
-                result = result >> 8
-                chars += chr(num)
-            result = chars[:: -1]
+        result = interpretResult(result)
     
     
     if VERBOSE:
@@ -1694,8 +2418,221 @@ def run (options: dict, args: list[Number]) -> None:
             print(f"🤖 The raw result is {original_result}")
         else:
             print(f"🧾 The result is {result}")
-        print(f"🏃🏻 It took {count} mathematical operation{['', 's'][0 if count == 1 else 1]} to compute the result (but only {Operation.count} Operation object{['', 's'][0 if Operation.count == 1 else 1]})")
+        print(f"🏃🏻 It took {count} mathematical operation{['', 's'][0 if count == 1 else 1]} to compute the result (but only {operations_objects_count} Operation object{['', 's'][0 if operations_objects_count == 1 else 1]})")
         print(f"⏱️  Constructing and evaluating the Operation took {program_duration} seconds")
         print(f"⌛️ This whole process took {time.time() - runner_start} seconds")
+    elif STREAM:
+        # Only print what wasn't already streamed, i.e. what was printed outside of the main scope
+        text = decodeString(original_result)
+        if text is not None and text.startswith(streamed.text):
+            print(text[len(streamed.text) :], end='')
+        else:
+            print(result, end='')
     else:
         print(result, end='')
+    mark('print the result')
+    
+    if store is not None:
+        store.close()
+    if PYPROFILE is not None:
+        summary = pyprofiler.finish()
+        sys.stdout.flush()
+        print(summary, end='', file=sys.stderr)
+    if MEMSTATS or MEMSTATS_JSON is not None:
+        memstats.finish()
+        if MEMSTATS:
+            sys.stdout.flush()
+            memstats.report(sys.stderr)
+        if MEMSTATS_JSON is not None:
+            with open(MEMSTATS_JSON, 'w') as file:
+                memstats.writeJSON(file)
+    if METRICS_OUT is not None:
+        from metrics import programHash
+        from memstats import peakRSS
+        metrics.finish()
+        context = currentContext()
+        record = metrics.record
+        record['file'] = FILE_PATH if RESUME is None else RESUME
+        record['program_hash'] = programHash(included) if RESUME is None else None # The source of a checkpoint is not known
+        record['args'] = args
+        record['counts'] = {
+            'tokens': len(tokens) if RESUME is None else None,
+            'nodes': nodes_count if RESUME is None else None,
+            'scopes': context.scopes_count,
+            'objects': operations_objects_count,
+        }
+        metrics.setOperationsCount(program.operations_count)
+        record['peak_rss'] = peakRSS()
+        if RESUME is None and not NO_SNAPSHOT:
+            metrics.setCache('snapshot', context.cache_hits, context.cache_misses)
+        with open(METRICS_OUT, 'w') as file:
+            if METRICS_FORMAT == 'prometheus':
+                metrics.writePrometheus(file)
+            else:
+                metrics.writeJSON(file)
+    if STARTUP_PROFILE:
+        sys.stdout.flush()
+        report(sys.stderr)
+
+# The options that `--batch` takes into account. Check `runBatched()`
+BATCH_OPTIONS = {'file_path', 'verbose', 'batch', 'workers', 'hoist', 'inline_threshold', 'interpret', 'no_snapshot', 'max_objects', 'max_operations', 'max_iterations', 'timeout', 'max_rss'}
+
+def runBatched (options: dict, args: list[Number]) -> None:
+    '''Runs a program for each argument set of the `--batch` file, parsing
+    it only once, and prints the results as JSON lines. Check `batch.py`'''
+    import sys
+    import time
+    from engine import compile
+    from batch import readArgsSets, runBatch
+    
+    FILE_PATH = options['file_path']
+    VERBOSE = options['verbose']
+    BATCH = options['batch']
+    WORKERS = options['workers']
+    
+    if len(args) != 0:
+        raise Exception(f"❌ INVALID OPTIONS: The arguments are read from `{BATCH}` with `--batch`, yet {len(args)} argument{['s were', ' was'][int(len(args) == 1)]} given.")
+    # Every option that isn't forwarded to the runs would be silently ignored, so they're rejected. The
+    #   defaults of `memory_budget` and `metrics_format` only matter along `--spill` and `--metrics-out`,
+    #   and the libraries are always parsed from their source, as `--no-snapshot` asks
+    unsupported = [option for option, value in options.items() if option not in BATCH_OPTIONS and option not in ('memory_budget', 'metrics_format') and value is not None and value is not False]
+    if len(unsupported) != 0:
+        flags = [f"`--{option.replace('_', '-')}`" for option in unsupported]
+        raise Exception(f"❌ INVALID OPTIONS: {', '.join(flags)} can't be used with `--batch`")
+    
+    start = time.time()
+    program = compile(FILE_PATH)
+    if VERBOSE: # On the standard error, the standard output is for the results
+        print(f"✅ Parsed `{FILE_PATH}` in {time.time() - start} seconds", file=sys.stderr)
+    
+    file = sys.stdin if BATCH == '-' else open(BATCH, newline='')
+    try:
+        count = runBatch(program, readArgsSets(file), sys.stdout, {
+            'workers': WORKERS,
+            'budget': budgetLimits(options), # Each argument set gets its own, the timeout included
+            'hoist': options['hoist'],
+            'inline_threshold': options['inline_threshold'],
+            'interpret': options['interpret'],
+            })
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    if VERBOSE:
+        print(f"⌛️ Ran {count} argument set{['', 's'][0 if count == 1 else 1]} in {time.time() - start} seconds", file=sys.stderr)
+
+def runTestFiles (options: dict) -> int:
+    '''Runs the tests of the `*_test.mlg` files found in the `paths`, and
+    prints a line for each one of them, followed by a summary. Returns
+    the exit status, 1 if any of them didn't pass. Check `testing.py`'''
+    import sys
+    import time
+    from testing import discoverFiles, collectTests, runTests, report, PASS, FAIL, TIMEOUT, ERROR
+
+    PATHS = options['paths']
+    VERBOSE = options['verbose']
+    NO_SNAPSHOT = options['no_snapshot']
+
+    start = time.time()
+    files = [file for path in PATHS for file in discoverFiles(path)]
+    # The test files are parsed with the same cache, so the libraries they include are only parsed once
+    if NO_SNAPSHOT:
+        cache = {}
+    else:
+        from snapshot import loadSnapshot, saveSnapshot
+        cache = loadSnapshot()
+        snapshot = dict(cache)
+    tests = [test for file in files for test in collectTests(file, cache)]
+    if not NO_SNAPSHOT and any(snapshot.get(key) is not entry for key, entry in cache.items()):
+        saveSnapshot(cache)
+    if VERBOSE:
+        print(f"✅ Collected {len(tests)} test{['', 's'][0 if len(tests) == 1 else 1]} from {len(files)} file{['', 's'][0 if len(files) == 1 else 1]} in {time.time() - start} seconds")
+
+    if len(tests) == 0:
+        # Most likely the wrong directory, which must not look like the tests passed
+        print(f"💔 No `*_test.mlg` files were found in {', '.join(f'`{path}`' for path in PATHS)}, so no tests were run")
+        return 1
+
+    outcomes = {PASS: 0, FAIL: 0, TIMEOUT: 0, ERROR: 0}
+    for record in runTests(tests, {
+        'workers': options['workers'],
+        'timeout': options['timeout'],
+        'hoist': options['hoist'],
+        'inline_threshold': options['inline_threshold'],
+        }):
+        outcomes[record['outcome']] += 1
+        report(record, sys.stdout)
+        sys.stdout.flush()
+
+    words = {PASS: 'passed', FAIL: 'failed', TIMEOUT: 'timed out', ERROR: 'errored'}
+    summary = ', '.join(f"{count} {words[outcome]}" for outcome, count in outcomes.items() if count != 0 or outcome == PASS)
+    print(f"\n{'🎉' if outcomes[PASS] == len(tests) else '💔'} {summary} in {time.time() - start:.3f} seconds")
+    return 0 if outcomes[PASS] == len(tests) else 1
+
+def runDaemon (options: dict) -> None:
+    '''Runs the evaluation daemon on the `--serve` socket until
+    it's interrupted (Ctrl + c). Check `daemon.py`'''
+    import asyncio
+    from daemon import serve
+    
+    SERVE = options['serve']
+    WORKERS = options['workers']
+    VERBOSE = options['verbose']
+    
+    def ready () -> None:
+        if VERBOSE:
+            print(f"👂 Listening on `{SERVE}`")
+    
+    try:
+        asyncio.run(serve(SERVE, WORKERS, ready))
+    except KeyboardInterrupt:
+        if VERBOSE:
+            print(f"👋 Stopped listening on `{SERVE}`")
+
+def runExported (options: dict, args: list[Number]) -> None:
+    '''Analyses an operation that was exported with `--export`, straight
+    from its file, and prints its result. With the verbose option, it
+    also re-evaluates it to check the result, and compares it to
+    another exported operation if `diff` is given.\n
+    - `args`: the new values of the Inputs of the operation, in the order of the main
+    function's parameters. The parameters that the operation doesn't depend on are
+    ignored, and those that control its for loops must have the values it was specialized for. If it was exported without them, in the order the Inputs appear in it'''
+    from binary import loadOperations, difference
+    import time
+    
+    FILE_PATH = options['file_path']
+    VERBOSE = options['verbose']
+    DIFF = options['diff']
+    
+    start = time.time()
+    with loadOperations(FILE_PATH) as operations:
+        if VERBOSE:
+            print(f"✅ Mapped `{FILE_PATH}`, it has {operations.nodes_count} node{['', 's'][0 if operations.nodes_count == 1 else 1]}")
+        
+        inputs = list(operations.inputs())
+        parameters = operations.parameters
+        if len(parameters) != 0:
+            if len(args) != len(parameters):
+                raise Exception(f"❌ INVALID ARGUMENTS: This operation's main function has {len(parameters)} parameter{['', 's'][0 if len(parameters) == 1 else 1]} ({', '.join(f'`{parameter}`' for parameter in parameters)}), yet {len(args)} argument{['s were', ' was'][int(len(args) == 1)]} given.")
+            values = dict(zip(parameters, args)) # Those of the control parameters are checked against their specialized values
+        else:
+            if len(args) != len(inputs):
+                raise Exception(f"❌ INVALID ARGUMENTS: This operation has {len(inputs)} input{['', 's'][0 if len(inputs) == 1 else 1]} ({', '.join(f'`{input}`' for input in inputs)}), yet {len(args)} argument{['s were', ' was'][int(len(args) == 1)]} given.")
+            values = dict(zip(inputs, args))
+        
+        result = operations.results[0]
+        if len(args) != 0 or VERBOSE:
+            evaluated = operations.evaluate(values)[0]
+            if len(args) == 0 and (type(evaluated) is not type(result) or evaluated != result):
+                raise Exception(f"❌ VERIFICATION FAILED: evaluating the operation again gave `{evaluated}` instead of `{result}`")
+            result = evaluated
+        
+        if VERBOSE:
+            print(f"🧾 The result is {result}")
+            count = formatCount(operations.operationsCounts()[0])
+            print(f"🏃🏻 It takes {count} mathematical operation{['', 's'][0 if count == 1 else 1]} to compute the result")
+            if DIFF is not None:
+                with loadOperations(DIFF) as other:
+                    print(f"🔍 Compared to `{DIFF}`: {difference(operations, other)}")
+            print(f"⌛️ This whole process took {time.time() - start} seconds")
+        else:
+            print(result, end='')
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+'''The serializer. Writes an Operation out as text, bit by bit to a
+stream, instead of building it as one string like `str()` does'''
+
+from core import Operation, Input, uniqueOperations
+from analysis import formatNumber
+from numbers import Number
+from typing import Callable, TextIO
+
+# How many characters are gathered before writing them to the stream
+BUFFER_SIZE = 1 << 16
+
+class BufferedWriter ():
+    '''Gathers the written pieces and writes them to the
+    stream once there are enough of them'''
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.pieces = []
+        self.size = 0
+
+    def write (self, piece: str) -> None:
+        self.pieces.append(piece)
+        self.size += len(piece)
+        if self.size >= BUFFER_SIZE:
+            self.flush()
+
+    def flush (self) -> None:
+        self.stream.write(''.join(self.pieces))
+        self.pieces = []
+        self.size = 0
+
+def writeExpression (operation: Operation, writer: BufferedWriter, names: dict[int, str], formatter: Callable[[Number], str], parenthesized: bool) -> None:
+    '''Writes the operation fully expanded, except for the
+    Operations in `names` (by id), which are written as their names.\n
+    The traversal is iterative, so it only takes as much memory as the
+    operation is deep, no matter how big the expanded text is.\n
+    `parenthesized`: whether to put the operation itself between parenthesis'''
+    stack = [operation]
+    first = True
+    while len(stack) != 0:
+        element = stack.pop()
+        if type(element) is str:
+            writer.write(element)
+        elif isinstance(element, Number):
+            writer.write(formatter(element))
+        elif type(element) is Input:
+            writer.write(element.name)
+        elif not first and id(element) in names:
+            writer.write(names[id(element)])
+        elif first and not parenthesized:
+            stack.extend((element.b, f" {element.op} ", element.a))
+        else:
+            stack.extend((')', element.b, f" {element.op} ", element.a, '('))
+        first = False
+
+def writeExpanded (operation: Operation, stream: TextIO) -> None:
+    '''Writes the operation fully expanded to the stream, the
+    same way `str(operation)[1:-1]` would, but without
+    ever holding the whole text in memory'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+
+    writer = BufferedWriter(stream)
+    writeExpression(operation, writer, {}, str, False)
+    writer.write('\n')
+    writer.flush()
+
+def writeBindings (operation: Operation, stream: TextIO, inline_threshold: int=0) -> None:
+    '''Writes the operation to the stream with each shared Operation written
+    once, as a numbered binding that the others reference by name.
+    For example: `t2 = (t1 * 3)`, and then `ret (t2 + t2)`.\n
+    An Operation is shared if it is an argument of more than one
+    Operation, or twice of the same one.\n
+    `inline_threshold`: the shared Operations that are at most this many
+    mathematical operations when written out (not counting the
+    ones that have their own binding) are written in place instead.\n
+    The output is valid Malang code, same as `letBindings()`.'''
+    assert isinstance(operation, Operation), f"Not an Operation: {operation}"
+    assert type(inline_threshold) is int and inline_threshold >= 0, f"Not a positive int: {inline_threshold}"
+
+    nodes = uniqueOperations(operation)
+
+    references = {} # Maps the id of an Operation to how many times it is an argument
+    for node in nodes:
+        for argument in (node.a, node.b):
+            if isinstance(argument, Operation):
+                references[id(argument)] = references.get(id(argument), 0) +1
+
+    sizes = {} # Maps the id of an Operation to how many mathematical operations it's written as
+    bound = [] # The Operations that get their own binding, arguments before
+    for node in nodes:
+        if type(node) is Input:
+            sizes[id(node)] = 0
+            continue
+        size = 1
+        for argument in (node.a, node.b):
+            if isinstance(argument, Operation):
+                size += sizes[id(argument)]
+        if node is not operation and references[id(node)] > 1 and size > inline_threshold:
+            bound.append(node)
+            size = 0 # Written as its name
+        sizes[id(node)] = size
+
+    writer = BufferedWriter(stream)
+    names = {}
+    for i, node in enumerate(bound):
+        name = f"t{i +1}"
+        writer.write(f"{name} = ")
+        writeExpression(node, writer, names, formatNumber, True)
+        writer.write('\n')
+        names[id(node)] = name
+    writer.write('ret ')
+    writeExpression(operation, writer, names, formatNumber, True)
+    writer.write('\n')
+    writer.flush()
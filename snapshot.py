@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+'''The snapshot of the standard libraries' front end. The tokens of the
+libraries, as cached by `parseSourceFile()`, are saved next to
+them, so that they're loaded instead of being parsed again by every run.
+Its entries are checked against the files like any cached ones, so a stale
+snapshot is only slower, never wrong'''
+
+import pickle
+import sys
+import os
+
+LIBS_DIR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'libs')
+SNAPSHOT_PATH = os.path.join(LIBS_DIR_PATH, '__pycache__', 'snapshot.pickle')
+VERSION = 1
+
+def isLibrary (path: str) -> bool:
+    return path.startswith(LIBS_DIR_PATH +os.sep)
+
+def loadSnapshot (path: str=SNAPSHOT_PATH) -> dict:
+    '''Loads the snapshot as a cache for `parseSourceFile()`, or
+    returns an empty one if there is none, or it can't be used'''
+    try:
+        with open(path, 'rb') as file:
+            version, cache = pickle.load(file)
+    except Exception:
+        return {}
+    if version != (VERSION, sys.version_info[:2]):
+        return {}
+    return cache
+
+def saveSnapshot (cache: dict, path: str=SNAPSHOT_PATH) -> None:
+    '''Saves the entries of the cache that only concern the
+    standard libraries as the snapshot. Silently gives up if it
+    can't, the libraries directory might not be writable'''
+    entries = {}
+    for key, entry in cache.items():
+        abs_path, _, before = key
+        if isLibrary(abs_path) and all(isLibrary(other) for other in before) and all(isLibrary(added) for added in entry[3]):
+            entries[key] = entry
+    temp_path = f"{path}.{os.getpid()}"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            pickle.dump(((VERSION, sys.version_info[:2]), entries), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path) # Other runs might be loading it
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+'''The spill store. Keeps the Operations of a program that is being
+constructed within a memory budget, by writing the oldest ones to
+disk and letting go of them'''
+
+from core import OP_SET, Operation, Input
+from binary import CONSTANT, encodeConstant, decodeConstant
+from numbers import Number
+from collections import deque
+import weakref
+import tempfile
+import struct
+import mmap
+
+# The estimated size in memory of an Operation, its result and operations count included
+OPERATION_SIZE = 256
+
+OPS = list(OP_SET)
+OP_CODES = {op: i for i, op in enumerate(OPS)}
+INPUT = 0xFF # The op code of the Inputs
+
+# op code, a reference, b reference, and the offsets of the result and the operations count
+RECORD = struct.Struct('<B7xqqQQ')
+
+# The slots of the Operation, to get to them from a SpilledOperation
+A_SLOT = Operation.__dict__['a']
+B_SLOT = Operation.__dict__['b']
+
+class SpilledOperation (Operation):
+    '''An Operation that was written to disk. It keeps its `op`, `result`
+    and `operations_count`, but not its arguments, which are read back
+    from the disk when they are accessed. That way the Operations that
+    it references can be let go of.\n
+    Its `a` slot holds its index in the store, and its `b` slot the store itself.'''
+
+    __slots__ = ()
+
+    @property
+    def a (self) -> Number | Operation:
+        return B_SLOT.__get__(self).argument(A_SLOT.__get__(self), 0)
+
+    @property
+    def b (self) -> Number | Operation:
+        return B_SLOT.__get__(self).argument(A_SLOT.__get__(self), 1)
+
+class SpillStore ():
+    '''Keeps the most recently created Operations in memory, and spills the
+    older ones to disk, in the order they were created, once there are more than
+    the memory budget allows. A spilled Operation becomes a SpilledOperation, in place, so
+    everything that references it still does, and it resolves its arguments
+    transparently. The Operations that were only referenced by spilled ones
+    are then freed, and read back from the disk if they are ever needed again.\n
+    The Operations go to a file of fixed size records, one per Operation, and the numbers
+    (arguments, results and operations counts) to another file, both only ever
+    appended to and read back trough `mmap`.'''
+
+    def __init__(self, directory: str, memory_budget: int) -> None:
+        '''`directory`: where to create the files, they are deleted when closing\n
+        `memory_budget`: roughly how many bytes the Operations kept in memory can take'''
+        assert memory_budget > 0, f"Not a positive memory budget: {memory_budget}"
+
+        self.hot_limit = max(1, memory_budget // OPERATION_SIZE)
+        self.hot = deque()
+        self.spilled_count = 0
+        self.inputs = [] # The Inputs are small and few, they are kept as they are
+        self.__input_references = {} # Maps the id of an Input to its reference
+        self.__handles = weakref.WeakValueDictionary() # Maps an index to its SpilledOperation, if it's still in memory
+
+        self.__records = tempfile.TemporaryFile(prefix='malang-', suffix='.operations', dir=directory)
+        self.__numbers = tempfile.TemporaryFile(prefix='malang-', suffix='.numbers', dir=directory)
+        self.__numbers_size = 0
+        self.__maps = {} # Maps a file to its current mmap
+
+    def add (self, operation: Operation) -> None:
+        '''Adds a newly created Operation to the store, and spills the
+        oldest ones if there are more than the budget allows'''
+        hot = self.hot
+        hot.append(operation)
+        while len(hot) > self.hot_limit:
+            self.spill(hot.popleft())
+
+    def spill (self, operation: Operation) -> None:
+        '''Writes the Operation to disk, and turns it into a SpilledOperation'''
+        if type(operation) is not Operation:
+            return # Already spilled, or an Input
+
+        index = self.spilled_count
+        record = RECORD.pack(
+            OP_CODES[operation.op],
+            self.referenceOf(operation.a),
+            self.referenceOf(operation.b),
+            self.writeNumber(operation.result),
+            self.writeNumber(operation.operations_count))
+        self.__records.write(record)
+        self.spilled_count += 1
+
+        # Let go of the arguments
+        operation.__class__ = SpilledOperation
+        A_SLOT.__set__(operation, index)
+        B_SLOT.__set__(operation, self)
+        self.__handles[index] = operation
+
+    def referenceOf (self, argument: Number | Operation) -> int:
+        '''The reference of an argument: the index of a spilled Operation, or
+        `-(offset +1)` for a number at that offset, or for an Input (its index in a record)'''
+        if type(argument) is SpilledOperation:
+            assert B_SLOT.__get__(argument) is self, f"Spilled in another store: {argument}"
+            return A_SLOT.__get__(argument)
+        if type(argument) is Input:
+            reference = self.__input_references.get(id(argument))
+            if reference is None:
+                self.inputs.append(argument)
+                reference = self.spilled_count
+                self.__records.write(RECORD.pack(INPUT, len(self.inputs) -1, 0, 0, 0))
+                self.spilled_count += 1
+                self.__input_references[id(argument)] = reference
+            return reference
+        if isinstance(argument, Operation):
+            # Created before the store or outside of it, it's spilled first
+            self.spill(argument)
+            return A_SLOT.__get__(argument)
+        return -(self.writeNumber(argument) +1)
+
+    def writeNumber (self, number: Number) -> int:
+        '''Writes a number and returns its offset'''
+        offset = self.__numbers_size
+        record = encodeConstant(number)
+        self.__numbers.write(record)
+        self.__numbers_size += len(record)
+        return offset
+
+    def mapOf (self, file, size: int) -> mmap.mmap:
+        '''Returns a map of the file that covers at least `size` bytes'''
+        file_map = self.__maps.get(file)
+        if file_map is None or len(file_map) < size:
+            file.flush()
+            if file_map is not None:
+                file_map.close()
+            file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__maps[file] = file_map
+        return file_map
+
+    def readNumber (self, offset: int) -> Number:
+        numbers = self.mapOf(self.__numbers, offset + CONSTANT.size)
+        length = CONSTANT.unpack_from(numbers, offset)[1]
+        numbers = self.mapOf(self.__numbers, offset + CONSTANT.size + length)
+        return decodeConstant(numbers, offset)
+
+    def record (self, index: int) -> tuple[int, int, int, int, int]:
+        records = self.mapOf(self.__records, (index +1) * RECORD.size)
+        return RECORD.unpack_from(records, index * RECORD.size)
+
+    def argument (self, index: int, which: int) -> Number | Operation:
+        '''Reads back the argument (0 for `a` and 1 for `b`) of the spilled Operation'''
+        reference = self.record(index)[1 + which]
+        if reference < 0:
+            return self.readNumber(-reference -1)
+        return self.operation(reference)
+
+    def operation (self, index: int) -> Operation:
+        '''Returns the spilled Operation, or Input, of this index. The same
+        object as long as it's in memory, otherwise it's read back from disk'''
+        operation = self.__handles.get(index)
+        if operation is not None:
+            return operation
+        op, a, _, result, operations_count = self.record(index)
+        if op == INPUT:
+            return self.inputs[a]
+        operation = object.__new__(SpilledOperation)
+        operation.op = OPS[op]
+        operation.result = self.readNumber(result)
+        operation.operations_count = self.readNumber(operations_count)
+        A_SLOT.__set__(operation, index)
+        B_SLOT.__set__(operation, self)
+        self.__handles[index] = operation
+        return operation
+
+    def close (self) -> None:
+        '''Deletes the files. The spilled Operations can't be used after it'''
+        for file_map in self.__maps.values():
+            file_map.close()
+        self.__maps.clear()
+        self.__records.close()
+        self.__numbers.close()
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+'''Startup profiling. Times the phases of a run, from the start of
+the process to the evaluation of the program, to be reported
+with `--startup-profile`. Import it first, its import is the start'''
+
+import time
+START = time.perf_counter() # Before the other imports, they're part of the startup too
+
+from typing import TextIO
+import os
+
+# The phases so far, each with the time it ended at
+_marks = []
+
+def mark (phase: str) -> None:
+    '''Marks the end of a phase, that started at the end of the previous one'''
+    _marks.append((phase, time.perf_counter()))
+
+def interpreterDuration () -> float | None:
+    '''How many seconds passed between the start of the process and `START`, that's
+    the interpreter starting. Or `None` if it can't be known on this platform'''
+    try:
+        with open('/proc/self/stat') as file:
+            fields = file.read().rsplit(')', 1)[1].split() # The name of the process can have spaces
+        with open('/proc/uptime') as file:
+            uptime = float(file.read().split()[0])
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK') # Since the boot
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - started - (time.perf_counter() - START))
+
+def report (file: TextIO) -> None:
+    '''Writes the phases so far, in the style of `python -X importtime`'''
+    print("startup:  self [ms] | cumulative | phase", file=file)
+    cumulative = 0.0
+    interpreter = interpreterDuration()
+    if interpreter is not None:
+        cumulative = interpreter
+        print(f"startup: {interpreter *1000:9.2f} | {cumulative *1000:10.2f} | start the interpreter (roughly)", file=file)
+    previous = START
+    for phase, end in _marks:
+        cumulative += end - previous
+        print(f"startup: {(end - previous) *1000:9.2f} | {cumulative *1000:10.2f} | {phase}", file=file)
+        previous = end
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+'''Program templates. A program constructed once with the arguments of its
+main function as symbolic Inputs, that can then be re-evaluated for
+new arguments without going trough the runner again'''
+
+from core import Operation, Input
+from runner import Node, constructProgram, INLINE_THRESHOLD
+from evaluator import Plan
+from numbers import Number
+from typing import Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from spill import SpillStore
+    from hooks import Hooks
+    from progress import Progress
+    from budget import Budget
+    from pyprofile import PhaseProfiler
+
+class Template ():
+    '''A program constructed with the arguments of its main
+    function as Inputs.\n
+    The arguments that end up controlling the bounds of a for loop
+    can't stay symbolic, because how many times the loop is unwrapped
+    depends on them. So the template is specialized for the values they
+    had, and only matches the arguments that have these exact same values.\n
+    The attributes are as follow:\n
+    - `operation`: the operation of the program, with the Inputs as leaves\n
+    - `inputs`: the Inputs, in the same order as the parameters of the main function\n
+    - `control`: a `dict` that maps the index of each argument that controls
+    a for loop to the value it was specialized for'''
+
+    def __init__(self, operation: Operation, inputs: list[Input], control: dict[int, Number]) -> None:
+        self.operation = operation
+        self.inputs = inputs
+        self.control = control
+        self.__plan = None
+
+    @property
+    def plan (self) -> Plan:
+        '''The evaluation plan of the operation. Created the first time it's needed'''
+        if self.__plan is None:
+            self.__plan = Plan(self.operation)
+        return self.__plan
+
+    def matches (self, args: Sequence[Number]) -> bool:
+        '''Whether this template can be evaluated with these arguments'''
+        if len(args) != len(self.inputs):
+            return False
+        for i, value in self.control.items():
+            if args[i] != value:
+                return False
+        return True
+
+    def evaluate (self, args: Sequence[Number]) -> Number:
+        '''Evaluates the program for the given arguments, which
+        must match this template, and returns the result'''
+        assert self.matches(args), f"These arguments {args} don't match this template"
+        return self.plan.evaluate({input: arg for input, arg in zip(self.inputs, args) if input in self.plan.inputs})
+
+    def evaluateMany (self, args_list: Sequence[Sequence[Number]], vectorize: bool=False) -> list[Number]:
+        '''Evaluates the program for each of the given arguments, which
+        must all match this template, and returns the results in the same
+        order. Check `Plan.evaluateMany()` for `vectorize`'''
+        for args in args_list:
+            assert self.matches(args), f"These arguments {args} don't match this template"
+        columns = {input: [args[i] for args in args_list] for i, input in enumerate(self.inputs) if input in self.plan.inputs}
+        if len(columns) == 0:
+            # The result does not depend on the arguments at all
+            return [self.operation.result] * len(args_list)
+        return self.plan.evaluateMany(columns, vectorize)
+
+def buildTemplate (ast: Node, args: Sequence[Number], hoist: bool=False, inline_threshold: int=INLINE_THRESHOLD, store: SpillStore | None=None, hooks: Hooks | None=None, progress: Progress | None=None, budget: Budget | None=None, phases: PhaseProfiler | None=None) -> Template:
+    '''Constructs the program from its `ast` as a Template,
+    using `args` as the values of the Inputs. Check
+    `constructProgram()` for `hoist`, `inline_threshold`, `store`, `hooks`, `progress`, `budget` and `phases`'''
+    inputs = [Input(f"arg{i +1}", arg) for i, arg in enumerate(args)] # The runner names them after the main function's parameters
+    control_inputs = set()
+    operation = constructProgram(ast, inputs, control_inputs, hoist, inline_threshold, store, hooks=hooks, progress=progress, budget=budget, phases=phases)
+    control = {i: args[i] for i, input in enumerate(inputs) if input in control_inputs}
+    return Template(operation, inputs, control)
+
+class TemplateCache ():
+    '''Keeps the templates of a program, one per distinct values of
+    the arguments that control its for loops, and creates new
+    ones as needed.'''
+
+    def __init__(self, ast: Node) -> None:
+        '''`ast`: the AST of the program, as returned by `constructAST()`'''
+        self.ast = ast
+        self.templates = []
+        self.hits = 0
+        self.misses = 0
+
+    def template (self, args: Sequence[Number]) -> Template:
+        '''Returns the template that matches these arguments, constructing it if needed'''
+        for template in self.templates:
+            if template.matches(args):
+                self.hits += 1
+                return template
+        self.misses += 1
+        template = buildTemplate(self.ast, args)
+        self.templates.append(template)
+        return template
+
+    def evaluate (self, args: Sequence[Number]) -> Number:
+        '''Evaluates the program for the given arguments and returns the result'''
+        return self.template(args).evaluate(args)
+
+    def evaluateMany (self, args_list: Sequence[Sequence[Number]], vectorize: bool=False) -> list[Number]:
+        '''Evaluates the program for each of the given arguments, and
+        returns the results in the same order. The arguments that share
+        a template are evaluated together'''
+        groups = {} # Maps the id of a template to it and the indexes of its arguments
+        for i, args in enumerate(args_list):
+            template = self.template(args)
+            groups.setdefault(id(template), (template, []))[1].append(i)
+
+        results = [None] * len(args_list)
+        for template, indexes in groups.values():
+            group_results = template.evaluateMany([args_list[i] for i in indexes], vectorize)
+            for i, result in zip(indexes, group_results):
+                results[i] = result
+        return results
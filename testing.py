@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+'''The test runner. Discovers the `*_test.mlg` files of a directory, and
+runs their tests in parallel by worker processes. The files are parsed
+once, sharing the tokens of the standard libraries, and the workers
+inherit their ASTs. A test fails when an `assert` of the `assert`
+library divides by zero, and it's pointed out at that `assert` call'''
+
+from engine import Program
+from budget import Budget, BudgetExceeded
+from hooks import Hooks, CALL_START, CALL_END
+from runner import Node, Token, parseSourceFile, constructAST, formatCount
+from typing import Iterator, TextIO
+import multiprocessing
+import time
+import os
+
+# The suffix of the test files
+TEST_FILE_SUFFIX = '_test.mlg'
+# The prefix of the names of the test functions
+TEST_FUNCTION_PREFIX = 'test_'
+# The names of the main function, and of the return variable of the main scope. As in `constructProgram()`
+MAIN_FUNCTION_NAME = 'main'
+RETURN_VAR_NAME = 'res'
+# The name of the function that fails the tests
+ASSERT_FUNCTION_NAME = 'assert'
+# The names a test can be reported with
+PASS, FAIL, TIMEOUT, ERROR = 'pass', 'fail', 'timeout', 'error'
+
+# The state of the worker processes. Check `initWorker()`
+_tests = None
+_options = None
+
+class Test ():
+    '''A single test:\n
+    - `name`: its name, as `file::function`, or just the file if the whole file is the test\n
+    - `program`: the Program that runs it, `None` if its file couldn't be compiled\n
+    - `error`: why its file couldn't be compiled, if it couldn't'''
+
+    def __init__(self, name: str, program: Program | None, error: str | None=None) -> None:
+        self.name = name
+        self.program = program
+        self.error = error
+
+def discoverFiles (path: str) -> list[str]:
+    '''The test files in the directory at `path`, and in the ones under it, sorted. Or
+    the file at `path` itself if it's not a directory'''
+    if not os.path.isdir(path):
+        return [path]
+    files = []
+    for dir_path, dir_names, file_names in os.walk(path):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith('.') and name != '__pycache__')
+        files.extend(os.path.join(dir_path, name) for name in file_names if name.endswith(TEST_FILE_SUFFIX))
+    return sorted(files)
+
+def isTestFunction (node: Node, file_path: str) -> bool:
+    '''Whether the `node` is a test function defined in the file at `file_path`: a function
+    without parameters nor an alias whose name starts with `TEST_FUNCTION_PREFIX`'''
+    if node.type != Node.Type.FUNC_DEF:
+        return False
+    func = node.components['func']
+    return func.lexeme.startswith(TEST_FUNCTION_PREFIX) and func.file == file_path and len(node.components['params']) == 0 and not node.components['has_als']
+
+def collectTests (file_path: str, cache: dict) -> list[Test]:
+    '''Compiles the test file at `file_path`, with the `cache` of `parseSourceFile()`, and
+    returns its tests. Each test function is a test of its own, which is called from the
+    main scope of a copy of the file, its main function and the other tests left out. If it has none, then
+    the whole file is a single test, whose main function takes no arguments'''
+    try:
+        ast = constructAST(parseSourceFile(file_path, cache=cache))
+    except Exception as e:
+        return [Test(file_path, None, str(e))]
+    content = ast.components['content']
+    test_functions = [node for node in content if isTestFunction(node, file_path)]
+    if len(test_functions) == 0:
+        return [Test(file_path, Program(ast))]
+
+    tests = []
+    for func_def in test_functions:
+        # The main scope, without the main function nor the other tests. Their constant for loops would be unwrapped too
+        common = [node for node in content if not (node.type == Node.Type.FUNC_DEF and node.components['func'].lexeme == MAIN_FUNCTION_NAME) and (node is func_def or not isTestFunction(node, file_path))]
+        func = func_def.components['func']
+        call = Node(Node.Type.FUNC_CALL, with_als=False, func=Token.synthesizeIdentifier(func.lexeme, func), args=[])
+        # Assigned to the return variable of the main scope, so that it's the result
+        result = Node.makeVarAssign(False, Token.synthesizeIdentifier(RETURN_VAR_NAME, func), call)
+        root = Node(Node.Type.ROOT, boc=ast.components['boc'], content=common +[result], eoc=ast.components['eoc'])
+        tests.append(Test(f"{file_path}::{func.lexeme}", Program(root)))
+    return tests
+
+def initWorker (tests: list[Test], options: dict) -> None:
+    '''Sets the state of a worker process. When the workers are forked, the
+    `tests` are inherited as they are instead of being pickled'''
+    global _tests, _options
+    _tests = tests
+    _options = options
+
+def runTest (index: int) -> dict:
+    '''Runs the test at `index`, in a worker, and returns its record:\n
+    - `name`: the name of the test\n
+    - `outcome`: one of `PASS`, `FAIL`, `TIMEOUT` or `ERROR`\n
+    - `duration`: how many seconds it took\n
+    - `operations_count`: how many mathematical operations its result took, if it passed\n
+    - `message`: what went wrong, if it didn't pass'''
+    test = _tests[index]
+    record = {'name': test.name, 'outcome': PASS, 'duration': 0.0, 'operations_count': None, 'message': None}
+    if test.program is None:
+        record['outcome'] = ERROR
+        record['message'] = test.error
+        return record
+
+    # The calls being evaluated, as their Node.FUNC_DEF and their call site. The ones
+    #   that raised are never popped, so the innermost one is the one that raised
+    calls = []
+    hooks = Hooks()
+    hooks.register(CALL_START, lambda event: calls.append((event.node, event.token)))
+    hooks.register(CALL_END, lambda event: calls.pop())
+
+    start = time.perf_counter()
+    try:
+        result = test.program.run(hoist=_options['hoist'], inline_threshold=_options['inline_threshold'], budget=Budget(timeout=_options['timeout']), hooks=hooks)
+        record['operations_count'] = result.stats.operations_count
+    except BudgetExceeded as e:
+        record['outcome'] = TIMEOUT if e.budget == 'timeout' else ERROR
+        record['message'] = str(e)
+    except Exception as e:
+        if isinstance(e.__context__, ZeroDivisionError) and len(calls) != 0 and calls[-1][0].components['func'].lexeme == ASSERT_FUNCTION_NAME:
+            call_site = calls[-1][1]
+            record['outcome'] = FAIL
+            record['message'] = f"❌ ASSERTION FAILED\n{call_site.pointOut()}\n{call_site.location()}"
+        else:
+            record['outcome'] = ERROR
+            record['message'] = str(e)
+    record['duration'] = time.perf_counter() - start
+    return record
+
+def runTests (tests: list[Test], options: dict) -> Iterator[dict]:
+    '''Runs the `tests` with `options['workers']` processes, and yields their
+    records in the same order as soon as they're known. Check `runTest()`'''
+    # Forking shares the tests with the workers copy-on-write, otherwise they're pickled to them
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with context.Pool(options['workers'], initWorker, (tests, options)) as pool:
+        yield from pool.imap(runTest, range(len(tests)))
+
+def report (record: dict, file: TextIO) -> None:
+    '''Writes the line of a test's record, followed by its message if it didn't pass'''
+    marks = {PASS: '✅ PASS   ', FAIL: '❌ FAIL   ', TIMEOUT: '⌛️ TIMEOUT', ERROR: '💥 ERROR  '}
+    count = record['operations_count']
+    operations = '' if count is None else f"  {formatCount(count)} operation{['', 's'][0 if count == 1 else 1]}"
+    print(f"{marks[record['outcome']]} {record['name']}  {record['duration']:.3f}s{operations}", file=file)
+    if record['message'] is not None:
+        print('\n'.join('    ' +line for line in record['message'].split('\n')), file=file)
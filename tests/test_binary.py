@@ -0,0 +1,52 @@
+'''Round trips of the binary format, from `--symbolic --export` to `--load`'''
+
+import subprocess
+import tempfile
+import unittest
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MALANG = os.path.join(ROOT, 'malang.py')
+
+def malang (*args: str) -> str:
+    return subprocess.run([sys.executable, MALANG, *args], capture_output=True, text=True, check=True).stdout
+
+class TestExportLoad (unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def roundTrip (self, source: str, exported: list[str], loaded: list[str]) -> tuple[str, str]:
+        '''Exports the program with the `exported` args, and loads it with the `loaded` ones'''
+        program = os.path.join(self.dir.name, 'program.mlg')
+        operation = os.path.join(self.dir.name, 'program.bin')
+        with open(program, 'w') as file:
+            file.write(source)
+        return malang('--symbolic', '--export', operation, program, *exported), malang('--load', operation, *loaded)
+
+    def test_parameters_used_in_reverse_order (self) -> None:
+        exported, loaded = self.roundTrip('def main (a, b) {\n    ret b - a\n}\n', ['1', '10'], ['1', '10'])
+        self.assertEqual(exported, loaded)
+        self.assertEqual(float(loaded), 9)
+        _, loaded = self.roundTrip('def main (a, b) {\n    ret b - a\n}\n', ['1', '10'], ['10', '1'])
+        self.assertEqual(float(loaded), -9)
+
+    def test_unused_parameter (self) -> None:
+        _, loaded = self.roundTrip('def main (a, b) {\n    ret b * 2\n}\n', ['1', '10'], ['1', '7'])
+        self.assertEqual(float(loaded), 14)
+
+    def test_parameter_controlling_a_for_loop (self) -> None:
+        source = 'def main (n) {\n    res = 0\n    for (i: 1: n) {\n        res = res + n\n    }\n}\n'
+        _, loaded = self.roundTrip(source, ['3'], ['3'])
+        self.assertEqual(float(loaded), 9)
+        program = os.path.join(self.dir.name, 'program.bin')
+        error = subprocess.run([sys.executable, MALANG, '--load', program, '4'], capture_output=True, text=True)
+        self.assertNotEqual(error.returncode, 0)
+        self.assertIn('`n`', error.stdout + error.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
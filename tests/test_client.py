@@ -0,0 +1,25 @@
+'''The client of the evaluation daemon, `--client`'''
+
+import subprocess
+import tempfile
+import unittest
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MALANG = os.path.join(ROOT, 'malang.py')
+FACTORIAL = os.path.join(ROOT, 'examples', 'factorial.mlg')
+
+class TestClient (unittest.TestCase):
+
+    def test_options_not_forwarded (self) -> None:
+        # Rejected before connecting, so no daemon is needed
+        with tempfile.TemporaryDirectory() as directory:
+            socket_path = os.path.join(directory, 'malang.sock')
+            process = subprocess.run([sys.executable, MALANG, '--client', socket_path, '-O', '--show', FACTORIAL, '6'], capture_output=True, text=True)
+        self.assertNotEqual(process.returncode, 0)
+        self.assertEqual(process.stdout, '')
+        self.assertIn("`--show`, `--optimize` can't be used with `--client`", process.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
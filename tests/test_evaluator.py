@@ -0,0 +1,36 @@
+'''The re-evaluation of operations, against the results they had when they were constructed'''
+
+import subprocess
+import tempfile
+import unittest
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MALANG = os.path.join(ROOT, 'malang.py')
+sys.path.insert(0, ROOT)
+
+from core import OP_SET, Operation
+from evaluator import Plan, numpy
+
+# A float power that NumPy doesn't round the same as Python
+BASE, EXPONENT = 44.942926015519994, 1.1912550918061129
+
+class TestEvaluateLevels (unittest.TestCase):
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_float_power (self) -> None:
+        operation = Operation(OP_SET.POW, Operation(OP_SET.ADD, BASE, 0.0), EXPONENT)
+        self.assertEqual(Plan(operation).evaluateLevels({}), BASE ** EXPONENT)
+
+    def test_verify_float_power (self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            program = os.path.join(directory, 'pow.mlg')
+            with open(program, 'w') as file:
+                file.write(f"def main (x) {{\n    res = (x + 0.0) ^ {EXPONENT}\n}}\n")
+            process = subprocess.run([sys.executable, MALANG, '--verify', program, str(BASE)], capture_output=True, text=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(float(process.stdout), BASE ** EXPONENT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+'''The test runner, `malang.py test`, over the `*_test.mlg` files'''
+
+import subprocess
+import tempfile
+import unittest
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MALANG = os.path.join(ROOT, 'malang.py')
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+MLG_TESTS = os.path.join(ROOT, 'tests', 'mlg')
+
+def malangTest (*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, MALANG, 'test', *args], capture_output=True, text=True)
+
+class TestRunner (unittest.TestCase):
+
+    def test_outcomes (self) -> None:
+        process = malangTest(os.path.join(FIXTURES, 'outcomes.mlg'), '--timeout', '1')
+        self.assertEqual(process.returncode, 1)
+        lines = process.stdout.split('\n')
+        self.assertTrue(any('PASS' in line and '::test_passes' in line for line in lines))
+        failed = next(i for i, line in enumerate(lines) if 'FAIL' in line)
+        self.assertIn('::test_fails', lines[failed])
+        # Pointed out at the second assert, the one that doesn't hold
+        self.assertIn('ASSERTION FAILED', lines[failed +1])
+        self.assertIn('line: 12,', lines[failed +3])
+        self.assertTrue(any('TIMEOUT' in line and '::test_times_out' in line for line in lines))
+        self.assertIn('1 passed, 1 failed, 1 timed out', process.stdout)
+
+    def test_libraries (self) -> None:
+        process = malangTest(MLG_TESTS)
+        self.assertEqual(process.returncode, 0, process.stdout)
+        self.assertNotIn('FAIL', process.stdout)
+
+    def test_nothing_collected (self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            process = malangTest(directory)
+        self.assertEqual(process.returncode, 1)
+        self.assertIn('no tests were run', process.stdout)
+
+if __name__ == '__main__':
+    unittest.main()